@@ -1,21 +1,105 @@
 import os
 import json
+import math
+import base64
+import hashlib
+import time
+import uuid
+import random
+import asyncio
+import logging
+import contextvars
 import datetime
-from typing import List, Optional, Dict, Any
+from collections import Counter
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from itertools import islice
+from types import SimpleNamespace
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Literal, Tuple
 
-import requests
+import httpx
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import and_
 
+from database import SessionLocal, async_engine, engine, get_session
+from extraction_cache import ExtractionCache, make_key
+from models import DEFAULT_USER_ID, Base, Transaction
+from migrations import SCHEMA_VERSION, migrate
+import category_model
+import data_version
+import exporters
+import importer
+import jobs
+import metrics
+import rate_limiter
+import repository
+import search_index
+import shards
+from repository import new_transaction, record_inserts, transaction_filters
+from rule_extractor import UNKNOWN_CATEGORY, UNKNOWN_CATEGORY_PENALTY, extract_fast
+
 load_dotenv()
 
-app = FastAPI(title="Expense Tracker API")
+LLM_API_URL = os.getenv("LLM_API_URL", "https://api.deepseek.com/v1/chat/completions")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+# Outbound LLM budget; 0 means no limit. The concurrency cap spans every caller.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Assumed completion size when budgeting tokens before a call
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "150"))
+# Retries on 429/5xx and transport errors, honoring Retry-After, else exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SEC = float(os.getenv("LLM_BACKOFF_SEC", "0.5"))
+LLM_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+llm_limiter = rate_limiter.LlmLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_CONCURRENCY)
+
+# Shared keep-alive client for all LLM calls; opened and closed with the app
+llm_client: Optional[httpx.AsyncClient] = None
+
+
+def create_llm_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        ),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global llm_client
+    llm_client = create_llm_client()
+    resume_import_jobs()
+    await start_job_workers()
+    try:
+        yield
+    finally:
+        await stop_job_workers()
+        await run_in_threadpool(search_indexes.save_all)
+        await llm_client.aclose()
+        await async_engine.dispose()
+        if shards.pool is not None:
+            await shards.pool.close()
+        llm_client = None
+
+
+app = FastAPI(title="Expense Tracker API", lifespan=lifespan)
 
 # Allow Streamlit to call this API (dev-friendly; restrict in production)
 app.add_middleware(
@@ -25,33 +109,100 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so its latency includes CORS handling and it sees every response
+app.add_middleware(metrics.TimingMiddleware)
+
+
 
-# SQLite + FastAPI: allow usage across threads
-DATABASE_URL = "sqlite:///./expenses.db"
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
+def prepare_transactions_db(db_engine: Engine) -> None:
+    """Create or upgrade the transactions, rollup, data version and category feedback tables."""
+    Base.metadata.create_all(bind=db_engine)
+    migrate(db_engine, Transaction.__table__)
+    data_version.init(db_engine)
+    category_model.metadata.create_all(bind=db_engine)
+
+
+logger = logging.getLogger(__name__)
+
+prepare_transactions_db(engine)
+importer.metadata.create_all(bind=engine)
+jobs.metadata.create_all(bind=engine)
+# SHARD_PER_USER=1: transactions live in one SQLite file per user instead
+shards.configure(prepare_transactions_db, SCHEMA_VERSION)
+
+extraction_cache = ExtractionCache(
+    engine,
+    max_entries=int(os.getenv("EXTRACTION_CACHE_SIZE", "1024")),
+    max_rows=int(os.getenv("EXTRACTION_CACHE_MAX_ROWS", "100000")),
+    ttl_sec=float(os.getenv("EXTRACTION_CACHE_TTL_SEC", str(30 * 24 * 3600))),
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
 
+# Per-user similarity indexes for /transactions/search and /transactions/{id}/similar
+search_indexes = search_index.IndexPool(search_index.SEARCH_DIR, search_index.SEARCH_MAX_OPEN)
+MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "100"))
+
+# Per-user category classifiers trained on reviewed rows
+category_models = category_model.ModelPool()
 
-class Transaction(Base):
-    __tablename__ = "transactions"
+# /transactions page size cap and rows fetched per round trip when streaming
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
 
-    id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, nullable=False)
-    type = Column(String, nullable=False)  # 'income' or 'expense'
-    category = Column(String, nullable=False)
-    description = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
+# Rule-based results at or above this confidence skip the LLM entirely
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
 
+# How each extraction was answered: fast / cache / llm
+extraction_paths: Counter = Counter()
+# Extractions whose category came from the user's classifier, by path (and import rows it filled)
+learned_categories: Counter = Counter()
 
-Base.metadata.create_all(bind=engine)
+# Cache variant for extractions asked for without a category
+UNCATEGORIZED = "uncategorized"
+
+# Uploaded statements are kept here until their import job finishes
+IMPORT_DIR = os.getenv("IMPORT_DIR", "./imports")
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+# Upper bound on simultaneous LLM calls made by /process/batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Sentences per LLM prompt in /process/batch (1 = one prompt per sentence)
+LLM_PACK_SIZE = int(os.getenv("LLM_PACK_SIZE", "1"))
+LLM_PACK_RETRIES = int(os.getenv("LLM_PACK_RETRIES", "1"))
+
+# Workers draining the /jobs queue, i.e. sentences extracted at once across all jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
 
 
 class InputText(BaseModel):
     text: str
+    bypass_cache: bool = False
+
+
+class BatchInput(BaseModel):
+    texts: List[str]
+    concurrency: Optional[int] = None  # capped at BATCH_CONCURRENCY
+    bypass_cache: bool = False
+    pack_size: Optional[int] = None  # defaults to LLM_PACK_SIZE
+
+
+class TransactionIn(BaseModel):
+    date: datetime.date  # YYYY-MM-DD
+    type: Literal["income", "expense"]
+    category: str
+    description: str
+    price: float
+    suggested_category: Optional[str] = None  # the extractor's category, before review
+
+
+class JobInput(BaseModel):
+    texts: List[str]
+    bypass_cache: bool = False
+    save: bool = True  # False to only extract, e.g. for review before /transactions/bulk
+
+
+class BulkInput(BaseModel):
+    transactions: List[TransactionIn]
 
 
 class TransactionOut(BaseModel):
@@ -63,48 +214,118 @@ class TransactionOut(BaseModel):
     price: float
 
 
-def extract_with_llm(text: str) -> Dict[str, Any]:
+class SearchResult(TransactionOut):
+    score: float  # cosine similarity, 0 to 1
+
+
+SYSTEM_PROMPT = (
+    "You are a transaction extractor. Respond ONLY with a valid JSON object. "
+    "Do not include any explanations, markdown, or additional text."
+)
+
+PACKED_SYSTEM_PROMPT = (
+    "You are a transaction extractor. Respond ONLY with a valid JSON array. "
+    "Do not include any explanations, markdown, or additional text."
+)
+
+# Running totals reported by the LLM API
+llm_usage: Counter = Counter()
+
+
+class LlmUnavailable(ValueError):
+    """The LLM API kept refusing (429/5xx) after every retry."""
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_sec(r: httpx.Response) -> Optional[float]:
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(system_prompt: str, user_prompt: str) -> int:
+    # ~4 characters per token; the answer is assumed to be about as long as the prompt
+    prompt = (len(system_prompt) + len(user_prompt)) // 4
+    return prompt + max(LLM_COMPLETION_TOKENS, prompt)
+
+
+async def chat_completion(system_prompt: str, user_prompt: str) -> str:
     api_key = os.getenv("DEEPSEEK_API_KEY")
     if not api_key:
         raise ValueError("DEEPSEEK_API_KEY not set")
 
-    system_prompt = (
-        "You are a transaction extractor. Respond ONLY with a valid JSON object. "
-        "Do not include any explanations, markdown, or additional text."
-    )
+    if llm_client is not None:
+        return await _chat_completion(llm_client, api_key, system_prompt, user_prompt)
+    # Outside the app's lifespan (scripts, tests): a client for this call only, closed after it
+    async with create_llm_client() as client:
+        return await _chat_completion(client, api_key, system_prompt, user_prompt)
 
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    user_prompt = f"""
-Extract transaction details from this sentence: "{text}"
 
-Use these keys: date (YYYY-MM-DD), type (income or expense), category, description, price (float).
-If date is missing, use today's date: {today}.
-"""
+async def _chat_completion(client: httpx.AsyncClient, api_key: str, system_prompt: str, user_prompt: str) -> str:
+    estimate = estimate_tokens(system_prompt, user_prompt)
+    for attempt in range(1 + LLM_MAX_RETRIES):
+        last = attempt == LLM_MAX_RETRIES
+        queued = time.perf_counter()
+        async with llm_limiter.slot(estimate) as used:
+            metrics.record("llm_queue", time.perf_counter() - queued)
+            try:
+                with metrics.span("llm"):
+                    r = await client.post(
+                        LLM_API_URL,
+                        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                        json={
+                            "model": "deepseek-chat",
+                            "messages": [
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": user_prompt},
+                            ],
+                            "temperature": 0.2,
+                        },
+                    )
+            except httpx.TransportError as e:
+                if last:
+                    raise LlmUnavailable(f"LLM API unreachable: {e}") from e
+                r = None
+            if r is not None and r.status_code == 200:
+                api_response = r.json()
+                usage = api_response.get("usage") or {}
+                used(usage.get("total_tokens", estimate))
+                break
 
-    r = requests.post(
-        "https://api.deepseek.com/v1/chat/completions",
-        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-        json={
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            "temperature": 0.2,
-        },
-        timeout=30,
-    )
+        if r is not None:
+            metrics.errors.inc(cause=f"llm_http_{r.status_code}")
+        if r is not None and r.status_code not in LLM_RETRY_STATUSES:
+            raise ValueError("LLM API error: " + r.text)
 
-    if r.status_code != 200:
-        raise ValueError("LLM API error: " + r.text)
+        wait = retry_after_sec(r) if r is not None else None
+        if r is not None and r.status_code == 429:
+            # The quota is shared, so every caller backs off, not just this one
+            llm_limiter.pause(wait if wait is not None else LLM_BACKOFF_SEC * 2 ** attempt)
+        if last:
+            raise LlmUnavailable(f"LLM API error {r.status_code}: {r.text}", retry_after=wait or 0.0)
+        llm_limiter.retries += 1
+        await asyncio.sleep(wait if wait is not None else LLM_BACKOFF_SEC * 2 ** attempt * (0.5 + random.random()))
 
-    api_response = r.json()
-    content = api_response["choices"][0]["message"]["content"]
+    llm_usage["calls"] += 1
+    llm_usage["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    llm_usage["completion_tokens"] += usage.get("completion_tokens", 0)
+    return api_response["choices"][0]["message"]["content"]
 
-    try:
-        extracted = json.loads(content)
-    except json.JSONDecodeError:
-        raise ValueError(f"Invalid JSON from LLM: {content}")
+
+def validate_extraction(extracted: Any, today: str) -> Dict[str, Any]:
+    if not isinstance(extracted, dict):
+        raise ValueError(f"Invalid extraction from LLM: {extracted}")
 
     extracted.setdefault("date", today)
 
@@ -116,79 +337,1266 @@ If date is missing, use today's date: {today}.
             raise ValueError(f"Missing key from LLM output: {k}")
 
     extracted["price"] = float(extracted["price"])
+    datetime.datetime.strptime(extracted["date"], "%Y-%m-%d")
     return extracted
 
 
+async def extract_with_llm(text: str, category: Optional[str] = None) -> Dict[str, Any]:
+    """With `category` already known, the prompt does not ask for one."""
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    keys = "date (YYYY-MM-DD), type (income or expense), category, description, price (float)"
+    if category is not None:
+        keys = "date (YYYY-MM-DD), type (income or expense), description, price (float)"
+    user_prompt = f"""
+Extract transaction details from this sentence: "{text}"
+
+Use these keys: {keys}.
+If date is missing, use today's date: {today}.
+"""
+
+    content = await chat_completion(SYSTEM_PROMPT, user_prompt)
+
+    with metrics.span("llm_parse"):
+        try:
+            extracted = json.loads(content)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON from LLM: {content}")
+
+        if category is not None and isinstance(extracted, dict):
+            extracted["category"] = category
+        return validate_extraction(extracted, today)
+
+
+async def extract_many_with_llm(texts: List[str]) -> List[Any]:
+    """Extract several sentences with one prompt.
+
+    Returns one entry per input: the extraction, or the exception explaining
+    why that element failed. Failed elements are re-asked (packed again) up
+    to LLM_PACK_RETRIES times.
+    """
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    outcomes: List[Any] = [ValueError("No result from LLM")] * len(texts)
+    todo = list(range(len(texts)))
+
+    for _ in range(1 + LLM_PACK_RETRIES):
+        numbered = "\n".join(f'{n}: "{texts[i]}"' for n, i in enumerate(todo))
+        user_prompt = f"""
+Extract transaction details from each of these numbered sentences:
+{numbered}
+
+Return a JSON array with exactly one object per sentence, in any order.
+Use these keys: index (the sentence number), date (YYYY-MM-DD), type (income or expense), category, description, price (float).
+If date is missing, use today's date: {today}.
+"""
+
+        try:
+            content = await chat_completion(PACKED_SYSTEM_PROMPT, user_prompt)
+            with metrics.span("llm_parse"):
+                items = json.loads(content)
+                if not isinstance(items, list):
+                    raise ValueError(f"Expected a JSON array from LLM: {content}")
+        except json.JSONDecodeError as e:
+            err = ValueError(f"Invalid JSON from LLM: {e}")
+            for i in todo:
+                outcomes[i] = err
+            continue
+        except Exception as e:
+            # Includes transport errors and malformed responses (no `choices`): these elements
+            # fail, not the whole batch
+            for i in todo:
+                outcomes[i] = e
+            continue
+
+        by_index = {}
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("index"), int):
+                by_index[item.pop("index")] = item
+
+        failed = []
+        for n, i in enumerate(todo):
+            try:
+                if n not in by_index:
+                    raise ValueError(f"Missing element {n} in LLM output")
+                outcomes[i] = validate_extraction(by_index[n], today)
+            except (ValueError, TypeError) as e:
+                metrics.errors.inc(cause="llm_parse")
+                outcomes[i] = ValueError(str(e))
+                failed.append(i)
+        todo = failed
+        if not todo:
+            break
+
+    return outcomes
+
+
+async def learned_category(user_id: str, text: str) -> Optional[str]:
+    """The category the user's classifier gives `text`, when it is confident enough."""
+    if category_models.peek(user_id) is None:
+        # First use since startup or eviction: replay the user's feedback
+        await run_in_threadpool(category_models.get, user_id)
+    return category_models.predict(user_id, text)
+
+
+def extract_local(
+    text: str, today: datetime.date, bypass_cache: bool = False, learned: Optional[str] = None
+) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Answer from the rule-based fast path or the cache, if either can.
+
+    A `learned` category replaces theirs, and lets the fast path answer
+    sentences it parsed but could not categorize.
+    """
+    extracted, confidence = extract_fast(text, today)
+    if extracted is not None and learned is not None:
+        if extracted["category"] == UNKNOWN_CATEGORY:
+            confidence += UNKNOWN_CATEGORY_PENALTY
+        extracted["category"] = learned
+    if extracted is not None and confidence >= FAST_PATH_MIN_CONFIDENCE:
+        extraction_paths["fast"] += 1
+        learned_categories["fast"] += learned is not None
+        return extracted, "fast"
+
+    if not bypass_cache:
+        day = today.strftime("%Y-%m-%d")
+        cached = extraction_cache.get(make_key(text, day))
+        if cached is None and learned is not None:
+            cached = extraction_cache.get(make_key(text, day, UNCATEGORIZED))
+        if cached is not None:
+            if learned is not None:
+                cached["category"] = learned
+                learned_categories["cache"] += 1
+            extraction_paths["cache"] += 1
+            return cached, "cache"
+
+    return None
+
+
+async def extract(text: str, bypass_cache: bool = False, user_id: str = DEFAULT_USER_ID) -> Tuple[Dict[str, Any], str]:
+    """Rule-based fast path, then the extraction cache, then the LLM.
+
+    When the user's classifier is confident about the category, the LLM
+    is only asked for the other fields. Returns the extraction and the
+    path that produced it.
+    """
+    today = datetime.date.today()
+    learned = await learned_category(user_id, text)
+    # A cache miss in memory reads SQLite, so keep it off the event loop
+    local = await run_in_threadpool(extract_local, text, today, bypass_cache, learned)
+    if local is not None:
+        return local
+
+    if learned is None:
+        extracted = await extract_with_llm(text)
+        key = make_key(text, today.strftime("%Y-%m-%d"))
+    else:
+        extracted = await extract_with_llm(text, category=learned)
+        # Cached apart, so other users never get this user's category for the sentence
+        key = make_key(text, today.strftime("%Y-%m-%d"), UNCATEGORIZED)
+        learned_categories["llm"] += 1
+    await run_in_threadpool(extraction_cache.put, key, extracted)
+    extraction_paths["llm"] += 1
+    return extracted, "llm"
+
+
+async def extract_packed(
+    texts: List[str], pack_size: int, sem: asyncio.Semaphore, bypass_cache: bool = False, user_id: str = DEFAULT_USER_ID
+) -> List[Any]:
+    """Like extract() for many sentences, sending LLM misses pack_size at a time.
+
+    Packed prompts always ask for the category; a confident learned one replaces it.
+    """
+    today = datetime.date.today()
+    outcomes: List[Any] = [None] * len(texts)
+    learned: List[Optional[str]] = [None] * len(texts)
+    misses = []
+    for i, text in enumerate(texts):
+        if not text:
+            outcomes[i] = ValueError("Empty sentence")
+            continue
+        learned[i] = await learned_category(user_id, text)
+        local = await run_in_threadpool(extract_local, text, today, bypass_cache, learned[i])
+        if local is not None:
+            outcomes[i] = local
+        else:
+            misses.append(i)
+
+    async def _run(pack: List[int]) -> None:
+        async with sem:
+            results = await extract_many_with_llm([texts[i] for i in pack])
+        for i, result in zip(pack, results):
+            if isinstance(result, Exception):
+                outcomes[i] = result
+                continue
+            await run_in_threadpool(extraction_cache.put, make_key(texts[i], today.strftime("%Y-%m-%d")), result)
+            if learned[i] is not None:
+                result = dict(result, category=learned[i])
+                learned_categories["llm"] += 1
+            extraction_paths["llm"] += 1
+            outcomes[i] = (result, "llm")
+
+    packs = [misses[j:j + pack_size] for j in range(0, len(misses), pack_size)]
+    await asyncio.gather(*(_run(p) for p in packs))
+    return outcomes
+
+
+def current_user(
+    x_user_id: Optional[str] = Header(None, max_length=128, description="Owner of the data; DEFAULT_USER_ID if omitted"),
+    user_id: Optional[str] = Query(None, max_length=128, description="Used when X-User-ID is absent, e.g. a download link"),
+) -> str:
+    """Whose transactions a request reads or writes.
+
+    The frontend sends its session's user_id; authenticating it is the
+    deployment's job (e.g. a proxy that sets the header from the login).
+    Plain browser navigation cannot set headers, so links carry ?user_id=.
+    """
+    for candidate in (x_user_id, user_id):
+        if candidate and candidate.strip():
+            return candidate.strip()
+    return DEFAULT_USER_ID
+
+
+async def open_user_shard(user_id: str) -> None:
+    if shards.pool is not None:
+        # Opening a shard for the first time creates its file and tables
+        await run_in_threadpool(shards.pool.get, user_id)
+        await shards.pool.close_retired()
+
+
+async def get_user_session(user_id: str = Depends(current_user)) -> AsyncIterator[AsyncSession]:
+    """get_session for the user's data: their shard with SHARD_PER_USER=1, else the main database."""
+    await open_user_shard(user_id)
+    async with shards.async_session_for(user_id) as session:
+        yield session
+
+
+async def get_user_reader(user_id: str = Depends(current_user)) -> repository.Reader:
+    """A Reader of the user's data, from the same database as get_user_session."""
+    await open_user_shard(user_id)
+    return repository.Reader(
+        lambda: shards.session_for(user_id),
+        lambda: shards.async_session_for(user_id),
+        shards.engine_for(user_id).dialect.name,
+    )
+
+
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return extraction_cache.stats()
+
+
+@app.get("/extraction/stats")
+async def extraction_stats():
+    total = sum(extraction_paths.values())
+    return {
+        "total": total,
+        "paths": dict(extraction_paths),
+        "fast_path_rate": extraction_paths["fast"] / total if total else 0.0,
+        "llm_calls_saved": extraction_paths["fast"] + extraction_paths["cache"],
+        "learned_categories": dict(learned_categories),
+    }
+
+
+@app.get("/classifier/stats")
+async def classifier_stats(user_id: str = Depends(current_user)):
+    """The user's category classifier: examples per category, corrections and how often its confident guesses held."""
+    model = await run_in_threadpool(category_models.get, user_id)
+    return model.stats()
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Rate limiter state: queue depth and wait time per lane, throttling, retries."""
+    return {**llm_limiter.stats(), "usage": dict(llm_usage)}
+
+
+@metrics.registry.collector("llm_tokens_total", "counter", "Tokens reported by the LLM API.")
+def _llm_tokens():
+    yield {"kind": "prompt"}, llm_usage["prompt_tokens"]
+    yield {"kind": "completion"}, llm_usage["completion_tokens"]
+
+
+@metrics.registry.collector("llm_calls_total", "counter", "Successful LLM API calls.")
+def _llm_calls():
+    yield {}, llm_usage["calls"]
+
+
+@metrics.registry.collector("llm_queue_depth", "gauge", "Calls waiting for a rate limiter slot, per lane.")
+def _llm_queue():
+    for name, depth in llm_limiter.stats()["queue_depth"].items():
+        yield {"lane": name}, depth
+    yield {"lane": "in_flight"}, llm_limiter.in_flight
+
+
+@metrics.registry.collector("extractions_total", "counter", "Extractions by the path that answered them.")
+def _extractions():
+    for path in ("fast", "cache", "llm"):
+        yield {"path": path}, extraction_paths[path]
+
+
+@metrics.registry.collector("db_pool_connections", "gauge", "Database pool connections by state.")
+def _db_pool():
+    return metrics.pool_samples({"sync": engine.pool, "async": async_engine.sync_engine.pool})
+
+
+@metrics.registry.collector("shard_engines", "gauge", "Per-user SQLite shards: open now, opened and evicted so far.")
+def _shard_engines():
+    if shards.pool is not None:
+        for state, n in shards.pool.stats().items():
+            yield {"state": state}, n
+
+
+@metrics.registry.collector("search_indexes", "gauge", "Similarity indexes loaded in memory and the rows they hold.")
+def _search_indexes():
+    for state, n in search_indexes.stats().items():
+        yield {"state": state}, n
+
+
+@metrics.registry.collector("job_queue_depth", "gauge", "Extraction job lines waiting for a worker.")
+def _job_queue_depth():
+    yield {}, _job_queue.qsize() if _job_queue is not None else 0
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: latency per route and stage, LLM usage, errors, pools, queues."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/process")
-def process_input(input: InputText):
+async def process_input(
+    input: InputText, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_user_session)
+):
     try:
-        extracted = extract_with_llm(input.text)
-        date_obj = datetime.datetime.strptime(extracted["date"], "%Y-%m-%d").date()
+        extracted, path = await extract(input.text, bypass_cache=input.bypass_cache, user_id=user_id)
+        with metrics.span("db"):
+            (tid,) = await repository.add_extracted(db, [extracted], user_id)
+        return {"status": "success", "id": tid, "extracted": extracted, "path": path}
+
+    except LlmUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after or 1))})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        db = SessionLocal()
+@app.post("/process/batch")
+async def process_batch(
+    input: BatchInput, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_user_session)
+):
+    texts = [t.strip() for t in input.texts]
+    if not texts:
+        return {"status": "success", "saved": 0, "results": []}
+
+    limit = min(input.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def _extract(text: str) -> Tuple[Dict[str, Any], str]:
+        if not text:
+            raise ValueError("Empty sentence")
+        async with sem:
+            return await extract(text, bypass_cache=input.bypass_cache, user_id=user_id)
+
+    # Fan the LLM calls out; wall time is bounded by the slowest call per wave
+    pack_size = input.pack_size or LLM_PACK_SIZE
+    with rate_limiter.lane(rate_limiter.BULK):
+        if pack_size > 1:
+            outcomes = await extract_packed(texts, pack_size, sem, bypass_cache=input.bypass_cache, user_id=user_id)
+        else:
+            outcomes = await asyncio.gather(*(_extract(t) for t in texts), return_exceptions=True)
+
+    results: List[Dict[str, Any]] = []
+    pending: List[Dict[str, Any]] = []
+    for i, (text, outcome) in enumerate(zip(texts, outcomes)):
+        if isinstance(outcome, Exception):
+            results.append({"index": i, "text": text, "ok": False, "error": str(outcome)})
+            continue
+        extracted, path = outcome
+        result = {"index": i, "text": text, "ok": True, "extracted": extracted, "path": path}
+        results.append(result)
+        pending.append(result)
+
+    if pending:
         try:
-            t = Transaction(
-                date=date_obj,
-                type=extracted["type"],
-                category=extracted["category"],
-                description=extracted["description"],
-                price=float(extracted["price"]),
-            )
-            db.add(t)
-            db.commit()
-            db.refresh(t)
-        finally:
-            db.close()
+            with metrics.span("db"):
+                ids = await repository.add_extracted(db, [r["extracted"] for r in pending], user_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        for result, tid in zip(pending, ids):
+            result["id"] = tid
+
+    return {"status": "success", "saved": len(pending), "results": results}
+
 
-        return {"status": "success", "id": t.id, "extracted": extracted}
+@app.post("/transactions/bulk")
+async def bulk_insert(
+    input: BulkInput, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_user_session)
+):
+    """Insert already-reviewed rows as-is; no LLM call involved.
+
+    Each row's (description, category) is also recorded as feedback and
+    learned by the user's category classifier.
+    """
+    if not input.transactions:
+        return {"status": "success", "saved": 0}
 
+    now = time.time()
+    rows = [dict(t.model_dump(exclude={"suggested_category"}), user_id=user_id) for t in input.transactions]
+    feedback = [
+        {
+            "user_id": user_id,
+            "description": t.description,
+            "category": t.category,
+            "suggested_category": t.suggested_category,
+            "created_at": now,
+        }
+        for t in input.transactions
+    ]
+    try:
+        with metrics.span("db"):
+            await repository.add_rows(db, rows, feedback)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    await run_in_threadpool(category_models.sync, user_id)
+
+    return {"status": "success", "saved": len(input.transactions)}
+
+
+async def check_not_modified(
+    read: repository.Reader, request: Request, response: Response, user_id: str
+) -> Optional[Response]:
+    """Tag the response with the data version; return a 304 if the client is current.
+
+    The ETag combines the data version with the user, path and query string, so
+    each user's filter combinations validate separately but all of them change
+    on any write.
+    """
+    with metrics.span("db"):
+        version, updated_at = await read(data_version.current)
+    resource = f"{user_id}:{request.url.path}?{sorted(request.query_params.multi_items())}"
+    etag = f'W/"{version}-{hashlib.sha1(resource.encode()).hexdigest()[:12]}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(updated_at, usegmt=True),
+        "Cache-Control": "no-cache",
+        "Vary": "X-User-ID",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+def encode_cursor(date: datetime.date, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{date.isoformat()},{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.date, int]:
+    try:
+        date, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return datetime.date.fromisoformat(date), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
+def encode_rows(rows: list) -> bytes:
+    """JSON array of TransactionOut-shaped objects, straight from transaction_rows() tuples."""
+    fields = repository.ROW_FIELDS
+    return orjson.dumps([dict(zip(fields, r)) for r in rows])
 
 
 @app.get("/transactions", response_model=List[TransactionOut])
-def get_transactions(
+async def get_transactions(
+    request: Request,
+    response: Response,
+    type: Optional[str] = Query(None, description="Filter by type: income or expense"),
+    category: Optional[str] = Query(None, description="Filter by category (partial match)"),
+    date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all rows"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    user_id: str = Depends(current_user),
+    read: repository.Reader = Depends(get_user_reader),
+):
+    """Newest first. With `limit`, rows are paged by (date desc, id desc) and the
+    cursor for the next page is returned in the X-Next-Cursor header.
+
+    Rows are selected as tuples and encoded once with orjson; response_model
+    only documents the schema, since returning a Response skips its validation.
+    """
+    not_modified = await check_not_modified(read, request, response, user_id)
+    if not_modified is not None:
+        return not_modified
+
+    filters = transaction_filters(user_id, type, category, date_from, date_to)
+    if cursor:
+        filters.append(repository.before(*decode_cursor(cursor)))
+
+    with metrics.span("db"):
+        rows = await read(repository.transaction_rows, filters, None if limit is None else limit + 1)
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(datetime.date.fromisoformat(last.date), last.id)
+    with metrics.span("serialize"):
+        body = encode_rows(rows)
+    return Response(body, media_type="application/json", headers=dict(response.headers))
+
+
+async def scored_rows(read: repository.Reader, user_id: str, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+    """The hits' rows in hit order, each with its score; ids no longer in the table are dropped."""
+    if not hits:
+        return []
+    with metrics.span("db"):
+        rows = await read(
+            repository.transaction_rows, [Transaction.user_id == user_id, Transaction.id.in_([id for id, _ in hits])]
+        )
+    by_id = {r.id: r for r in rows}
+    return [
+        dict(zip(repository.ROW_FIELDS, by_id[id]), score=score)
+        for id, score in hits
+        if id in by_id
+    ]
+
+
+@app.get("/transactions/search", response_model=List[SearchResult])
+async def search_transactions(
+    q: str = Query(..., min_length=1, max_length=500, description="Free text; typos and word fragments match"),
+    k: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS, description="Number of results"),
+    user_id: str = Depends(current_user),
+    read: repository.Reader = Depends(get_user_reader),
+):
+    """The user's rows whose description and category look most like `q`, best first."""
+    with metrics.span("search"):
+        hits = await run_in_threadpool(search_indexes.search, user_id, q, k)
+    return await scored_rows(read, user_id, hits)
+
+
+@app.get("/transactions/{transaction_id}/similar", response_model=List[SearchResult])
+async def similar_transactions(
+    transaction_id: int,
+    k: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS, description="Number of results"),
+    user_id: str = Depends(current_user),
+    read: repository.Reader = Depends(get_user_reader),
+):
+    """The user's other rows that look most like this one, best first."""
+    with metrics.span("db"):
+        rows = await read(repository.transaction_rows, [Transaction.user_id == user_id, Transaction.id == transaction_id])
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Unknown transaction: {transaction_id}")
+    text = search_index.row_text(rows[0].description, rows[0].category)
+
+    with metrics.span("search"):
+        hits = await run_in_threadpool(search_indexes.search, user_id, text, k, transaction_id)
+    return await scored_rows(read, user_id, hits)
+
+
+def net_series(rows, key: str) -> List[Dict[str, Any]]:
+    """Fold (bucket, type, total) rows into one income/expense/net point per bucket."""
+    series: Dict[str, Dict[str, Any]] = {}
+    for bucket, type_, total in rows:
+        bucket = bucket.strftime("%Y-%m-%d") if isinstance(bucket, datetime.date) else bucket
+        point = series.setdefault(bucket, {key: bucket, "income": 0.0, "expense": 0.0})
+        point[type_] = point.get(type_, 0.0) + float(total or 0.0)
+    for point in series.values():
+        point["net"] = point["income"] - point["expense"]
+    return [series[k] for k in sorted(series)]
+
+
+@app.get("/summary")
+async def get_summary(
+    request: Request,
+    response: Response,
+    date_from: Optional[str] = Query(None, description="From date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="To date (YYYY-MM-DD)"),
+    user_id: str = Depends(current_user),
+    read: repository.Reader = Depends(get_user_reader),
+):
+    """Dashboard aggregates, read from daily_rollups only; cost grows with days, not rows."""
+    not_modified = await check_not_modified(read, request, response, user_id)
+    if not_modified is not None:
+        return not_modified
+
+    with metrics.span("db"):
+        by_category, daily, monthly = await read(
+            repository.rollup_summary,
+            user_id,
+            datetime.datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else None,
+            datetime.datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else None,
+        )
+
+    totals = {"income": 0.0, "expense": 0.0, "count": 0}
+    for type_, _, total, count in by_category:
+        totals[type_] = totals.get(type_, 0.0) + float(total or 0.0)
+        totals["count"] += count
+    totals["net"] = totals["income"] - totals["expense"]
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": totals,
+        "by_category": [
+            {"type": t, "category": c, "total": float(total or 0.0), "count": n}
+            for t, c, total, n in by_category
+        ],
+        "daily": net_series(daily, "day"),
+        "monthly": net_series(monthly, "month"),
+    }
+
+
+def row_batches(user_id: str, filters: list) -> Iterator[list]:
+    """Matching rows, newest first, in STREAM_BATCH_SIZE lists from a server-side cursor."""
+    stmt = select(
+        Transaction.id,
+        Transaction.date,
+        Transaction.type,
+        Transaction.category,
+        Transaction.description,
+        Transaction.price,
+    ).order_by(Transaction.date.desc(), Transaction.id.desc())
+    if filters:
+        stmt = stmt.where(and_(*filters))
+
+    db = shards.session_for(user_id)
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+@app.get("/transactions/stream")
+async def stream_transactions(
     type: Optional[str] = Query(None, description="Filter by type: income or expense"),
     category: Optional[str] = Query(None, description="Filter by category (partial match)"),
     date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
+    user_id: str = Depends(current_user),
 ):
+    """Same rows as /transactions as NDJSON, one object per line, read through a
+    server-side cursor so memory stays flat regardless of result size."""
+    filters = transaction_filters(user_id, type, category, date_from, date_to)
+
+    def rows():
+        fields = repository.ROW_FIELDS
+        for batch in row_batches(user_id, filters):
+            # orjson writes dates as YYYY-MM-DD itself
+            yield b"".join(orjson.dumps(dict(zip(fields, r))) + b"\n" for r in batch)
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@app.get("/transactions/export")
+async def export_transactions(
+    format: Literal["csv", "parquet", "arrow"] = Query("csv", description="csv, parquet or arrow (IPC stream)"),
+    type: Optional[str] = Query(None, description="Filter by type: income or expense"),
+    category: Optional[str] = Query(None, description="Filter by category (partial match)"),
+    date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
+    user_id: str = Depends(current_user),
+):
+    """Download the filtered rows, encoded one cursor batch at a time."""
+    filters = transaction_filters(user_id, type, category, date_from, date_to)
+    try:
+        chunks = exporters.encode(format, row_batches(user_id, filters))
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=f"{format} export needs pyarrow: {e}")
+
+    return StreamingResponse(
+        chunks,
+        media_type=exporters.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{exporters.EXTENSIONS[format]}"'},
+    )
+
+
+def import_out(job) -> Dict[str, Any]:
+    out = {k: v for k, v in job._mapping.items() if k != "path"}
+    out["errors"] = json.loads(job.errors)
+    out["progress"] = job.rows_done / job.total_rows if job.total_rows else float(job.status == "done")
+    return out
+
+
+def get_import_job(job_id: str):
+    with engine.connect() as conn:
+        return conn.execute(select(importer.import_jobs).where(importer.import_jobs.c.id == job_id)).first()
+
+
+def update_import_job(job_id: str, **values) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            update(importer.import_jobs)
+            .where(importer.import_jobs.c.id == job_id)
+            .values(updated_at=time.time(), **values)
+        )
+
+
+def data_session(db, user_id: str):
+    """Where a background writer saves a user's transactions: `db` itself, or the user's shard.
+
+    A shard commits separately, just before `db`, so a crash in between
+    repeats that work on restart instead of losing it.
+    """
+    return shards.session_for(user_id) if shards.pool is not None else db
+
+
+def commit_import_chunk(
+    job_id: str, user_id: str, rows: List[Dict[str, Any]], consumed: int, extracted: int, errors: List[str]
+) -> None:
+    """Insert one chunk and advance the job's resume offset in a single transaction."""
+    imports = importer.import_jobs
     db = SessionLocal()
+    data = data_session(db, user_id)
     try:
-        query = db.query(Transaction)
-        filters = []
-
-        if type:
-            filters.append(Transaction.type == type)
-        if category:
-            filters.append(Transaction.category.ilike(f"%{category}%"))
-        if date_from:
-            dfrom = datetime.datetime.strptime(date_from, "%Y-%m-%d").date()
-            filters.append(Transaction.date >= dfrom)
-        if date_to:
-            dto = datetime.datetime.strptime(date_to, "%Y-%m-%d").date()
-            filters.append(Transaction.date <= dto)
-
-        if filters:
-            query = query.filter(and_(*filters))
-
-        rows = query.order_by(Transaction.date.desc(), Transaction.id.desc()).all()
-
-        return [
-            TransactionOut(
-                id=r.id,
-                date=r.date.strftime("%Y-%m-%d"),
-                type=r.type,
-                category=r.category,
-                description=r.description,
-                price=r.price,
+        if rows:
+            data.execute(insert(Transaction), rows)
+            record_inserts(data, [SimpleNamespace(**r) for r in rows])
+        if data is not db:
+            data.commit()
+        job = db.execute(select(imports.c.errors).where(imports.c.id == job_id)).one()
+        kept = (json.loads(job.errors) + errors)[: importer.MAX_ERRORS]
+        db.execute(
+            update(imports)
+            .where(imports.c.id == job_id)
+            .values(
+                rows_done=imports.c.rows_done + consumed,
+                inserted=imports.c.inserted + len(rows),
+                extracted=imports.c.extracted + extracted,
+                failed=imports.c.failed + len(errors),
+                errors=json.dumps(kept),
+                updated_at=time.time(),
             )
-            for r in rows
-        ]
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        data.rollback()
+        raise
     finally:
         db.close()
+        data.close()
+
+
+async def run_import_job(job_id: str) -> None:
+    job = await run_in_threadpool(get_import_job, job_id)
+    if job is None or job.status in ("done", "failed"):
+        return
+    await run_in_threadpool(update_import_job, job_id, status="running")
+
+    try:
+        # Jobs from before formats were fixed at upload settle theirs now
+        date_format, decimal = await run_in_threadpool(
+            importer.file_formats, job.path, job.format, job.date_format, job.decimal_separator
+        )
+        records = importer.iter_records(job.path, job.format)
+        line = job.rows_done
+        # Resume: skip what earlier runs already committed
+        await run_in_threadpool(lambda: next(islice(records, line, line), None))
+        sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        while True:
+            chunk = await run_in_threadpool(lambda: list(islice(records, IMPORT_CHUNK_SIZE)))
+            if not chunk:
+                break
+
+            rows: Dict[int, Dict[str, Any]] = {}
+            errors: List[str] = []
+            for record in chunk:
+                line += 1
+                try:
+                    rows[line] = dict(importer.normalize(record, date_format, decimal), user_id=job.user_id)
+                except ValueError as e:
+                    errors.append(f"Row {line}: {e}")
+
+            # The user's classifier categorizes what it is sure about without extraction
+            await run_in_threadpool(category_models.get, job.user_id)
+            for row in rows.values():
+                if row["category"] is None:
+                    row["category"] = category_models.predict(job.user_id, row["description"])
+                    learned_categories["import"] += row["category"] is not None
+
+            async def _fill(row: Dict[str, Any]) -> None:
+                async with sem:
+                    extracted, _ = await extract(row["description"], user_id=job.user_id)
+                row["type"] = row["type"] or extracted["type"]
+                row["category"] = row["category"] or extracted["category"]
+
+            # Only rows the columns could not classify go through extraction
+            missing = [n for n, r in rows.items() if r["type"] is None or r["category"] is None]
+            with rate_limiter.lane(rate_limiter.BULK):
+                outcomes = await asyncio.gather(*(_fill(rows[n]) for n in missing), return_exceptions=True)
+            for n, outcome in zip(missing, outcomes):
+                if isinstance(outcome, Exception):
+                    errors.append(f"Row {n}: extraction failed: {outcome}")
+                    del rows[n]
+
+            extracted = sum(1 for n in missing if n in rows)
+            with metrics.span("db"):
+                await run_in_threadpool(
+                    commit_import_chunk, job_id, job.user_id, list(rows.values()), len(chunk), extracted, errors
+                )
+    except Exception as e:
+        await run_in_threadpool(update_import_job, job_id, status="failed", error=str(e))
+        return
+
+    await run_in_threadpool(update_import_job, job_id, status="done")
+    try:
+        os.remove(job.path)
+    except OSError:
+        pass
+
+
+# Running imports; referenced so the tasks are not garbage collected
+_import_tasks: set = set()
+
+
+def start_import_job(job_id: str) -> None:
+    """Run the import on its own task, outside the request or startup that asked for it.
+
+    The fresh context keeps the job's spans out of the request's
+    Server-Timing, and POST /import latency ends once the job is stored.
+    """
+    task = asyncio.create_task(run_import_job(job_id), context=contextvars.Context())
+    _import_tasks.add(task)
+    task.add_done_callback(_import_tasks.discard)
+
+
+def resume_import_jobs() -> None:
+    """Restart jobs that were pending or running when the server last stopped."""
+    imports = importer.import_jobs
+    with engine.connect() as conn:
+        ids = conn.execute(select(imports.c.id).where(imports.c.status.in_(["pending", "running"]))).scalars().all()
+    for job_id in ids:
+        start_import_job(job_id)
+
+
+@app.post("/import")
+async def start_import(
+    request: Request,
+    format: Literal["csv", "ofx"] = Query("csv", description="csv or ofx"),
+    filename: Optional[str] = Query(None, description="Original file name, for display"),
+    date_format: Optional[str] = Query(
+        None, max_length=32, description="strptime format of the dates, e.g. %m/%d/%Y; detected if omitted"
+    ),
+    decimal_separator: Optional[Literal[".", ","]] = Query(
+        None, description="Decimal separator of the amounts, . or ,; detected if omitted"
+    ),
+    user_id: str = Depends(current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Upload a statement as the raw request body and import it in the background.
+
+    Rows with type and category go straight in, in IMPORT_CHUNK_SIZE batches;
+    only rows missing either are sent through the extraction path. Poll
+    GET /import/{job_id} for progress.
+
+    The whole file is read with one date format and one decimal separator,
+    detected from its first rows; a file whose dates fit several (all days
+    12 or less) or whose amounts read either way ("1.500") is refused with
+    400 unless date_format or decimal_separator is given.
+    """
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(IMPORT_DIR, f"{job_id}.{format}")
+
+    with open(path, "wb") as f:
+        async for chunk in request.stream():
+            await run_in_threadpool(f.write, chunk)
+    try:
+        date_format, decimal_separator = await run_in_threadpool(
+            importer.file_formats, path, format, date_format, decimal_separator
+        )
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    total = await run_in_threadpool(importer.count_records, path, format)
+
+    now = time.time()
+    await db.execute(
+        insert(importer.import_jobs).values(
+            id=job_id,
+            user_id=user_id,
+            format=format,
+            filename=filename,
+            path=path,
+            date_format=date_format,
+            decimal_separator=decimal_separator,
+            status="pending",
+            total_rows=total,
+            created_at=now,
+            updated_at=now,
+        )
+    )
+    await db.commit()
+
+    start_import_job(job_id)
+    return import_out(await repository.get_row(db, importer.import_jobs, job_id))
+
+
+async def owned_job(db: AsyncSession, table, job_id: str, user_id: str, kind: str = "job"):
+    """The job row, or 404 when it does not exist or belongs to another user."""
+    job = await repository.get_row(db, table, job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail=f"Unknown {kind}: {job_id}")
+    return job
+
+
+@app.get("/import/{job_id}")
+async def import_status(
+    job_id: str, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_session)
+):
+    return import_out(await owned_job(db, importer.import_jobs, job_id, user_id, "import job"))
+
+
+# Extraction jobs: sentences are queued per line and drained by JOB_WORKERS workers
+job_events = jobs.JobEvents()
+_job_queue: Optional[asyncio.Queue] = None
+_job_workers: List[asyncio.Task] = []
+# In-flight extractions per job, so a cancel can stop them mid-call
+_job_inflight: Dict[str, set] = {}
+_cancelled_jobs: set = set()
+
+# Seconds between SSE comments that keep idle proxies from closing the stream
+JOB_KEEPALIVE_SEC = 15
+
+
+def extraction_job_out(job) -> Dict[str, Any]:
+    out = dict(job._mapping)
+    finished = job.succeeded + job.failed + job.cancelled
+    out["progress"] = finished / job.total if job.total else 1.0
+    return out
+
+
+def job_item_out(item) -> Dict[str, Any]:
+    """One line's result, shaped like a /process/batch result."""
+    out = {"index": item.idx, "text": item.text, "status": item.status, "ok": item.status == "done"}
+    if item.status == "done":
+        out.update(extracted=json.loads(item.result), path=item.path, id=item.transaction_id)
+    elif item.error:
+        out["error"] = item.error
+    return out
+
+
+def get_extraction_job(job_id: str):
+    with engine.connect() as conn:
+        return conn.execute(select(jobs.extraction_jobs).where(jobs.extraction_jobs.c.id == job_id)).first()
+
+
+def get_job_items(job_id: str, finished_only: bool = False) -> list:
+    items = jobs.job_items
+    query = select(items).where(items.c.job_id == job_id).order_by(items.c.idx)
+    if finished_only:
+        query = query.where(items.c.status != "pending")
+    with engine.connect() as conn:
+        return conn.execute(query).all()
+
+
+def create_extraction_job(job_id: str, user_id: str, texts: List[str], bypass_cache: bool, save: bool) -> None:
+    empty = sum(1 for t in texts if not t)
+    now = time.time()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(jobs.extraction_jobs).values(
+                id=job_id,
+                user_id=user_id,
+                status="done" if empty == len(texts) else "pending",
+                total=len(texts),
+                failed=empty,
+                bypass_cache=bypass_cache,
+                save=save,
+                created_at=now,
+                updated_at=now,
+            )
+        )
+        if texts:
+            conn.execute(
+                insert(jobs.job_items),
+                [
+                    {
+                        "job_id": job_id,
+                        "idx": i,
+                        "text": text,
+                        "status": "pending" if text else "failed",
+                        "error": None if text else "Empty sentence",
+                    }
+                    for i, text in enumerate(texts)
+                ],
+            )
+
+
+def finish_job_item(
+    job_id: str,
+    user_id: str,
+    idx: int,
+    extracted: Optional[Dict[str, Any]],
+    path: Optional[str],
+    error: Optional[str],
+):
+    """Save one line's result (and transaction, if the job saves) and bump the job's counters in one DB transaction.
+
+    Returns (item, job), or None when the line was cancelled meanwhile.
+    """
+    ejobs, items = jobs.extraction_jobs, jobs.job_items
+    db = SessionLocal()
+    data = data_session(db, user_id)
+    try:
+        # Claim the line first; a cancel that already marked it wins
+        claimed = db.execute(
+            update(items)
+            .where(items.c.job_id == job_id, items.c.idx == idx, items.c.status == "pending")
+            .values(status="done" if error is None else "failed", error=error)
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return None
+
+        if error is None:
+            values = {"result": json.dumps(extracted), "path": path}
+            if db.execute(select(ejobs.c.save).where(ejobs.c.id == job_id)).scalar_one():
+                t = new_transaction(extracted, user_id)
+                data.add(t)
+                data.flush()
+                record_inserts(data, [t])
+                if data is not db:
+                    data.commit()
+                values["transaction_id"] = t.id
+            db.execute(update(items).where(items.c.job_id == job_id, items.c.idx == idx).values(**values))
+
+        counter = ejobs.c.succeeded if error is None else ejobs.c.failed
+        finished = ejobs.c.succeeded + ejobs.c.failed + ejobs.c.cancelled + 1
+        db.execute(
+            update(ejobs)
+            .where(ejobs.c.id == job_id)
+            .values(
+                {
+                    counter: counter + 1,
+                    ejobs.c.status: case((finished >= ejobs.c.total, "done"), else_="running"),
+                    ejobs.c.updated_at: time.time(),
+                }
+            )
+        )
+        item = db.execute(select(items).where(items.c.job_id == job_id, items.c.idx == idx)).one()
+        job = db.execute(select(ejobs).where(ejobs.c.id == job_id)).one()
+        db.commit()
+        return item, job
+    except Exception:
+        db.rollback()
+        data.rollback()
+        raise
+    finally:
+        db.close()
+        data.close()
+
+
+async def run_job_item(job_id: str, user_id: str, idx: int, text: str, bypass_cache: bool) -> None:
+    if job_id in _cancelled_jobs:
+        return
+    with rate_limiter.lane(rate_limiter.BULK):
+        task = asyncio.ensure_future(extract(text, bypass_cache=bypass_cache, user_id=user_id))
+    inflight = _job_inflight.setdefault(job_id, set())
+    inflight.add(task)
+    try:
+        await asyncio.wait({task})
+    finally:
+        task.cancel()
+        inflight.discard(task)
+        if not inflight:
+            _job_inflight.pop(job_id, None)
+
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        with metrics.span("db"):
+            outcome = await run_in_threadpool(finish_job_item, job_id, user_id, idx, None, None, str(task.exception()))
+    else:
+        extracted, path = task.result()
+        try:
+            with metrics.span("db"):
+                outcome = await run_in_threadpool(finish_job_item, job_id, user_id, idx, extracted, path, None)
+        except Exception as e:
+            # e.g. an extraction that does not fit the table; the line fails, the job goes on
+            with metrics.span("db"):
+                outcome = await run_in_threadpool(finish_job_item, job_id, user_id, idx, None, None, f"Could not save: {e}")
+    publish_job_item(job_id, outcome)
+
+
+def publish_job_item(job_id: str, outcome) -> None:
+    """Send a finished line, and the job's end if it was the last, to the job's listeners."""
+    if outcome is None:
+        return
+    item, job = outcome
+    job_events.publish(job_id, "result", job_item_out(item))
+    if job.status in jobs.FINISHED:
+        job_events.publish(job_id, "end", extraction_job_out(job))
+
+
+async def job_worker(queue: asyncio.Queue) -> None:
+    while True:
+        job_id, user_id, idx, text, bypass_cache = await queue.get()
+        try:
+            await run_job_item(job_id, user_id, idx, text, bypass_cache)
+        except Exception as e:
+            # Fail the line so the job still finishes and its listeners get `end`; keep the worker alive
+            logger.exception("Extraction job %s line %d failed", job_id, idx)
+            metrics.errors.inc(cause="job_worker")
+            try:
+                outcome = await run_in_threadpool(
+                    finish_job_item, job_id, user_id, idx, None, None, f"Internal error: {e}"
+                )
+                publish_job_item(job_id, outcome)
+            except Exception:
+                # e.g. the database is down; the line stays pending and is retried at the next startup
+                logger.exception("Could not record the failure of job %s line %d", job_id, idx)
+        finally:
+            queue.task_done()
+
+
+async def start_job_workers() -> None:
+    """Start the worker pool and queue every line left pending by the last run."""
+    global _job_queue
+    _job_queue = asyncio.Queue()
+    _job_workers.extend(asyncio.create_task(job_worker(_job_queue)) for _ in range(max(1, JOB_WORKERS)))
+
+    ejobs, items = jobs.extraction_jobs, jobs.job_items
+    query = (
+        select(items.c.job_id, ejobs.c.user_id, items.c.idx, items.c.text, ejobs.c.bypass_cache)
+        .join(ejobs, ejobs.c.id == items.c.job_id)
+        .where(items.c.status == "pending", ejobs.c.status.in_(["pending", "running"]))
+        .order_by(ejobs.c.created_at, items.c.idx)
+    )
+    with engine.connect() as conn:
+        for row in conn.execute(query):
+            _job_queue.put_nowait(tuple(row))
+
+
+async def stop_job_workers() -> None:
+    global _job_queue
+    for task in _job_workers:
+        task.cancel()
+    await asyncio.gather(*_job_workers, return_exceptions=True)
+    _job_workers.clear()
+    _job_queue = None
+
+
+@app.post("/jobs")
+async def submit_job(
+    input: JobInput, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_session)
+):
+    """Queue sentences for extraction and return at once.
+
+    Each line is extracted and saved as soon as a worker picks it up;
+    with save=false it is only extracted, and the caller saves the rows it
+    keeps (the Input page reviews them and posts /transactions/bulk).
+    Poll GET /jobs/{job_id} or follow GET /jobs/{job_id}/events.
+    """
+    if _job_queue is None:
+        raise HTTPException(status_code=503, detail="Job workers are not running")
+    texts = [t.strip() for t in input.texts]
+    job_id = uuid.uuid4().hex
+    await run_in_threadpool(create_extraction_job, job_id, user_id, texts, input.bypass_cache, input.save)
+    job = extraction_job_out(await repository.get_row(db, jobs.extraction_jobs, job_id))
+    for i, text in enumerate(texts):
+        if text:
+            _job_queue.put_nowait((job_id, user_id, i, text, input.bypass_cache))
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(
+    job_id: str,
+    results: bool = Query(True, description="Include finished lines' results"),
+    user_id: str = Depends(current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    out = extraction_job_out(await owned_job(db, jobs.extraction_jobs, job_id, user_id))
+    if results:
+        out["results"] = [job_item_out(item) for item in await repository.finished_job_items(db, job_id)]
+    return out
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_session)):
+    """Stop a job: queued lines are skipped and in-flight extractions abandoned.
+
+    Lines that already finished stay saved.
+    """
+    ejobs, items = jobs.extraction_jobs, jobs.job_items
+
+    def _cancel():
+        with engine.begin() as conn:
+            job = conn.execute(
+                select(ejobs.c.status).where(ejobs.c.id == job_id, ejobs.c.user_id == user_id)
+            ).first()
+            if job is None or job.status in jobs.FINISHED:
+                return job
+            n = conn.execute(
+                update(items)
+                .where(items.c.job_id == job_id, items.c.status == "pending")
+                .values(status="cancelled", error="Cancelled")
+            ).rowcount
+            conn.execute(
+                update(ejobs)
+                .where(ejobs.c.id == job_id)
+                .values(status="cancelled", cancelled=ejobs.c.cancelled + n, updated_at=time.time())
+            )
+            return job
+
+    if await run_in_threadpool(_cancel) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    _cancelled_jobs.add(job_id)
+    for task in list(_job_inflight.get(job_id, ())):
+        task.cancel()
+
+    job = extraction_job_out(await repository.get_row(db, jobs.extraction_jobs, job_id))
+    if job["status"] == "cancelled":
+        job_events.publish(job_id, "end", job)
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_event_stream(
+    job_id: str, user_id: str = Depends(current_user), db: AsyncSession = Depends(get_session)
+):
+    """Server-Sent Events: one `result` per finished line, then `end` with the job.
+
+    Lines finished before the client connected are replayed first.
+    """
+    await owned_job(db, jobs.extraction_jobs, job_id, user_id)
+
+    async def events():
+        queue = job_events.subscribe(job_id)
+        try:
+            # Read the job before its items: if it is finished, so are all the items read
+            job = await run_in_threadpool(get_extraction_job, job_id)
+            items = await run_in_threadpool(get_job_items, job_id, True)
+            seen = {item.idx for item in items}
+            for item in items:
+                yield jobs.sse("result", json.dumps(job_item_out(item)))
+            if job.status in jobs.FINISHED:
+                yield jobs.sse("end", json.dumps(extraction_job_out(job)))
+                return
+
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(queue.get(), JOB_KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if kind == "result" and data["index"] in seen:
+                    continue
+                yield jobs.sse(kind, json.dumps(data))
+                if kind == "end":
+                    return
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,122 @@
+"""/transactions throughput and tail latency: the current route vs the old sync one.
+
+The sync variant is the pre-async implementation (blocking ORM query in a
+threadpool worker), mounted next to the real route so both run against
+the same seeded database and the same ASGI app. Each run fires --clients
+concurrent clients, each requesting one page per iteration.
+
+On SQLite the current route reads through repository.Reader on the sync
+engine too; run with an async-capable DATABASE_URL to compare run_sync.
+
+    cd Demo/backend
+    python -m benchmarks.bench_async_reads --rows 100000 --clients 200
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from typing import List, Optional
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import httpx  # noqa: E402
+from fastapi import Query  # noqa: E402
+from sqlalchemy.sql import and_  # noqa: E402
+
+import app as backend  # noqa: E402
+from app import Transaction, TransactionOut  # noqa: E402
+from benchmarks.bench_indexes import seed  # noqa: E402
+
+
+@backend.app.get("/bench/transactions-sync", response_model=List[TransactionOut])
+def transactions_sync(
+    type: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+):
+    db = backend.SessionLocal()
+    try:
+        backend.data_version.current(db)  # the ETag lookup the real route does
+        query = db.query(Transaction)
+        filters = backend.transaction_filters(backend.DEFAULT_USER_ID, type, None, date_from, None)
+        if filters:
+            query = query.filter(and_(*filters))
+        query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+        return [
+            TransactionOut(
+                id=r.id,
+                date=r.date.strftime("%Y-%m-%d"),
+                type=r.type,
+                category=r.category,
+                description=r.description,
+                price=r.price,
+            )
+            for r in query.limit(limit).all()
+        ]
+    finally:
+        db.close()
+
+
+async def run(path: str, clients: int, iterations: int, limit: int):
+    rng = random.Random(7)
+    latencies: List[float] = []
+    failures = 0
+
+    async def client(ac: httpx.AsyncClient) -> None:
+        nonlocal failures
+        for _ in range(iterations):
+            params = {"limit": limit, "type": rng.choice(["income", "expense"]),
+                      "date_from": f"20{rng.randint(16, 24)}-01-01"}
+            start = time.perf_counter()
+            r = await ac.get(path, params=params)
+            latencies.append(time.perf_counter() - start)
+            failures += r.status_code != 200
+
+    async with backend.lifespan(backend.app):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as ac:
+            await client_warmup(ac, path, limit)
+            start = time.perf_counter()
+            await asyncio.gather(*(client(ac) for _ in range(clients)))
+            elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: round(latencies[round(q * (len(latencies) - 1))] * 1000, 1)  # noqa: E731
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "failed": failures,
+        "req_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": pick(0.5),
+        "p99_ms": pick(0.99),
+    }
+
+
+async def client_warmup(ac: httpx.AsyncClient, path: str, limit: int) -> None:
+    for _ in range(5):
+        await ac.get(path, params={"limit": limit})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=10, help="requests per client")
+    parser.add_argument("--limit", type=int, default=50, help="page size")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    report = {
+        "rows": args.rows,
+        "clients": args.clients,
+        "sync": asyncio.run(run("/bench/transactions-sync", args.clients, args.iterations, args.limit)),
+        "async": asyncio.run(run("/transactions", args.clients, args.iterations, args.limit)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Query plans and latency for each /transactions filter combination.
+
+Seeds a throwaway SQLite database, then for every filter combination
+prints EXPLAIN QUERY PLAN and the p50/p95 latency of the first page
+(limit 100) and of the full result.
+
+    cd Demo/backend
+    python -m benchmarks.bench_indexes --rows 1000000
+"""
+import os
+import json
+import time
+import argparse
+import datetime
+import itertools
+import statistics
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.sql import and_  # noqa: E402
+
+import app as backend  # noqa: E402
+from app import Transaction  # noqa: E402
+from benchmarks import generator  # noqa: E402
+
+
+def seed(n: int) -> None:
+    # Dated up to today so the "last 30 days" filters below select recent rows
+    generator.seed(backend.engine, n, end=datetime.date.today())
+
+
+def statement(filters, limit):
+    stmt = select(Transaction).order_by(Transaction.date.desc(), Transaction.id.desc())
+    if filters:
+        stmt = stmt.where(and_(*filters))
+    return stmt.limit(limit) if limit else stmt
+
+
+def measure(filters, limit, repeats):
+    stmt = statement(filters, limit)
+    timings = []
+    with backend.engine.connect() as conn:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            conn.execute(stmt).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[round(0.95 * (len(timings) - 1))], 2),
+    }
+
+
+def query_plan(filters):
+    sql = str(statement(filters, 100).compile(backend.engine, compile_kwargs={"literal_binds": True}))
+    with backend.engine.connect() as conn:
+        return [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    seed(args.rows)
+    seeded_sec = time.perf_counter() - t0
+
+    today = datetime.date.today()
+    options = {
+        "type": [None, "expense"],
+        "category": [None, "food"],
+        "date_from": [None, (today - datetime.timedelta(days=30)).isoformat()],
+        "date_to": [None, today.isoformat()],
+    }
+
+    report = {"rows": args.rows, "seed_sec": round(seeded_sec, 1), "queries": []}
+    for combo in itertools.product(*options.values()):
+        params = dict(zip(options, combo))
+        filters = backend.transaction_filters(backend.DEFAULT_USER_ID, **params)
+        plan = query_plan(filters)
+        report["queries"].append({
+            "filters": {k: v for k, v in params.items() if v},
+            "plan": plan,
+            "full_table_scan": "SCAN transactions" in plan,
+            "first_page": measure(filters, 100, args.repeats),
+            "all_rows": measure(filters, None, max(1, args.repeats // 10)),
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Per-sentence vs packed LLM extraction against the stub LLM.
+
+    cd Demo/backend
+    python -m benchmarks.bench_packing --sentences 50 --pack-size 10
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+import app as backend  # noqa: E402
+from stub_llm import StubServer  # noqa: E402
+
+
+async def run(texts, pack_size, concurrency):
+    backend.llm_usage.clear()
+    sem = asyncio.Semaphore(concurrency)
+    async with backend.lifespan(backend.app):
+        start = time.perf_counter()
+        if pack_size > 1:
+            outcomes = await backend.extract_packed(texts, pack_size, sem, bypass_cache=True)
+        else:
+            async def one(text):
+                async with sem:
+                    return await backend.extract_with_llm(text)
+            outcomes = await asyncio.gather(*(one(t) for t in texts), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "pack_size": pack_size,
+        "wall_sec": round(elapsed, 3),
+        "failed": sum(isinstance(o, Exception) for o in outcomes),
+        "calls": backend.llm_usage["calls"],
+        "prompt_tokens": backend.llm_usage["prompt_tokens"],
+        "completion_tokens": backend.llm_usage["completion_tokens"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=50)
+    parser.add_argument("--pack-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=backend.BATCH_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per call")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="stub seconds per output token")
+    args = parser.parse_args()
+
+    # Sentences the rule-based fast path does not answer
+    texts = [f"Team lunch number {i}, my share was {i + 10}" for i in range(args.sentences)]
+
+    with StubServer(latency=args.latency, token_latency=args.token_latency) as stub:
+        backend.LLM_API_URL = stub.url
+        report = {
+            "sentences": args.sentences,
+            "concurrency": args.concurrency,
+            "per_sentence": asyncio.run(run(texts, 1, args.concurrency)),
+            "packed": asyncio.run(run(texts, args.pack_size, args.concurrency)),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Similarity index build time, size and query latency over generated rows.
+
+Rows come from the deterministic generator and are indexed in memory in
+--batch sized appends and merged once, as one catch-up sync of the API
+would; the database is not involved. Each query is timed --repeat
+times, then a fresh row is appended to time a query that also reads the
+unmerged delta.
+
+    cd Demo/backend
+    python -m benchmarks.bench_search --rows 1000000
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+import tempfile
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import search_index  # noqa: E402
+from benchmarks.generator import generate  # noqa: E402
+
+QUERIES = ["sushi", "uber", "starbuks cofee", "fresh mart groceries", "rent", "concert tickets"]
+
+
+def timed(index: search_index.SimilarityIndex, q: str, repeat: int) -> dict:
+    latencies: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.query(q, 10)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[round(0.99 * (len(latencies) - 1))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=search_index.SYNC_BATCH, help="rows per append")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    args = parser.parse_args()
+
+    index = search_index.SimilarityIndex()
+    next_id = 1
+    build_sec = 0.0  # indexing only, not generating
+    for batch in generate(args.rows, chunk=args.batch):
+        texts = [search_index.row_text(r["description"], r["category"]) for r in batch]
+        t0 = time.perf_counter()
+        index.add(range(next_id, next_id + len(batch)), texts)
+        build_sec += time.perf_counter() - t0
+        next_id += len(batch)
+    t0 = time.perf_counter()
+    index.merge()
+    build_sec += time.perf_counter() - t0
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.npz")
+    t0 = time.perf_counter()
+    index.save(path)
+    save_sec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    index = search_index.SimilarityIndex.load(path)
+    load_sec = time.perf_counter() - t0
+
+    queries = {q: timed(index, q, args.repeat) for q in QUERIES}
+    index.add([next_id], ["Sushi Go takeaway"])
+    queries["sushi takeaway (with delta)"] = timed(index, "sushi takeaway", args.repeat)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "build_sec": round(build_sec, 2),
+        "save_sec": round(save_sec, 2),
+        "load_sec": round(load_sec, 2),
+        "file_mb": round(os.path.getsize(path) / 2 ** 20, 1),
+        "queries": queries,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
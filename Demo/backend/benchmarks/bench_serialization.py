@@ -0,0 +1,98 @@
+"""Fetch + serialization cost of a /transactions response, per 100k rows.
+
+Compares the previous handler path (ORM objects, a TransactionOut model
+per row with strftime, response_model validation, stdlib json) against
+the current one (column tuples with the date formatted in SQL, encoded
+once with orjson). Both read the same seeded SQLite database through the
+same sync session, so the difference is object building and encoding.
+
+    cd Demo/backend
+    python -m benchmarks.bench_serialization --rows 100000
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+import tempfile
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+import app as backend  # noqa: E402
+import repository  # noqa: E402
+from app import Transaction, TransactionOut  # noqa: E402
+from benchmarks.bench_indexes import seed  # noqa: E402
+
+RESPONSE = TypeAdapter(List[TransactionOut])
+
+
+def orm_path(db):
+    start = time.perf_counter()
+    rows = db.query(Transaction).order_by(Transaction.date.desc(), Transaction.id.desc()).all()
+    fetched = time.perf_counter()
+    models = [
+        TransactionOut(
+            id=r.id,
+            date=r.date.strftime("%Y-%m-%d"),
+            type=r.type,
+            category=r.category,
+            description=r.description,
+            price=r.price,
+        )
+        for r in rows
+    ]
+    # What FastAPI does with a response_model: validate again, dump, json-encode
+    body = json.dumps(RESPONSE.dump_python(RESPONSE.validate_python(models), mode="json")).encode()
+    return fetched - start, time.perf_counter() - fetched, body
+
+
+def tuple_path(db):
+    t = Transaction
+    stmt = select(
+        t.id, repository.iso_date(t.date, backend.engine.dialect.name).label("date"),
+        t.type, t.category, t.description, t.price,
+    ).order_by(t.date.desc(), t.id.desc())
+    start = time.perf_counter()
+    rows = db.execute(stmt).all()
+    fetched = time.perf_counter()
+    body = backend.encode_rows(rows)
+    return fetched - start, time.perf_counter() - fetched, body
+
+
+def measure(fn, repeat: int, rows: int):
+    fetch, encode = [], []
+    body = b""
+    with backend.SessionLocal() as db:
+        for _ in range(repeat):
+            f, e, body = fn(db)
+            fetch.append(f)
+            encode.append(e)
+            db.expunge_all()
+    scale = 100_000 / rows
+    return {
+        "fetch_ms_per_100k": round(statistics.median(fetch) * scale * 1000, 1),
+        "serialize_ms_per_100k": round(statistics.median(encode) * scale * 1000, 1),
+        "total_ms_per_100k": round(statistics.median([a + b for a, b in zip(fetch, encode)]) * scale * 1000, 1),
+        "bytes": len(body),
+    }, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    orm, orm_body = measure(orm_path, args.repeat, args.rows)
+    lean, lean_body = measure(tuple_path, args.repeat, args.rows)
+    assert json.loads(orm_body) == json.loads(lean_body), "the two paths must produce the same JSON"
+    print(json.dumps({"rows": args.rows, "orm_pydantic_json": orm, "tuples_orjson": lean}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
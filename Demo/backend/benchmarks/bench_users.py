@@ -0,0 +1,118 @@
+"""One user's /transactions and /summary latency as the number of users grows.
+
+Every user gets --rows-per-user generated rows; the measured user's
+latency should stay flat from 1 to 100 users, whether all users share
+the main database (queries lead on the user_id indexes) or each has its
+own SQLite file (SHARD_PER_USER=1). Each (mode, users) point runs in its
+own process against a fresh database.
+
+    cd Demo/backend
+    python -m benchmarks.bench_users --rows-per-user 20000 --users 1 10 100
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import tempfile
+import subprocess
+from typing import Any, Dict, List
+
+MEASURED_USER = "user-0"
+
+# name, path, query parameters
+QUERIES = [
+    ("transactions page", "/transactions", {"limit": 100}),
+    ("transactions category", "/transactions", {"limit": 100, "category": "food"}),
+    ("summary 365 days", "/summary", {"date_from": "2025-01-01", "date_to": "2025-12-31"}),
+    ("summary all time", "/summary", {}),
+]
+
+
+async def measure(repeat: int) -> Dict[str, Any]:
+    import httpx
+    import app as backend
+
+    results: Dict[str, Any] = {}
+    async with backend.lifespan(backend.app):
+        transport = httpx.ASGITransport(app=backend.app)
+        headers = {"X-User-ID": MEASURED_USER}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as ac:
+            for name, path, params in QUERIES:
+                await ac.get(path, params=params)
+                latencies: List[float] = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    r = await ac.get(path, params=params)
+                    latencies.append(time.perf_counter() - start)
+                    r.raise_for_status()
+                latencies.sort()
+                results[name] = {
+                    "p50_ms": round(statistics.median(latencies) * 1000, 2),
+                    "p99_ms": round(latencies[round(0.99 * (len(latencies) - 1))] * 1000, 2),
+                }
+    return results
+
+
+def child(args) -> None:
+    from sqlalchemy import insert, text
+
+    import app as backend
+    import data_version
+    import rollups
+    from benchmarks import generator
+
+    t0 = time.perf_counter()
+    engines = {}
+    for n in range(args.child_users):
+        user_id = f"user-{n}"
+        engine = backend.shards.engine_for(user_id)
+        with engine.begin() as conn:
+            for batch in generator.generate(args.rows_per_user, seed=n, user_id=user_id):
+                conn.execute(insert(backend.Transaction), batch)
+        engines[id(engine)] = engine
+    # Rollups once per database rather than after every user
+    for engine in engines.values():
+        with engine.begin() as conn:
+            rollups.rebuild(conn, backend.Transaction.__table__)
+            data_version.bump(conn)
+            conn.execute(text("ANALYZE"))
+    seed_sec = round(time.perf_counter() - t0, 1)
+    result = asyncio.run(measure(args.repeat))
+    print(json.dumps({"users": args.child_users, "seed_sec": seed_sec, "queries": result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows-per-user", type=int, default=20_000)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=50, help="requests per query")
+    parser.add_argument("--child-users", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_users is not None:
+        child(args)
+        return
+
+    report: Dict[str, List[Dict[str, Any]]] = {}
+    for mode, shard in (("shared", "0"), ("shard_per_user", "1")):
+        report[mode] = []
+        for users in args.users:
+            tmp = tempfile.mkdtemp()
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                SHARD_PER_USER=shard,
+                SHARD_DIR=os.path.join(tmp, "shards"),
+            )
+            cmd = [sys.executable, "-m", "benchmarks.bench_users", "--child-users", str(users),
+                   "--rows-per-user", str(args.rows_per_user), "--repeat", str(args.repeat)]
+            out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+            report[mode].append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps({"rows_per_user": args.rows_per_user, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Deterministic synthetic transactions for benchmarks.
+
+The same (rows, seed, end) always produces the same rows in the same
+order, so numbers from different runs and machines compare like for
+like. Rows are spread evenly over YEARS years ending at `end`, oldest
+first (the order a real ledger grows in), with a category mix, price
+distribution and merchant names per category:
+
+    python -m benchmarks.generator --rows 1000000 --url sqlite:////tmp/bench.db
+
+seeds a database file once; the suite and the other benchmarks can then
+be pointed at it with DATABASE_URL instead of seeding on every run.
+"""
+import os
+import math
+import time
+import random
+import argparse
+import datetime
+import itertools
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import Engine
+
+import data_version
+import rollups
+from models import DEFAULT_USER_ID, Transaction
+
+# Fixed rather than today, so a seeded database does not drift between runs
+END = datetime.date(2025, 12, 31)
+YEARS = 10
+
+# category, type, relative frequency, median price, spread (lognormal sigma), merchants
+PROFILES = [
+    ("food", "expense", 30, 14.0, 0.5, ["Cafe Nero", "Burger Barn", "Sushi Go", "Noodle House", "Pizza Place"]),
+    ("groceries", "expense", 18, 45.0, 0.6, ["FreshMart", "Green Grocer", "SuperSave", "Corner Shop"]),
+    ("transportation", "expense", 15, 9.0, 0.7, ["Metro", "City Taxi", "RideShare", "Fuel Stop"]),
+    ("shopping", "expense", 8, 60.0, 0.9, ["Online Store", "Mall Outlet", "Book Nook", "Tech Hub"]),
+    ("entertainment", "expense", 6, 25.0, 0.7, ["Cinema", "Streaming Plus", "Concert Hall", "Game Store"]),
+    ("utilities", "expense", 4, 80.0, 0.4, ["Power Co", "Water Board", "Fibre Net", "Mobile Plan"]),
+    ("health", "expense", 3, 40.0, 0.8, ["Pharmacy", "Dental Care", "Gym Membership"]),
+    ("housing", "expense", 2, 1400.0, 0.15, ["Rent", "Building Management"]),
+    ("Travel", "expense", 2, 350.0, 0.9, ["Airline", "Hotel Booking", "Rail Pass"]),
+    ("Education", "expense", 1, 120.0, 0.8, ["Online Course", "Bookshop"]),
+    ("Gifts", "expense", 1, 50.0, 0.8, ["Gift Shop", "Florist"]),
+    ("Pets", "expense", 1, 35.0, 0.6, ["Pet Store", "Vet Clinic"]),
+    ("salary", "income", 2, 4200.0, 0.1, ["Employer payroll"]),
+    ("bonus", "income", 0.3, 1500.0, 0.6, ["Employer bonus"]),
+    ("freelance", "income", 0.7, 600.0, 0.7, ["Client invoice", "Consulting"]),
+]
+
+_CUM_WEIGHTS = list(itertools.accumulate(p[2] for p in PROFILES))
+_NOTES = ["", "", "", " (card)", " (cash)", " with friends", " - weekly", " - refund pending"]
+
+
+def generate(
+    rows: int, seed: int = 42, end: datetime.date = END, chunk: int = 50_000, user_id: str = DEFAULT_USER_ID
+) -> Iterator[List[Dict[str, Any]]]:
+    """Transaction rows for one user as insert-ready dicts, `chunk` at a time."""
+    rng = random.Random(seed)
+    days = YEARS * 365
+    start = end - datetime.timedelta(days=days - 1)
+    batch: List[Dict[str, Any]] = []
+    for i in range(rows):
+        category, type_, _, median, sigma, merchants = rng.choices(PROFILES, cum_weights=_CUM_WEIGHTS)[0]
+        price = median * math.exp(rng.gauss(0, sigma))
+        batch.append({
+            "user_id": user_id,
+            "date": start + datetime.timedelta(days=i * days // rows),
+            "type": type_,
+            "category": category,
+            "category_lc": category.lower(),
+            "description": f"{rng.choice(merchants)}{rng.choice(_NOTES)}",
+            "price": round(max(0.5, price), 2),
+        })
+        if len(batch) == chunk:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(engine: Engine, rows: int, seed: int = 42, end: datetime.date = END, user_id: str = DEFAULT_USER_ID) -> None:
+    """Append `rows` generated transactions, then bring daily_rollups and the data version up to date.
+
+    The tables must exist (importing app creates them).
+    """
+    with engine.begin() as conn:
+        for batch in generate(rows, seed, end, user_id=user_id):
+            conn.execute(insert(Transaction), batch)
+        rollups.rebuild(conn, Transaction.__table__)
+        data_version.bump(conn)
+        if conn.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="10k to 10M is the intended range")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="DATABASE_URL to seed (default: the app's)")
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["DATABASE_URL"] = args.url
+    import app as backend
+
+    t0 = time.perf_counter()
+    seed(backend.engine, args.rows, args.seed)
+    elapsed = time.perf_counter() - t0
+    print(f"seeded {args.rows} rows in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
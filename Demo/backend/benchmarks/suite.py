@@ -0,0 +1,216 @@
+"""Baseline benchmark suite: /process, /transactions per filter and /summary.
+
+Seeds a database with the deterministic generator (benchmarks.generator),
+then runs every case in its own process so each one reports its own peak
+RSS. A case fires --clients concurrent clients doing --requests requests
+each through the in-process ASGI transport and reports throughput,
+p50/p99 latency and failures. /process runs against the stub LLM with
+--latency and --failure-rate; it runs last because it appends rows.
+
+    cd Demo/backend
+    python -m benchmarks.suite --rows 1000000 --output baseline.json
+    # later, on the same machine:
+    python -m benchmarks.suite --rows 1000000 --baseline baseline.json
+
+With --baseline, cases whose throughput dropped or whose p99 or peak RSS
+grew by more than --tolerance are listed under "regressions" and the
+exit status is 1. Pass --url to run against an existing (e.g. Postgres)
+database, seeding it unless --rows is 0.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from benchmarks.generator import END
+
+LAST_30 = {"date_from": (END - datetime.timedelta(days=29)).isoformat(), "date_to": END.isoformat()}
+LAST_365 = {"date_from": (END - datetime.timedelta(days=364)).isoformat(), "date_to": END.isoformat()}
+
+# scenario, case, method, path, query parameters
+CASES = [
+    ("transactions", "no filter", "GET", "/transactions", {"limit": 100}),
+    ("transactions", "type", "GET", "/transactions", {"limit": 100, "type": "income"}),
+    ("transactions", "category", "GET", "/transactions", {"limit": 100, "category": "gift"}),
+    ("transactions", "date range", "GET", "/transactions", {"limit": 100, **LAST_30}),
+    ("transactions", "all filters", "GET", "/transactions", {"limit": 100, "type": "expense", "category": "food", **LAST_365}),
+    ("dashboard", "30 days", "GET", "/summary", LAST_30),
+    ("dashboard", "365 days", "GET", "/summary", LAST_365),
+    ("dashboard", "all time", "GET", "/summary", {}),
+    ("process", "stub llm", "POST", "/process", {}),
+]
+
+# Compared against the baseline: (field, True when higher is better)
+WATCHED = [("req_per_sec", True), ("p99_ms", False), ("peak_rss_mb", False)]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def load(method: str, path: str, params: Dict[str, Any], clients: int, requests: int) -> Dict[str, Any]:
+    import httpx
+    import app as backend
+
+    latencies: List[float] = []
+    failed = 0
+
+    async def send(ac: httpx.AsyncClient, n: int, i: int) -> httpx.Response:
+        if method == "POST":
+            # Free text the rule-based fast path does not claim, so every call reaches the LLM
+            text = f"Team lunch number {n}-{i}, my share was {i + 10}"
+            return await ac.post(path, json={"text": text, "bypass_cache": True})
+        return await ac.get(path, params=params)
+
+    async def client(ac: httpx.AsyncClient, n: int) -> None:
+        nonlocal failed
+        for i in range(requests):
+            start = time.perf_counter()
+            r = await send(ac, n, i)
+            latencies.append(time.perf_counter() - start)
+            failed += r.status_code != 200
+
+    async with backend.lifespan(backend.app):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as ac:
+            for i in range(3):
+                await send(ac, -1, i)
+            start = time.perf_counter()
+            await asyncio.gather(*(client(ac, n) for n in range(clients)))
+            elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: round(latencies[round(q * (len(latencies) - 1))] * 1000, 1)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "failed": failed,
+        "req_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": pick(0.5),
+        "p99_ms": pick(0.99),
+    }
+
+
+def child(args) -> None:
+    scenario, case, method, path, params = CASES[args.case]
+    if scenario == "process":
+        from stub_llm import StubServer
+
+        with StubServer(latency=args.latency, failure_rate=args.failure_rate, seed=args.seed) as stub:
+            import app as backend
+
+            backend.LLM_API_URL = stub.url
+            result = asyncio.run(load(method, path, params, args.clients, args.requests))
+            result["llm_failures"] = stub.app.state.failed
+    else:
+        result = asyncio.run(load(method, path, params, args.clients, args.requests))
+    print(json.dumps({"scenario": scenario, "case": case, **result, "peak_rss_mb": peak_rss_mb()}))
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    before = {(r["scenario"], r["case"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = before.get((r["scenario"], r["case"]))
+        if old is None or "error" in r or "error" in old:
+            continue
+        for field, higher_is_better in WATCHED:
+            if old.get(field) is None or r.get(field) is None or not old[field]:
+                continue
+            change = r[field] / old[field] - 1
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    "scenario": r["scenario"],
+                    "case": r["case"],
+                    "metric": field,
+                    "baseline": old[field],
+                    "current": r[field],
+                    "change": f"{change:+.0%}",
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows to seed (10k to 10M); 0 to use --url as is")
+    parser.add_argument("--seed", type=int, default=42, help="generator and stub failure seed")
+    parser.add_argument("--url", help="DATABASE_URL to run against (default: a new temp SQLite file)")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub LLM seconds per call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of stub LLM calls answered 500")
+    parser.add_argument("--only", action="append", help="run only these scenarios: transactions, dashboard, process")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before flagging")
+    parser.add_argument("--case", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        child(args)
+        return
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    env = dict(os.environ, DATABASE_URL=url, DEEPSEEK_API_KEY="bench", LLM_MAX_CONCURRENCY=str(args.clients))
+    seed_sec = None
+    if args.rows:
+        t0 = time.perf_counter()
+        cmd = [sys.executable, "-m", "benchmarks.generator", "--rows", str(args.rows), "--seed", str(args.seed)]
+        subprocess.run(cmd, env=env, check=True, capture_output=True)
+        seed_sec = round(time.perf_counter() - t0, 1)
+
+    results = []
+    for i, (scenario, case, *_) in enumerate(CASES):
+        if args.only and scenario not in args.only:
+            continue
+        cmd = [sys.executable, "-m", "benchmarks.suite", "--case", str(i), "--seed", str(args.seed),
+               "--clients", str(args.clients), "--requests", str(args.requests),
+               "--latency", str(args.latency), "--failure-rate", str(args.failure_rate)]
+        out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            results.append({"scenario": scenario, "case": case, "error": out.stderr.strip().splitlines()[-1:]})
+        else:
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    report: Dict[str, Any] = {
+        "config": {
+            "url": url if args.url else "temp sqlite",
+            "rows": args.rows,
+            "seed": args.seed,
+            "seed_sec": seed_sec,
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "llm_latency_sec": args.latency,
+            "llm_failure_rate": args.failure_rate,
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
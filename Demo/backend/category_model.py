@@ -0,0 +1,205 @@
+"""Per-user category classifier learned from reviewed rows.
+
+Every row saved from the review grid (/transactions/bulk) is recorded in
+category_feedback as (description, final category, category the
+extractor suggested), in the same DB transaction as the row itself. Each
+user gets a multinomial naive Bayes model over hashed word and word-pair
+features of those descriptions:
+
+  * learning one pair adds a handful of counts, O(1) per saved row;
+  * predicting walks only the features of the sentence and the
+    categories they were seen with, a few microseconds.
+
+Models live in memory (an LRU of CLASSIFIER_MAX_OPEN users). The first
+use replays the user's feedback; later saves read only the feedback rows
+after the last one learned. Extraction takes the model's category when
+it is at least CLASSIFIER_MIN_CONFIDENCE sure, so the LLM can be asked
+for less, or skipped.
+"""
+import os
+import re
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, select
+from sqlalchemy.engine import Engine
+
+import shards
+
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+# A category is only predicted after this many reviewed rows of it
+CLASSIFIER_MIN_EXAMPLES = int(os.getenv("CLASSIFIER_MIN_EXAMPLES", "3"))
+CLASSIFIER_MAX_OPEN = int(os.getenv("CLASSIFIER_MAX_OPEN", "256"))
+
+FEATURE_BITS = 20
+# Additive smoothing of feature counts
+ALPHA = 0.1
+
+metadata = MetaData()
+
+feedback_table = Table(
+    "category_feedback",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("description", String, nullable=False),
+    Column("category", String, nullable=False),
+    Column("suggested_category", String),  # None when the row was typed in, not extracted
+    Column("created_at", Float, nullable=False),
+    # Catching up reads one user's rows after the last id learned
+    Index("ix_category_feedback_user_id", "user_id", "id"),
+)
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def features(text: str) -> List[int]:
+    """Hashed words and adjacent word pairs; numbers and punctuation are ignored."""
+    words = _WORD_RE.findall(text.lower())
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    mask = (1 << FEATURE_BITS) - 1
+    return list({hash(t) & mask for t in tokens})
+
+
+class CategoryModel:
+    """Multinomial naive Bayes, updated one example at a time."""
+
+    def __init__(self):
+        self.examples = 0
+        self.class_counts: Counter = Counter()  # examples per category
+        self.class_totals: Counter = Counter()  # feature occurrences per category
+        self.feature_counts: Dict[int, Counter] = {}  # feature -> category -> count
+        self.watermark = 0  # last category_feedback id learned
+        # Prequential score: each example is predicted before it is learned
+        self.confident = 0
+        self.confident_correct = 0
+        self.corrections = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.examples
+
+    def learn(self, text: str, category: str, suggested: Optional[str] = None) -> None:
+        predicted, confidence = self.predict(text)
+        if predicted is not None and confidence >= CLASSIFIER_MIN_CONFIDENCE:
+            self.confident += 1
+            self.confident_correct += predicted == category
+        if suggested is not None and suggested != category:
+            self.corrections += 1
+
+        feats = features(text)
+        self.examples += 1
+        self.class_counts[category] += 1
+        self.class_totals[category] += len(feats)
+        for f in feats:
+            counts = self.feature_counts.get(f)
+            if counts is None:
+                counts = self.feature_counts[f] = Counter()
+            counts[category] += 1
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """(category, posterior probability), or (None, 0.0) when nothing is known about the text."""
+        known = [self.feature_counts[f] for f in features(text) if f in self.feature_counts]
+        if not known or len(self.class_counts) < 2:
+            return None, 0.0
+
+        # log P(c) + sum over known features of log P(f|c), with only the nonzero counts visited
+        n = self.examples
+        smoothing = ALPHA * len(self.feature_counts)
+        scores = {
+            c: math.log(count / n) - len(known) * math.log(self.class_totals[c] + smoothing)
+            + len(known) * math.log(ALPHA)
+            for c, count in self.class_counts.items()
+        }
+        for counts in known:
+            for c, k in counts.items():
+                scores[c] += math.log1p(k / ALPHA)
+
+        best = max(scores, key=scores.get)
+        if self.class_counts[best] < CLASSIFIER_MIN_EXAMPLES:
+            return None, 0.0
+        top = scores[best]
+        return best, 1.0 / sum(math.exp(s - top) for s in scores.values())
+
+    def sync(self, engine: Engine, user_id: str) -> int:
+        """Learn the user's feedback rows recorded since the last sync; returns how many."""
+        fb = feedback_table.c
+        stmt = (
+            select(fb.id, fb.description, fb.category, fb.suggested_category)
+            .where(fb.user_id == user_id, fb.id > self.watermark)
+            .order_by(fb.id)
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        with self.lock:
+            # A concurrent sync may have learned some of them already
+            fresh = [r for r in rows if r.id > self.watermark]
+            for row in fresh:
+                self.learn(row.description, row.category, row.suggested_category)
+                self.watermark = row.id
+        return len(fresh)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "examples": self.examples,
+                "categories": dict(self.class_counts),
+                "features": len(self.feature_counts),
+                "corrections": self.corrections,
+                "confident_predictions": self.confident,
+                "confident_accuracy": self.confident_correct / self.confident if self.confident else None,
+            }
+
+
+class ModelPool:
+    """Loaded models, at most `max_open` users; an evicted user is replayed on next use."""
+
+    def __init__(self, max_open: int = CLASSIFIER_MAX_OPEN):
+        self.max_open = max(1, max_open)
+        self._open: "OrderedDict[str, CategoryModel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, user_id: str) -> Optional[CategoryModel]:
+        """The user's model if it is loaded; never touches the database."""
+        with self._lock:
+            model = self._open.get(user_id)
+            if model is not None:
+                self._open.move_to_end(user_id)
+            return model
+
+    def get(self, user_id: str) -> CategoryModel:
+        """The user's model, replaying their feedback if it was not loaded."""
+        model = self.peek(user_id)
+        if model is not None:
+            return model
+
+        model = CategoryModel()
+        model.sync(shards.engine_for(user_id), user_id)
+        with self._lock:
+            # Another thread may have loaded it meanwhile; keep the first
+            model = self._open.setdefault(user_id, model)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return model
+
+    def sync(self, user_id: str) -> int:
+        """Learn the user's new feedback, if their model is loaded; called after each save."""
+        model = self.peek(user_id)
+        if model is None:
+            return 0
+        return model.sync(shards.engine_for(user_id), user_id)
+
+    def predict(self, user_id: str, text: str) -> Optional[str]:
+        """The category for `text` when the loaded model is confident enough, else None."""
+        model = self.peek(user_id)
+        if model is None:
+            return None
+        with model.lock:
+            category, confidence = model.predict(text)
+        return category if confidence >= CLASSIFIER_MIN_CONFIDENCE else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._open), "examples": sum(len(m) for m in self._open.values())}
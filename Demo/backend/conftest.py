@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Point the app at a throwaway database before it is imported
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("IMPORT_DIR", f"{_tmp}/imports")
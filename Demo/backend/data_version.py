@@ -0,0 +1,44 @@
+"""Monotonic version of the transactions data, for HTTP cache validation.
+
+Every write to transactions calls bump() inside its own DB transaction,
+so the version only moves when the data does and is shared by every
+worker process using the same database.
+"""
+import time
+from typing import Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, insert, select, update
+from sqlalchemy.engine import Engine
+
+metadata = MetaData()
+
+version_table = Table(
+    "data_version",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+
+def init(engine: Engine) -> None:
+    metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if conn.execute(select(version_table.c.id)).first() is None:
+            conn.execute(insert(version_table).values(id=1, version=1, updated_at=time.time()))
+
+
+def bump(conn) -> None:
+    """Advance the version; `conn` is the Session or Connection doing the write."""
+    conn.execute(
+        update(version_table)
+        .where(version_table.c.id == 1)
+        .values(version=version_table.c.version + 1, updated_at=time.time())
+    )
+
+
+def current(conn) -> Tuple[int, float]:
+    row = conn.execute(
+        select(version_table.c.version, version_table.c.updated_at).where(version_table.c.id == 1)
+    ).one()
+    return row.version, row.updated_at
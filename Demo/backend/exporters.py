@@ -0,0 +1,102 @@
+"""Streaming encoders for /transactions/export.
+
+Each encoder consumes batches of rows (id, date, type, category,
+description, price) and yields bytes as soon as a batch is encoded, so
+memory is bounded by one batch whatever the export size. Parquet and
+Arrow IPC need the optional pyarrow dependency.
+"""
+import io
+import csv
+from typing import Iterable, Iterator, List
+
+COLUMNS = ["id", "date", "type", "category", "description", "price"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}
+
+
+def csv_chunks(batches: Iterable[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            (r.id, r.date.strftime("%Y-%m-%d"), r.type, r.category, r.description, r.price) for r in batch
+        )
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def arrow_chunks(batches: Iterable[list], fmt: str) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("type", pa.string()),
+        ("category", pa.string()),
+        ("description", pa.string()),
+        ("price", pa.float64()),
+    ])
+
+    def _writer(sink):
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(sink, schema)
+        return pa.ipc.new_stream(sink, schema)
+
+    def _generate() -> Iterator[bytes]:
+        sink = _ChunkSink()
+        writer = _writer(pa.PythonFile(sink, mode="w"))
+        try:
+            for batch in batches:
+                columns = list(zip(*batch)) if batch else [[] for _ in COLUMNS]
+                writer.write_batch(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(columns, schema)], schema=schema))
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return _generate()
+
+
+def encode(fmt: str, batches: Iterable[list]) -> Iterator[bytes]:
+    """Pick the encoder for fmt; raises ImportError up front if pyarrow is missing."""
+    if fmt == "csv":
+        return csv_chunks(batches)
+    import pyarrow  # noqa: F401
+    return arrow_chunks(batches, fmt)
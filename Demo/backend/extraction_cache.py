@@ -0,0 +1,138 @@
+"""Two-tier cache for LLM extractions.
+
+Entries are keyed on the normalized sentence plus the "today" anchor the
+prompt was built with, so relative dates ("yesterday") never leak across
+days. Lookups hit an in-memory LRU first and fall back to a SQLite table
+that survives restarts.
+"""
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, func, insert, select
+from sqlalchemy.engine import Engine
+
+_WS_RE = re.compile(r"\s+")
+
+metadata = MetaData()
+
+cache_table = Table(
+    "extraction_cache",
+    metadata,
+    Column("key", String, primary_key=True),
+    Column("value", Text, nullable=False),
+    Column("created_at", Float, nullable=False, index=True),
+)
+
+
+def normalize(text: str) -> str:
+    return _WS_RE.sub(" ", text.strip().lower()).rstrip(".!")
+
+
+def make_key(text: str, today: str, variant: str = "") -> str:
+    """`variant` separates results of a different prompt for the same sentence."""
+    anchor = f"{today}\n{variant}" if variant else today
+    return hashlib.sha256(f"{anchor}\n{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(
+        self,
+        engine: Engine,
+        max_entries: int = 1024,
+        max_rows: int = 100_000,
+        ttl_sec: float = 30 * 24 * 3600,
+        prune_every: int = 256,
+    ):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl_sec = ttl_sec
+        self.prune_every = prune_every
+
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+        metadata.create_all(bind=engine)
+
+    def _remember(self, key: str, value: Dict[str, Any], created_at: float) -> None:
+        with self._lock:
+            self._lru[key] = (value, created_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_sec:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+            if entry is not None:
+                del self._lru[key]
+
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(cache_table.c.value, cache_table.c.created_at).where(cache_table.c.key == key)
+            ).first()
+
+        if row is None or now - row.created_at > self.ttl_sec:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        value = json.loads(row.value)
+        self._remember(key, value, row.created_at)
+        with self._lock:
+            self.hits += 1
+            self.db_hits += 1
+        return dict(value)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        self._remember(key, dict(value), now)
+
+        with self.engine.begin() as conn:
+            conn.execute(delete(cache_table).where(cache_table.c.key == key))
+            conn.execute(insert(cache_table).values(key=key, value=json.dumps(value), created_at=now))
+
+        with self._lock:
+            self._puts += 1
+            due = self._puts % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> None:
+        """Drop expired rows, then the oldest rows beyond max_rows."""
+        cutoff = time.time() - self.ttl_sec
+        with self.engine.begin() as conn:
+            conn.execute(delete(cache_table).where(cache_table.c.created_at < cutoff))
+            count = conn.execute(select(func.count()).select_from(cache_table)).scalar_one()
+            if count > self.max_rows:
+                oldest = (
+                    select(cache_table.c.key)
+                    .order_by(cache_table.c.created_at)
+                    .limit(count - self.max_rows)
+                )
+                conn.execute(delete(cache_table).where(cache_table.c.key.in_(oldest)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+            }
@@ -0,0 +1,260 @@
+"""Parsing for bulk CSV / OFX imports.
+
+Files are read as a stream of records, so an import never holds more
+than one chunk in memory. Each record is normalized to the transaction
+fields; a record whose type or category cannot be read from its columns
+(or guessed from keywords) is flagged so the caller can send its
+description through the extraction path.
+"""
+import re
+import csv
+import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text
+
+from rule_extractor import categorize
+
+metadata = MetaData()
+
+import_jobs = Table(
+    "import_jobs",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False),  # owner of the imported transactions
+    Column("format", String, nullable=False),
+    Column("filename", String),
+    Column("path", String, nullable=False),
+    Column("date_format", String),  # strptime format of the file's dates, fixed at upload
+    Column("decimal_separator", String),  # "." or ",", fixed at upload
+    Column("status", String, nullable=False),  # pending, running, done, failed
+    Column("total_rows", Integer, nullable=False, default=0),
+    # Source records consumed so far; committed with each chunk, so it is the resume offset
+    Column("rows_done", Integer, nullable=False, default=0),
+    Column("inserted", Integer, nullable=False, default=0),
+    Column("extracted", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("errors", Text, nullable=False, default="[]"),  # first MAX_ERRORS row errors, JSON
+    Column("error", Text),  # why the job failed, if it did
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+MAX_ERRORS = 50
+
+# Accepted header names for each field, compared lower-cased and stripped
+FIELD_ALIASES = {
+    "date": ("date", "transaction date", "posted", "posting date", "booking date", "value date"),
+    "type": ("type", "transaction type", "kind"),
+    "category": ("category",),
+    "description": ("description", "details", "memo", "narrative", "name", "payee", "merchant"),
+    "price": ("price", "amount", "value", "sum"),
+    "debit": ("debit", "withdrawal", "money out", "paid out"),
+    "credit": ("credit", "deposit", "money in", "paid in"),
+}
+_HEADER_TO_FIELD = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y", "%Y%m%d")
+OFX_DATE_FORMAT = "%Y%m%d"
+DECIMAL_SEPARATORS = (".", ",")
+# Records read at upload to settle a file's date format and decimal separator
+SAMPLE_ROWS = 1000
+TYPE_WORDS = {
+    "income": "income", "credit": "income", "cr": "income", "deposit": "income",
+    "expense": "expense", "debit": "expense", "dr": "expense", "withdrawal": "expense",
+    "payment": "expense", "pos": "expense", "atm": "expense", "fee": "expense",
+}
+
+_AMOUNT_CLEAN_RE = re.compile(r"[^\d.,\-()]")
+_OFX_BLOCK_RE = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+_OFX_FIELD_RE = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def parse_date(value: str, fmt: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value.strip(), fmt).date()
+    except ValueError:
+        raise ValueError(f"Date {value.strip()!r} does not match {fmt}") from None
+
+
+def detect_date_format(values: Iterable[str]) -> str:
+    """The one DATE_FORMATS entry that reads every date in `values`.
+
+    Values no format reads are skipped; they fail later as row errors. A
+    file is read with a single format, so 01/12 and 12/25 cannot end up
+    as one day-first and one month-first date.
+    """
+    candidates = list(DATE_FORMATS)
+    seen = False
+    for value in values:
+        value = value.strip()
+        fits = []
+        for fmt in candidates:
+            try:
+                datetime.datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            fits.append(fmt)
+        if fits:
+            candidates, seen = fits, True
+    if not seen:
+        raise ValueError("No recognizable dates in the first rows")
+    if len(candidates) > 1:
+        raise ValueError(f"Ambiguous dates, could be any of {', '.join(candidates)}; pass date_format")
+    return candidates[0]
+
+
+_THOUSANDS_RE = {sep: re.compile(rf"\d{{1,3}}(?:{re.escape(sep)}\d{{3}})+") for sep in DECIMAL_SEPARATORS}
+
+
+def _amount_body(value: str) -> Tuple[str, str]:
+    """(sign, digits and separators) of an amount, with currency and spaces dropped."""
+    cleaned = _AMOUNT_CLEAN_RE.sub("", value.strip())
+    if cleaned.startswith("(") and cleaned.endswith(")"):
+        cleaned = "-" + cleaned[1:-1]
+    return ("-", cleaned[1:]) if cleaned.startswith("-") else ("", cleaned)
+
+
+def parse_amount(value: str, decimal: str = ".") -> float:
+    """An amount written with `decimal` as the decimal separator and the other one grouping thousands.
+
+    Thousands not in groups of three are rejected rather than guessed.
+    """
+    thousands = "," if decimal == "." else "."
+    sign, body = _amount_body(value)
+    whole, _, fraction = body.rpartition(decimal) if decimal in body else (body, "", "")
+    if not body or thousands in fraction or (thousands in whole and not _THOUSANDS_RE[thousands].fullmatch(whole)):
+        raise ValueError(f"Unrecognized amount: {value!r}")
+    try:
+        return float(f"{sign}{whole.replace(thousands, '')}.{fraction or 0}")
+    except ValueError:
+        raise ValueError(f"Unrecognized amount: {value!r}") from None
+
+
+def detect_decimal_separator(values: Iterable[str]) -> str:
+    """The one DECIMAL_SEPARATORS entry that reads every amount in `values`.
+
+    Like dates, a file is read with a single style, so "1.234,50" and
+    "1.500" cannot end up as 1234.5 and 1.5. Amounts that read the same
+    either way (no separator) do not count; a file whose amounts all fit
+    both ("1.500", "2,000") is ambiguous.
+    """
+    candidates = list(DECIMAL_SEPARATORS)
+    separated = False
+    for value in values:
+        if not any(sep in value for sep in DECIMAL_SEPARATORS):
+            continue
+        fits = []
+        for decimal in DECIMAL_SEPARATORS:
+            try:
+                parse_amount(value, decimal)
+            except ValueError:
+                continue
+            fits.append(decimal)
+        if not fits:
+            continue  # malformed either way; fails its own row
+        candidates, separated = [d for d in candidates if d in fits], True
+        if not candidates:
+            raise ValueError("Amounts mix . and , as the decimal separator; pass decimal_separator")
+    if not separated:
+        return "."
+    if len(candidates) > 1:
+        raise ValueError("Ambiguous amounts, could use either . or , as the decimal separator; pass decimal_separator")
+    return candidates[0]
+
+
+def normalize(record: Dict[str, str], date_format: str, decimal: str = ".") -> Dict[str, Any]:
+    """Map one source record to transaction fields.
+
+    type and category are None when the caller has to extract them.
+    """
+    if not record.get("date"):
+        raise ValueError("Missing date")
+    date = parse_date(record["date"], date_format)
+
+    if record.get("price"):
+        amount = parse_amount(record["price"], decimal)
+    elif record.get("debit"):
+        amount = -abs(parse_amount(record["debit"], decimal))
+    elif record.get("credit"):
+        amount = abs(parse_amount(record["credit"], decimal))
+    else:
+        raise ValueError("Missing amount")
+
+    type_: Optional[str] = TYPE_WORDS.get((record.get("type") or "").strip().lower())
+    if type_ is None and amount != 0 and not record.get("type"):
+        type_ = "expense" if amount < 0 else "income"
+
+    description = (record.get("description") or "").strip()
+    category = (record.get("category") or "").strip() or (categorize(description.lower()) if description else None)
+
+    if (type_ is None or category is None) and not description:
+        raise ValueError("Missing type/category and no description to extract them from")
+
+    return {
+        "date": date,
+        "type": type_,
+        "category": category,
+        "description": description or category,
+        "price": abs(amount),
+    }
+
+
+def iter_csv(path: str) -> Iterator[Dict[str, str]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = [_HEADER_TO_FIELD.get(h.strip().lower()) for h in header]
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            yield {field: cell for field, cell in zip(fields, row) if field}
+
+
+def iter_ofx(path: str, read_size: int = 1 << 16) -> Iterator[Dict[str, str]]:
+    """STMTTRN blocks of an OFX 1.x (SGML) or 2.x (XML) statement."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        buf = ""
+        while True:
+            data = f.read(read_size)
+            buf += data
+            end = 0
+            for m in _OFX_BLOCK_RE.finditer(buf):
+                tags = {k.upper(): v.strip() for k, v in _OFX_FIELD_RE.findall(m.group(1))}
+                yield {
+                    "date": tags.get("DTPOSTED", "")[:8],
+                    "price": tags.get("TRNAMT", ""),
+                    "description": tags.get("NAME") or tags.get("MEMO", ""),
+                }
+                end = m.end()
+            buf = buf[end:]
+            if not data:
+                return
+
+
+def iter_records(path: str, fmt: str) -> Iterator[Dict[str, str]]:
+    return iter_ofx(path) if fmt == "ofx" else iter_csv(path)
+
+
+def count_records(path: str, fmt: str) -> int:
+    return sum(1 for _ in iter_records(path, fmt))
+
+
+def file_formats(
+    path: str, fmt: str, date_format: Optional[str] = None, decimal: Optional[str] = None
+) -> Tuple[str, str]:
+    """(date format, decimal separator) of a file, detecting from its first SAMPLE_ROWS records those not given."""
+    if fmt == "ofx":
+        # OFX fixes both
+        return date_format or OFX_DATE_FORMAT, decimal or "."
+    if date_format is None or decimal is None:
+        sample = list(islice(iter_records(path, fmt), SAMPLE_ROWS))
+        if date_format is None:
+            date_format = detect_date_format(r["date"] for r in sample if r.get("date"))
+        if decimal is None:
+            amounts = (r.get(f) for r in sample for f in ("price", "debit", "credit"))
+            decimal = detect_decimal_separator(a for a in amounts if a)
+    return date_format, decimal
@@ -0,0 +1,75 @@
+"""Persistent extraction jobs and their live event feed.
+
+A job is a list of sentences submitted in one go. Every sentence is a
+row in job_items, so finished results survive a restart and unfinished
+ones are queued again at startup. Listeners (the SSE endpoint) subscribe
+to a job and receive each line's result as soon as it is committed.
+"""
+import asyncio
+from typing import Any, Dict, Set, Tuple
+
+from sqlalchemy import Boolean, Column, Float, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+extraction_jobs = Table(
+    "extraction_jobs",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False),  # owner of the extracted transactions
+    Column("status", String, nullable=False),  # pending, running, done, cancelled
+    Column("total", Integer, nullable=False),
+    Column("succeeded", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("cancelled", Integer, nullable=False, default=0),
+    Column("bypass_cache", Boolean, nullable=False, default=False),
+    # False: lines are only extracted, for a caller that saves the reviewed rows itself
+    Column("save", Boolean, nullable=False, default=True),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+job_items = Table(
+    "job_items",
+    metadata,
+    Column("job_id", String, primary_key=True),
+    Column("idx", Integer, primary_key=True),
+    Column("text", Text, nullable=False),
+    Column("status", String, nullable=False),  # pending, done, failed, cancelled
+    Column("result", Text),  # extraction JSON
+    Column("path", String),
+    Column("transaction_id", Integer),
+    Column("error", Text),
+)
+
+FINISHED = ("done", "cancelled")
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+class JobEvents:
+    """In-process fan-out of job events to any number of listeners."""
+
+    def __init__(self) -> None:
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        listeners = self._listeners.get(job_id)
+        if listeners is not None:
+            listeners.discard(queue)
+            if not listeners:
+                del self._listeners[job_id]
+
+    def publish(self, job_id: str, kind: str, data: Dict[str, Any]) -> None:
+        for queue in self._listeners.get(job_id, ()):
+            queue.put_nowait((kind, data))
+
+
+def sse(kind: str, data: str) -> str:
+    """One Server-Sent Events message."""
+    return f"event: {kind}\ndata: {data}\n\n"
@@ -0,0 +1,244 @@
+"""Request timing, per-stage spans and Prometheus text exposition.
+
+TimingMiddleware gives every request an ID (the caller's X-Request-ID, or
+a new one), times it per route template and echoes the ID back together
+with a Server-Timing header listing the stages the request went through:
+
+    with span("llm"):
+        r = await client.post(...)
+
+Spans record into the `stage_duration_seconds` histogram and, inside a
+request, into that request's Server-Timing. Values that already live
+elsewhere (LLM usage, pool sizes, queue depths) are read at scrape time
+through `collector` callbacks instead of being copied into counters.
+
+No prometheus_client dependency: the text format is small enough to emit
+directly. Spans are opened on the event loop side (around run_in_threadpool
+rather than inside it), so updates and scrapes never race.
+"""
+import re
+import time
+import uuid
+import bisect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; wide enough for a local SQLite commit and a slow LLM call alike
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(name: str, labels, value: float) -> str:
+    items = labels.items() if isinstance(labels, dict) else labels
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+    return f"{name}{{{body}}} {value!r}" if body else f"{name} {value!r}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name, self.help, self.type = name, help, "counter"
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _labels(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_labels(labels), 0.0)
+
+    def lines(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield _format(self.name, key, value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name, self.help, self.type = name, help, "histogram"
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative) + overflow, sum]
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(_labels(labels))
+        return sum(series[0]) if series else 0
+
+    def lines(self) -> Iterable[str]:
+        for key, (counts, total) in sorted(self._series.items()):
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield _format(f"{self.name}_bucket", key + (("le", le),), running)
+            yield _format(f"{self.name}_sum", key, total[0])
+            yield _format(f"{self.name}_count", key, running)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List = []
+        # (name, type, help, callback returning (labels, value) pairs)
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name: str, type: str, help: str):
+        """Register a callback yielding (labels, value) pairs when /metrics is scraped."""
+
+        def register(fn):
+            self._collectors.append((name, type, help, fn))
+            return fn
+
+        return register
+
+    def render(self) -> str:
+        out: List[str] = []
+        for metric in self._metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.type}")
+            out.extend(metric.lines())
+        for name, type, help, fn in self._collectors:
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {type}")
+            out.extend(_format(name, labels, float(value)) for labels, value in fn())
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "Requests by method, route template and status code.")
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from receiving a request until its response is fully sent."
+)
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "Time spent per stage: llm, llm_queue, llm_parse, db, serialize."
+)
+errors = registry.counter("errors_total", "Failures by cause.")
+
+# The current request's ID and its Server-Timing entries; unset outside requests
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stage_timings", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def record(stage: str, elapsed: float) -> None:
+    stage_duration.observe(elapsed, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, elapsed))
+
+
+@contextmanager
+def span(stage: str):
+    """Time the block as `stage`; an exception escaping it counts as an error with that cause."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.inc(cause=stage)
+        raise
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value with one entry per stage (summed when repeated) plus `app`."""
+    per_stage: Dict[str, Tuple[float, int]] = {}
+    for stage, elapsed in timings:
+        dur, n = per_stage.get(stage, (0.0, 0))
+        per_stage[stage] = (dur + elapsed, n + 1)
+    entries = [f'{stage};dur={dur * 1000:.1f};desc="x{n}"' if n > 1 else f"{stage};dur={dur * 1000:.1f}"
+               for stage, (dur, n) in per_stage.items()]
+    entries.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# Accepted caller-supplied IDs; anything else is replaced so it cannot break headers or logs
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class TimingMiddleware:
+    """ASGI middleware: request IDs, per-route latency and the Server-Timing header.
+
+    The route label is the matched path template (e.g. /jobs/{job_id}), so
+    IDs in URLs do not create new series; unmatched paths count as "other".
+    Latency runs until the last body chunk is sent, so the stream and SSE
+    routes report how long they stayed open.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        timings: List[Tuple[str, float]] = []
+        id_token = _request_id.set(request_id)
+        timings_token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_headers(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode()))
+                headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "other")}
+            http_duration.observe(time.perf_counter() - start, **labels)
+            http_requests.inc(status=str(status), **labels)
+            _request_id.reset(id_token)
+            _timings.reset(timings_token)
+
+
+def pool_samples(pools: Dict[str, object]) -> Iterable[Tuple[Dict[str, str], float]]:
+    """Checked-out, idle and overflow connections of each QueuePool; other pools are skipped."""
+    for name, pool in pools.items():
+        if not hasattr(pool, "checkedout"):
+            continue
+        yield {"engine": name, "state": "checked_out"}, pool.checkedout()
+        yield {"engine": name, "state": "idle"}, pool.checkedin()
+        # QueuePool counts overflow from -pool_size; only connections beyond the pool matter here
+        yield {"engine": name, "state": "overflow"}, max(0, pool.overflow())
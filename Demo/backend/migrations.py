@@ -0,0 +1,144 @@
+"""Schema upgrades applied at startup.
+
+create_all() only creates missing tables, so databases made by older
+versions of the app are brought up to date here. Every step is
+idempotent and runs on each start.
+"""
+from sqlalchemy import Table, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+import importer
+import jobs
+import rollups
+from models import DEFAULT_USER_ID, lower_category
+
+
+# Rows backfilled per round trip
+BACKFILL_BATCH = 10_000
+
+
+def add_category_lc(conn: Connection, transactions: Table) -> None:
+    """Lower-cased copy of category so case-insensitive filters can use an index.
+
+    Lowered in Python, as new rows are: SQLite's lower() only folds ASCII,
+    and "ÉPICERIE" would never match a search for "épicerie".
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns(transactions.name)}
+    if "category_lc" not in columns:
+        conn.execute(text(f"ALTER TABLE {transactions.name} ADD COLUMN category_lc VARCHAR"))
+
+    t = transactions.c
+    set_lc = update(transactions).where(t.id == bindparam("row_id")).values(category_lc=bindparam("lc"))
+    last = 0
+    while True:
+        rows = conn.execute(
+            select(t.id, t.category).where(t.category_lc.is_(None), t.id > last).order_by(t.id).limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        conn.execute(set_lc, [{"row_id": r.id, "lc": lower_category(r.category)} for r in rows])
+        last = rows[-1].id
+
+    if conn.dialect.name != "sqlite":
+        return
+    # Values the earlier SQL backfill left with upper-case non-ASCII letters
+    for lc in conn.execute(select(t.category_lc).distinct()).scalars():
+        if lc is not None and lc != lower_category(lc):
+            conn.execute(update(transactions).where(t.category_lc == lc).values(category_lc=lower_category(lc)))
+
+
+def _owner_column(conn: Connection, table: str) -> None:
+    """user_id for a table from before users existed; its rows go to DEFAULT_USER_ID."""
+    inspector = inspect(conn)
+    if not inspector.has_table(table) or "user_id" in {c["name"] for c in inspector.get_columns(table)}:
+        return
+    default = DEFAULT_USER_ID.replace("'", "''")
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN user_id VARCHAR NOT NULL DEFAULT '{default}'"))
+
+
+def add_user_id(conn: Connection, transactions: Table) -> None:
+    _owner_column(conn, transactions.name)
+
+
+# Replaced by the ix_transactions_user_* indexes, which lead on user_id
+SUPERSEDED_INDEXES = ["ix_transactions_date_id", "ix_transactions_type_date", "ix_transactions_category_lc_date"]
+
+
+def drop_superseded_indexes(conn: Connection, transactions: Table) -> None:
+    for name in SUPERSEDED_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def create_indexes(conn: Connection, transactions: Table) -> None:
+    for index in transactions.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def create_rollups(conn: Connection, transactions: Table) -> None:
+    """Create daily_rollups and seed it from the rows already present.
+
+    A rollup from before users existed is keyed without user_id and cannot
+    be altered in place, so it is rebuilt.
+    """
+    inspector = inspect(conn)
+    name = rollups.rollup_table.name
+    if inspector.has_table(name) and "user_id" not in {c["name"] for c in inspector.get_columns(name)}:
+        rollups.rollup_table.drop(conn)
+        inspector = inspect(conn)
+    if not inspector.has_table(name):
+        rollups.metadata.create_all(bind=conn)
+        rollups.rebuild(conn, transactions)
+
+
+def add_job_owners(conn: Connection, transactions: Table) -> None:
+    """Import and extraction jobs remember whose transactions they write."""
+    _owner_column(conn, importer.import_jobs.name)
+    _owner_column(conn, jobs.extraction_jobs.name)
+
+
+def add_import_date_format(conn: Connection, transactions: Table) -> None:
+    """Import jobs fix one date format per file; older jobs detect theirs when resumed."""
+    inspector = inspect(conn)
+    name = importer.import_jobs.name
+    if inspector.has_table(name) and "date_format" not in {c["name"] for c in inspector.get_columns(name)}:
+        conn.execute(text(f"ALTER TABLE {name} ADD COLUMN date_format VARCHAR"))
+
+
+def add_import_decimal_separator(conn: Connection, transactions: Table) -> None:
+    """Import jobs fix one decimal separator per file; older jobs detect theirs when resumed."""
+    inspector = inspect(conn)
+    name = importer.import_jobs.name
+    if inspector.has_table(name) and "decimal_separator" not in {c["name"] for c in inspector.get_columns(name)}:
+        conn.execute(text(f"ALTER TABLE {name} ADD COLUMN decimal_separator VARCHAR"))
+
+
+def add_job_save_flag(conn: Connection, transactions: Table) -> None:
+    """Extraction jobs may only extract; jobs from before the flag saved their lines."""
+    inspector = inspect(conn)
+    name = jobs.extraction_jobs.name
+    if inspector.has_table(name) and "save" not in {c["name"] for c in inspector.get_columns(name)}:
+        conn.execute(text(f"ALTER TABLE {name} ADD COLUMN save BOOLEAN NOT NULL DEFAULT TRUE"))
+
+
+STEPS = [
+    add_category_lc,
+    add_user_id,
+    drop_superseded_indexes,
+    create_indexes,
+    create_rollups,
+    add_job_owners,
+    add_import_date_format,
+    add_job_save_flag,
+    add_import_decimal_separator,
+]
+
+# Recorded in SQLite's PRAGMA user_version once every step has run; appending a step moves it
+SCHEMA_VERSION = len(STEPS)
+
+
+def migrate(engine: Engine, transactions: Table) -> None:
+    with engine.begin() as conn:
+        for step in STEPS:
+            step(conn, transactions)
+        if conn.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA optimize"))
@@ -0,0 +1,47 @@
+"""ORM models."""
+import os
+
+from typing import Optional
+
+from sqlalchemy import Column, Date, Float, Index, Integer, String
+from sqlalchemy.orm import declarative_base, validates
+
+Base = declarative_base()
+
+# Owner of rows written without an X-User-ID, and of rows from before users existed
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "default")
+
+
+def lower_category(category: str) -> str:
+    """category_lc for `category`; Python's lowering, so non-ASCII letters match too (SQLite's lower() is ASCII only)."""
+    return category.lower()
+
+
+def _lower_category(context) -> Optional[str]:
+    category = context.get_current_parameters().get("category")
+    return lower_category(category) if category is not None else None
+
+
+class Transaction(Base):
+    __tablename__ = "transactions"
+    __table_args__ = (
+        # Every query is for one user, ordered by (date desc, id desc); the filters follow user_id
+        Index("ix_transactions_user_date_id", "user_id", "date", "id"),
+        Index("ix_transactions_user_type_date", "user_id", "type", "date"),
+        Index("ix_transactions_user_category_lc_date", "user_id", "category_lc", "date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, nullable=False, default=DEFAULT_USER_ID)
+    date = Column(Date, nullable=False)
+    type = Column(String, nullable=False)  # 'income' or 'expense'
+    category = Column(String, nullable=False)
+    # Set on insert, and by _set_category_lc whenever a loaded row's category changes
+    category_lc = Column(String, default=_lower_category)
+    description = Column(String, nullable=False)
+    price = Column(Float, nullable=False)
+
+    @validates("category")
+    def _set_category_lc(self, key: str, category: str) -> str:
+        self.category_lc = lower_category(category) if category is not None else None
+        return category
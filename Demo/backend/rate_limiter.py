@@ -0,0 +1,183 @@
+"""Governor for outbound LLM calls.
+
+Every call takes a slot from LlmLimiter before it is sent. A slot needs:
+room under the concurrency cap, one request from the requests-per-minute
+bucket, and the call's estimated tokens from the tokens-per-minute bucket.
+Waiters are served strictly by lane, so an interactive /process call never
+queues behind a bulk job. A 429 pauses every lane until Retry-After.
+
+The lane comes from a context variable, so bulk callers wrap their work in
+`with lane(BULK):` instead of threading a parameter through extraction.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+INTERACTIVE = 0
+BULK = 1
+LANES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+_lane: ContextVar[int] = ContextVar("llm_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def lane(priority: int):
+    """Run LLM calls made inside the block (and tasks started there) in this lane."""
+    token = _lane.set(priority)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> int:
+    return _lane.get()
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously; 0 means unlimited.
+
+    The level may go negative when a call turns out to use more tokens than
+    estimated; later calls then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.level = per_minute
+        self._at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._at) * self.per_minute / 60)
+        self._at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken."""
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60 / self.per_minute)
+
+    def take(self, amount: float, now: float) -> None:
+        if self.per_minute:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Charge (or refund, if negative) the difference between estimate and actual use."""
+        if self.per_minute:
+            self.level = min(self.capacity, self.level - amount)
+
+
+class LlmLimiter:
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_concurrency: int = 16) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future, float]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.waits: Dict[int, Dict[str, float]] = {p: {"count": 0, "total_sec": 0.0, "max_sec": 0.0} for p in LANES}
+        self.throttled = 0  # 429 responses
+        self.retries = 0
+
+    async def acquire(self, priority: int, tokens: float) -> None:
+        start = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut, tokens))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Granted just as we were cancelled: hand the slot back
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if not fut.done():
+                fut.cancel()
+
+        waited = time.monotonic() - start
+        stats = self.waits[priority]
+        stats["count"] += 1
+        stats["total_sec"] += waited
+        stats["max_sec"] = max(stats["max_sec"], waited)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tokens: float = 0, priority: Optional[int] = None):
+        """Hold a slot for one call; yields a function to report actual token use."""
+        await self.acquire(current_lane() if priority is None else priority, tokens)
+
+        def used(actual: float) -> None:
+            self.tokens.adjust(actual - tokens)
+
+        try:
+            yield used
+        finally:
+            self.release()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every lane for `seconds`, e.g. after a 429 with Retry-After."""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._waiters:
+            priority, _, fut, tokens = self._waiters[0]
+            if fut.done():  # cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return  # release() dispatches again
+
+            now = time.monotonic()
+            delay = max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.in_flight += 1
+            fut.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        depth = {name: 0 for name in LANES.values()}
+        for priority, _, fut, _ in self._waiters:
+            if not fut.done():
+                depth[LANES[priority]] += 1
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": depth,
+            "wait": {
+                LANES[p]: {
+                    "count": int(w["count"]),
+                    "avg_sec": round(w["total_sec"] / w["count"], 4) if w["count"] else 0.0,
+                    "max_sec": round(w["max_sec"], 4),
+                }
+                for p, w in self.waits.items()
+            },
+            "paused_for_sec": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute,
+        }
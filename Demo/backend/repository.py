@@ -0,0 +1,235 @@
+"""Data access for the request handlers.
+
+Query builders are plain functions shared with the sync code paths
+(streaming export, background import/job writers). Writes are async
+functions that take an AsyncSession; the sync bookkeeping they share
+(rollups, data version) runs through `session.run_sync` inside the same
+transaction. Reads are sync functions of a Session, run through a Reader.
+"""
+import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import and_, or_
+
+import data_version
+from category_model import feedback_table
+from jobs import job_items
+from models import Transaction
+from rollups import add_to_rollups, rollup_table
+
+
+def matching_categories(user_id: str, needle: str):
+    """The user's distinct categories containing `needle`, case-insensitively.
+
+    A substring LIKE cannot seek an index, so the user's distinct category
+    values are walked with a recursive skip-scan (one index seek per
+    category) and only that short list is matched. The result feeds an IN
+    filter that seeks ix_transactions_user_category_lc_date.
+    """
+    inner = aliased(Transaction)
+    cats = (
+        select(func.min(Transaction.category_lc).label("c"))
+        .where(Transaction.user_id == user_id)
+        .cte("cats", recursive=True)
+    )
+    cats = cats.union_all(
+        select(
+            select(func.min(inner.category_lc))
+            .where(inner.user_id == user_id, inner.category_lc > cats.c.c)
+            .scalar_subquery()
+        ).where(cats.c.c.is_not(None))
+    )
+    return select(cats.c.c).where(cats.c.c.like(f"%{needle.lower()}%"))
+
+
+def transaction_filters(
+    user_id: str,
+    type: Optional[str],
+    category: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+) -> list:
+    """WHERE clauses for one user's rows; every index leads on user_id, so this always seeks."""
+    filters = [Transaction.user_id == user_id]
+
+    if type:
+        filters.append(Transaction.type == type)
+    if category:
+        filters.append(Transaction.category_lc.in_(matching_categories(user_id, category)))
+    if date_from:
+        dfrom = datetime.datetime.strptime(date_from, "%Y-%m-%d").date()
+        filters.append(Transaction.date >= dfrom)
+    if date_to:
+        dto = datetime.datetime.strptime(date_to, "%Y-%m-%d").date()
+        filters.append(Transaction.date <= dto)
+
+    return filters
+
+
+def before(date: datetime.date, id: int):
+    """Keyset condition for the rows after (date, id) in newest-first order."""
+    return or_(Transaction.date < date, and_(Transaction.date == date, Transaction.id < id))
+
+
+def record_inserts(db, rows: List[Any]) -> None:
+    """Bookkeeping that must commit together with newly inserted transactions."""
+    add_to_rollups(db, [(t.user_id, t.date, t.type, t.category, t.price) for t in rows])
+    data_version.bump(db)
+
+
+def new_transaction(extracted: Dict[str, Any], user_id: str) -> Transaction:
+    return Transaction(
+        user_id=user_id,
+        date=datetime.datetime.strptime(extracted["date"], "%Y-%m-%d").date(),
+        type=extracted["type"],
+        category=extracted["category"],
+        description=extracted["description"],
+        price=float(extracted["price"]),
+    )
+
+
+T = TypeVar("T")
+
+
+class Reader:
+    """Runs read functions `fn(db, *args)`, db a sync Session, against one database.
+
+    On SQLite they run on the sync engine in the threadpool: aiosqlite adds
+    a thread hop per query, and under 200 clients its p99 was about twice
+    the sync path's (benchmarks/bench_async_reads.py). Other backends run
+    them on an AsyncSession through run_sync, so a read waiting on the
+    server holds no threadpool worker.
+    """
+
+    def __init__(self, session: Callable[[], Session], async_session: Callable[[], AsyncSession], dialect: str):
+        self.session = session
+        self.async_session = async_session
+        self.dialect = dialect
+
+    async def __call__(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.dialect == "sqlite":
+            return await run_in_threadpool(self._run, fn, *args)
+        async with self.async_session() as session:
+            return await session.run_sync(fn, *args)
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        with self.session() as db:
+            return fn(db, *args)
+
+
+async def add_extracted(session: AsyncSession, extracted: List[Dict[str, Any]], user_id: str) -> List[int]:
+    """Save extraction results in one commit; returns their ids in order."""
+    rows = [new_transaction(e, user_id) for e in extracted]
+    try:
+        session.add_all(rows)
+        await session.flush()
+        await session.run_sync(record_inserts, rows)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    return [t.id for t in rows]
+
+
+async def add_rows(
+    session: AsyncSession, rows: List[Dict[str, Any]], feedback: Optional[List[Dict[str, Any]]] = None
+) -> None:
+    """Insert already-structured rows (user_id included) with one executemany and one commit.
+
+    `feedback` rows for category_feedback are committed with them.
+    """
+    try:
+        await session.execute(insert(Transaction), rows)
+        if feedback:
+            await session.execute(insert(feedback_table), feedback)
+        await session.run_sync(record_inserts, [SimpleNamespace(**r) for r in rows])
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+
+# Column order of transaction_rows(); the same keys as the TransactionOut schema
+ROW_FIELDS = ("id", "date", "type", "category", "description", "price")
+
+
+def iso_date(column, dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(column, "YYYY-MM-DD")
+    return func.strftime("%Y-%m-%d", column)
+
+
+def transaction_rows(db: Session, filters: list, limit: Optional[int] = None) -> list:
+    """Matching rows as ROW_FIELDS tuples, newest first, with the date already a string.
+
+    No ORM objects are built; callers encode the tuples directly.
+    """
+    t = Transaction
+    stmt = select(
+        t.id, iso_date(t.date, db.get_bind().dialect.name).label("date"), t.type, t.category, t.description, t.price
+    ).order_by(t.date.desc(), t.id.desc())
+    if filters:
+        stmt = stmt.where(and_(*filters))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return list(db.execute(stmt).all())
+
+
+def month_of(column, dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def rollup_summary(
+    db: Session, user_id: str, date_from: Optional[datetime.date], date_to: Optional[datetime.date]
+) -> Tuple[list, list, list]:
+    """(type, category, total, count), (day, type, total) and (month, type, total) rows for one user."""
+    r = rollup_table.c
+    filters = [r.user_id == user_id]
+    if date_from:
+        filters.append(r.day >= date_from)
+    if date_to:
+        filters.append(r.day <= date_to)
+    where = and_(*filters)
+
+    by_category = db.execute(
+        select(r.type, r.category, func.sum(r.total), func.sum(r.count))
+        .where(where)
+        .group_by(r.type, r.category)
+        .order_by(r.type, func.sum(r.total).desc())
+    ).all()
+
+    daily = db.execute(
+        select(r.day, r.type, func.sum(r.total))
+        .where(where)
+        .group_by(r.day, r.type)
+    ).all()
+
+    month = month_of(r.day, db.get_bind().dialect.name)
+    monthly = db.execute(
+        select(month, r.type, func.sum(r.total))
+        .where(where)
+        .group_by(month, r.type)
+    ).all()
+
+    return by_category, daily, monthly
+
+
+async def get_row(session: AsyncSession, table, id: Any):
+    """One row of a Core table with an `id` primary key, or None."""
+    return (await session.execute(select(table).where(table.c.id == id))).first()
+
+
+async def finished_job_items(session: AsyncSession, job_id: str) -> list:
+    stmt = (
+        select(job_items)
+        .where(job_items.c.job_id == job_id, job_items.c.status != "pending")
+        .order_by(job_items.c.idx)
+    )
+    return list((await session.execute(stmt)).all())
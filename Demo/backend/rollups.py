@@ -0,0 +1,131 @@
+"""Per-day aggregates kept in step with the transactions table.
+
+daily_rollups holds one row per (user_id, day, type, category) with the
+sum and count of prices. Every insert path adds its deltas inside the same DB
+transaction as the rows themselves, so dashboard queries can read the
+rollup alone. For databases written before the rollup existed, or to
+repair drift:
+
+    python rollups.py rebuild
+    python rollups.py check
+"""
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import Column, Date, Float, Integer, MetaData, String, Table, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+metadata = MetaData()
+
+rollup_table = Table(
+    "daily_rollups",
+    metadata,
+    # Leading the key, so one user's dashboard reads only that user's days
+    Column("user_id", String, primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("type", String, primary_key=True),
+    Column("category", String, primary_key=True),
+    Column("total", Float, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+
+def add_to_rollups(conn, rows: Iterable[Tuple[str, Any, str, str, float]]) -> None:
+    """Fold (user_id, date, type, category, price) rows into daily_rollups.
+
+    `conn` is the Session or Connection that is inserting the rows, so the
+    rollup commits or rolls back together with them.
+    """
+    deltas: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+    for user_id, day, type_, category, price in rows:
+        d = deltas[(user_id, day, type_, category)]
+        d[0] += float(price)
+        d[1] += 1
+    if not deltas:
+        return
+
+    dialect = conn.get_bind().dialect.name if hasattr(conn, "get_bind") else conn.dialect.name
+    upsert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = upsert(rollup_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day", "type", "category"],
+        set_={
+            "total": rollup_table.c.total + stmt.excluded.total,
+            "count": rollup_table.c.count + stmt.excluded.count,
+        },
+    )
+    conn.execute(
+        stmt,
+        [
+            {"user_id": user_id, "day": day, "type": type_, "category": category, "total": total, "count": count}
+            for (user_id, day, type_, category), (total, count) in deltas.items()
+        ],
+    )
+
+
+def _grouped(transactions: Table):
+    t = transactions.c
+    return select(
+        t.user_id, t.date, t.type, t.category, func.sum(t.price), func.count()
+    ).group_by(t.user_id, t.date, t.type, t.category)
+
+
+def rebuild(conn: Connection, transactions: Table) -> None:
+    conn.execute(delete(rollup_table))
+    conn.execute(
+        insert(rollup_table).from_select(
+            ["user_id", "day", "type", "category", "total", "count"], _grouped(transactions)
+        )
+    )
+
+
+def check_consistency(engine: Engine, transactions: Table, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+    """Compare the rollup with a fresh GROUP BY over transactions; return mismatches."""
+    with engine.connect() as conn:
+        raw = {(u, d, t, c): (s, n) for u, d, t, c, s, n in conn.execute(_grouped(transactions))}
+        rolled = {
+            (r.user_id, r.day, r.type, r.category): (r.total, r.count)
+            for r in conn.execute(select(rollup_table))
+        }
+
+    mismatches = []
+    for key in raw.keys() | rolled.keys():
+        expected = raw.get(key, (0.0, 0))
+        actual = rolled.get(key, (0.0, 0))
+        if expected[1] != actual[1] or abs(expected[0] - actual[0]) > tolerance:
+            user_id, day, type_, category = key
+            mismatches.append({
+                "user_id": user_id,
+                "day": day.isoformat(),
+                "type": type_,
+                "category": category,
+                "expected": {"total": expected[0], "count": expected[1]},
+                "actual": {"total": actual[0], "count": actual[1]},
+            })
+    return sorted(mismatches, key=lambda m: (m["user_id"], m["day"], m["type"], m["category"]))
+
+
+def main(argv: List[str]) -> int:
+    import app
+
+    table = app.Transaction.__table__
+    if argv[1:] == ["rebuild"]:
+        with app.engine.begin() as conn:
+            rebuild(conn, table)
+        print("daily_rollups rebuilt")
+        return 0
+    if argv[1:] == ["check"]:
+        mismatches = check_consistency(app.engine, table)
+        for m in mismatches:
+            print(m)
+        print(f"{len(mismatches)} mismatched rollup row(s)")
+        return 1 if mismatches else 0
+
+    print("usage: python rollups.py rebuild|check")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
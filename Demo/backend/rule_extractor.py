@@ -0,0 +1,164 @@
+"""Deterministic fast path for simple transaction sentences.
+
+Handles the common shapes
+
+    <verb> <amount> for|on <thing> [today|yesterday|on <date>]
+    <verb> <thing> for <amount> [today|yesterday|on <date>]
+    <verb> <amount> <thing> [today|yesterday|on <date>]
+
+and scores how sure it is. A sentence with any other date phrase ("last
+week", "on Monday", "on 3rd", "in two days"), or any other number in the
+description, is left to the LLM rather than dated today, and so is an
+amount like "1.000" that reads as either one or a thousand.
+Callers should only trust the result when the confidence clears
+their threshold and otherwise fall back to the LLM.
+"""
+import re
+import datetime
+from typing import Any, Dict, Optional, Tuple
+
+AMOUNT = r"\$?(?P<amount>\d+(?:,\d{3})*(?:\.\d+)?)"
+
+GRAMMARS = [
+    # (pattern, base confidence)
+    (re.compile(rf"^(?P<verb>[a-z]+)\s+{AMOUNT}\s+(?:for|on)\s+(?P<thing>.+)$"), 1.0),
+    (re.compile(rf"^(?P<verb>[a-z]+)\s+(?P<thing>.+?)\s+for\s+{AMOUNT}$"), 1.0),
+    (re.compile(rf"^(?P<verb>[a-z]+)\s+{AMOUNT}\s+(?P<thing>[a-z][a-z ]*)$"), 0.9),
+]
+
+MONTHS = {
+    m: i
+    for i, names in enumerate(
+        [
+            ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+            ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+            ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+        ],
+        1,
+    )
+    for m in names
+}
+
+DATE_SUFFIX = re.compile(
+    r"\s+(?:(?P<rel>today|yesterday)"
+    r"|on\s+(?P<iso>\d{4}-\d{2}-\d{2})"
+    r"|on\s+(?P<month>[a-z]+)\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(?P<year>\d{4}))?)$"
+)
+# Date words left in the description after DATE_SUFFIX: a date the grammar could not read,
+# which must not silently become today
+DATE_WORDS = {
+    "today", "tonight", "yesterday", "tomorrow", "ago", "last", "next",
+    "day", "days", "earlier", "later", "before", "after",
+    "morning", "afternoon", "evening", "night", "week", "weekend", "month", "year",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "mon", "tue", "tues", "wed", "thu", "thur", "thurs", "fri", "sat", "sun",
+} | set(MONTHS)
+# "1.000" is a thousand in much of Europe and one elsewhere
+AMBIGUOUS_AMOUNT = re.compile(r"\d+\.\d{3}$")
+
+EXPENSE_VERBS = {"paid", "pay", "spent", "spend", "bought", "buy", "purchased"}
+INCOME_VERBS = {"received", "receive", "earned", "earn", "got", "sold"}
+
+CATEGORY_KEYWORDS = {
+    "food": ("lunch", "dinner", "breakfast", "coffee", "meal", "restaurant", "snack", "food"),
+    "groceries": ("grocery", "groceries", "supermarket"),
+    "transportation": ("transportation", "transport", "taxi", "uber", "bus", "train", "metro", "fuel", "gas", "parking"),
+    "housing": ("rent", "mortgage"),
+    "utilities": ("electricity", "water", "internet", "phone", "utilities"),
+    "entertainment": ("movie", "cinema", "netflix", "concert", "game", "games"),
+    "health": ("doctor", "medicine", "pharmacy", "dentist", "gym"),
+    "shopping": ("clothes", "shoes", "shopping"),
+    "salary": ("salary", "paycheck", "wage", "wages"),
+    "bonus": ("bonus",),
+    "investment": ("dividend", "dividends", "interest"),
+}
+INCOME_CATEGORIES = {"salary", "bonus", "investment"}
+# Returned when no keyword matched, at this much less confidence
+UNKNOWN_CATEGORY = "other"
+UNKNOWN_CATEGORY_PENALTY = 0.4
+# Taken off when the verb and the category disagree on the type ("got 5 for coffee")
+CONFLICT_PENALTY = 0.4
+
+_KEYWORD_TO_CATEGORY = {kw: cat for cat, kws in CATEGORY_KEYWORDS.items() for kw in kws}
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def resolve_date(m: "re.Match[str]", today: datetime.date) -> Optional[datetime.date]:
+    if m.group("rel") == "today":
+        return today
+    if m.group("rel") == "yesterday":
+        return today - datetime.timedelta(days=1)
+    try:
+        if m.group("iso"):
+            return datetime.date.fromisoformat(m.group("iso"))
+        month = MONTHS.get(m.group("month"))
+        if month is None:
+            return None
+        if m.group("year"):
+            return datetime.date(int(m.group("year")), month, int(m.group("day")))
+        d = datetime.date(today.year, month, int(m.group("day")))
+        # A bare "December 20" means the most recent one
+        return d if d <= today else d.replace(year=today.year - 1)
+    except ValueError:
+        return None
+
+
+def categorize(thing: str) -> Optional[str]:
+    for word in _WORD_RE.findall(thing):
+        if word in _KEYWORD_TO_CATEGORY:
+            return _KEYWORD_TO_CATEGORY[word]
+    return None
+
+
+def has_date_words(thing: str) -> bool:
+    """Any digit ("3rd", "3/10", "2 days") or date word left over; the LLM reads those."""
+    return any(c.isdigit() for c in thing) or any(w in DATE_WORDS for w in _WORD_RE.findall(thing))
+
+
+def extract_fast(text: str, today: datetime.date) -> Tuple[Optional[Dict[str, Any]], float]:
+    """Return (extraction, confidence); extraction is None when nothing matched."""
+    sentence = text.strip().rstrip(".!").lower()
+
+    date = today
+    m = DATE_SUFFIX.search(sentence)
+    if m:
+        resolved = resolve_date(m, today)
+        if resolved is None:
+            return None, 0.0
+        date = resolved
+        sentence = sentence[: m.start()]
+
+    for pattern, confidence in GRAMMARS:
+        g = pattern.match(sentence)
+        if g:
+            break
+    else:
+        return None, 0.0
+    if AMBIGUOUS_AMOUNT.search(g.group("amount")):
+        return None, 0.0
+
+    verb = g.group("verb")
+    if verb in EXPENSE_VERBS:
+        type_ = "expense"
+    elif verb in INCOME_VERBS:
+        type_ = "income"
+    else:
+        return None, 0.0
+
+    thing = g.group("thing").strip()
+    if has_date_words(thing):
+        return None, 0.0
+    category = categorize(thing)
+    if category is None:
+        category, confidence = UNKNOWN_CATEGORY, confidence - UNKNOWN_CATEGORY_PENALTY
+    elif (category in INCOME_CATEGORIES) != (type_ == "income"):
+        confidence -= CONFLICT_PENALTY
+
+    extracted = {
+        "date": date.strftime("%Y-%m-%d"),
+        "type": type_,
+        "category": category,
+        "description": thing[:1].upper() + thing[1:],
+        "price": float(g.group("amount").replace(",", "")),
+    }
+    return extracted, confidence
@@ -0,0 +1,294 @@
+"""Local similarity index over transaction descriptions and categories.
+
+A row's text ("description category") is lower-cased and cut into byte
+trigrams, with a space at either end so word starts and short words
+count, and each trigram is hashed into one of DIM buckets. Every bucket
+keeps the rows that contain it, so a query only touches rows sharing a
+trigram with it. A row scores the IDF of the trigrams it shares with the
+query over sqrt(its trigram count), i.e. the cosine between the
+IDF-weighted query and the row, so typos and fragments still match
+("starbuks", "uber" in "Uber trip").
+
+There is one index per user, saved in SEARCH_DIR (next to the SQLite
+database by default) as <user>.npz. Indexes grow incrementally: when the
+data version has moved since the last sync, only the user's rows with an
+id above the last one indexed are read and tokenized, so a quiet index
+costs one single-row read per query. New postings wait in a small
+unsorted delta, merged into the sorted arrays by the first sync that
+leaves SEARCH_DELTA_MAX or more of them.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Engine, make_url
+
+import data_version
+import database
+import shards
+from models import Transaction
+
+DIM_BITS = 18
+DIM = 1 << DIM_BITS
+
+
+def default_dir() -> str:
+    url = make_url(database.DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), "search")
+    return "./search"
+
+
+SEARCH_DIR = os.getenv("SEARCH_DIR") or default_dir()
+SEARCH_MAX_OPEN = int(os.getenv("SEARCH_MAX_OPEN", "16"))
+# Rows indexed since the last save after which an index is written back to disk
+SEARCH_SAVE_EVERY = int(os.getenv("SEARCH_SAVE_EVERY", "1000"))
+SEARCH_DELTA_MAX = int(os.getenv("SEARCH_DELTA_MAX", "100000"))
+# Rows read per round trip while catching up
+SYNC_BATCH = 50_000
+
+_EMPTY = np.empty(0, np.int64)
+
+
+def row_text(description: str, category: str) -> str:
+    return f"{description} {category}"
+
+
+def inverse_norms(lengths: np.ndarray) -> np.ndarray:
+    return (1 / np.sqrt(np.maximum(lengths, 1))).astype(np.float32)
+
+
+def trigrams(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(text index, bucket) pairs, one per distinct trigram bucket of each text."""
+    encoded = [(" " + " ".join(t.lower().split()) + " ").encode("utf-8") for t in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+    if len(buf) < 3:
+        return _EMPTY, _EMPTY
+
+    grams = (buf[:-2] << 16) | (buf[1:-1] << 8) | buf[2:]
+    doc = np.repeat(np.arange(len(texts)), lengths)[:-2]
+    # Drop trigrams that run into the next text
+    ends = np.cumsum(lengths)[doc]
+    valid = np.arange(len(grams)) + 3 <= ends
+    # Fibonacci hashing of the 24-bit trigram down to DIM_BITS
+    buckets = (grams[valid] * np.uint32(2654435761)) >> np.uint32(32 - DIM_BITS)
+    keys = (doc[valid].astype(np.int64) << DIM_BITS) | buckets
+    # Sort and drop repeats; faster than np.unique on tens of millions of keys
+    keys.sort()
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys >> DIM_BITS, keys & (DIM - 1)
+
+
+class SimilarityIndex:
+    """Trigram posting lists for one user's rows, appended to in id order."""
+
+    def __init__(self):
+        self.ids = _EMPTY  # row -> transaction id, ascending
+        self.lengths = np.empty(0, np.int32)  # distinct trigram buckets per row
+        self.inv_norms = np.empty(0, np.float32)  # 1 / sqrt(lengths)
+        self.indptr = np.zeros(DIM + 1, np.int64)
+        self.postings = np.empty(0, np.int32)  # rows, grouped by bucket
+        self._delta_buckets: List[np.ndarray] = []
+        self._delta_rows: List[np.ndarray] = []
+        self._delta_size = 0
+        # Data version at the last sync; None until the first one
+        self.version: Optional[int] = None
+        self.unsaved = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def watermark(self) -> int:
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+    def add(self, ids: Sequence[int], texts: Sequence[str]) -> int:
+        """Index rows with ids above every id indexed so far; returns how many were added."""
+        watermark = self.watermark
+        fresh = sorted((i, t) for i, t in zip(ids, texts) if i > watermark)
+        if not fresh:
+            return 0
+
+        doc, buckets = trigrams([t for _, t in fresh])
+        first = len(self.ids)
+        self.ids = np.concatenate((self.ids, np.fromiter((i for i, _ in fresh), np.int64, len(fresh))))
+        lengths = np.bincount(doc, minlength=len(fresh)).astype(np.int32)
+        self.lengths = np.concatenate((self.lengths, lengths))
+        self.inv_norms = np.concatenate((self.inv_norms, inverse_norms(lengths)))
+        self._delta_buckets.append(buckets)
+        self._delta_rows.append((doc + first).astype(np.int32))
+        self._delta_size += len(doc)
+        self.unsaved += len(fresh)
+        return len(fresh)
+
+    def _delta(self) -> Tuple[np.ndarray, np.ndarray]:
+        if len(self._delta_buckets) > 1:
+            self._delta_buckets = [np.concatenate(self._delta_buckets)]
+            self._delta_rows = [np.concatenate(self._delta_rows)]
+        if not self._delta_buckets:
+            return _EMPTY, np.empty(0, np.int32)
+        return self._delta_buckets[0], self._delta_rows[0]
+
+    def merge(self) -> None:
+        """Move the delta into the sorted posting arrays, after each bucket's older rows."""
+        buckets, rows = self._delta()
+        if not len(buckets):
+            return
+        # np.insert keeps the order of values bound for the same position, so group them first
+        order = np.argsort(buckets, kind="stable")
+        buckets, rows = buckets[order], rows[order]
+        self.postings = np.insert(self.postings, self.indptr[buckets + 1], rows)
+        counts = np.diff(self.indptr) + np.bincount(buckets, minlength=DIM)
+        self.indptr = np.concatenate(([0], np.cumsum(counts)))
+        self._delta_buckets, self._delta_rows, self._delta_size = [], [], 0
+
+    def query(self, text: str, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Up to k (transaction id, score) pairs, best first; scores are in (0, 1]."""
+        n = len(self.ids)
+        _, qb = trigrams([text])
+        if not n or not len(qb):
+            return []
+
+        starts, stops = self.indptr[qb], self.indptr[qb + 1]
+        d_buckets, d_rows = self._delta()
+        matched = np.isin(d_buckets, qb)
+        d_slot = np.searchsorted(qb, d_buckets[matched])
+        df = stops - starts + np.bincount(d_slot, minlength=len(qb))
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+        # Sum each row's shared IDF over the postings of the query's trigrams only
+        rows = np.concatenate([self.postings[a:b] for a, b in zip(starts.tolist(), stops.tolist())] + [d_rows[matched]])
+        weights = np.concatenate((np.repeat(idf, stops - starts), idf[d_slot]))
+        totals = np.bincount(rows, weights, minlength=n)
+        candidates = np.flatnonzero(totals)
+        if exclude is not None:
+            candidates = candidates[self.ids[candidates] != exclude]
+        if not len(candidates):
+            return []
+        scores = totals[candidates].astype(np.float32)
+        scores *= self.inv_norms[candidates] / np.sqrt(np.dot(idf, idf))
+
+        k = min(k, len(scores))
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return list(zip(self.ids[candidates[top]].tolist(), scores[top].tolist()))
+
+    def sync(self, engine: Engine, user_id: str) -> int:
+        """Index the user's rows inserted since the last sync; returns how many."""
+        with engine.connect() as conn:
+            version, _ = data_version.current(conn)
+            if version == self.version:
+                return 0
+            t = Transaction
+            owner = t.user_id
+            if self.watermark and conn.dialect.name == "sqlite":
+                # An expression cannot use the user_id indexes, so SQLite seeks the primary key
+                # from the watermark instead of walking all of the user's index entries
+                owner = owner.concat("")
+            stmt = select(t.id, t.description, t.category).where(owner == user_id, t.id > self.watermark).order_by(t.id)
+            result = conn.execution_options(stream_results=True, yield_per=SYNC_BATCH).execute(stmt)
+            added = 0
+            for batch in result.partitions():
+                added += self.add([r.id for r in batch], [row_text(r.description, r.category) for r in batch])
+        if self._delta_size >= SEARCH_DELTA_MAX:
+            self.merge()
+        self.version = version
+        return added
+
+    def save(self, path: str) -> None:
+        self.merge()
+        counts = np.diff(self.indptr)
+        used = np.flatnonzero(counts)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                dim_bits=np.int64(DIM_BITS),
+                ids=self.ids,
+                lengths=self.lengths,
+                postings=self.postings,
+                buckets=used,
+                counts=counts[used],
+            )
+        os.replace(tmp, path)
+        self.unsaved = 0
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        index = cls()
+        with np.load(path) as f:
+            if int(f["dim_bits"]) != DIM_BITS:
+                raise ValueError(f"{path} was built with {int(f['dim_bits'])} bucket bits, not {DIM_BITS}")
+            index.ids = f["ids"]
+            index.lengths = f["lengths"]
+            index.inv_norms = inverse_norms(index.lengths)
+            index.postings = f["postings"]
+            counts = np.zeros(DIM, np.int64)
+            counts[f["buckets"]] = f["counts"]
+        index.indptr = np.concatenate(([0], np.cumsum(counts)))
+        return index
+
+
+class IndexPool:
+    """Loaded indexes, at most `max_open` users; the least recently used is saved and dropped."""
+
+    def __init__(self, directory: str, max_open: int, save_every: int = SEARCH_SAVE_EVERY):
+        self.directory = directory
+        self.max_open = max(1, max_open)
+        self.save_every = save_every
+        self._open: "OrderedDict[str, SimilarityIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, user_id: str) -> str:
+        return os.path.join(self.directory, f"{shards.file_name(user_id)}.npz")
+
+    def get(self, user_id: str) -> SimilarityIndex:
+        with self._lock:
+            index = self._open.get(user_id)
+            if index is not None:
+                self._open.move_to_end(user_id)
+                return index
+
+            try:
+                index = SimilarityIndex.load(self.path(user_id))
+            except (OSError, ValueError, KeyError):
+                # Missing or unreadable; the first sync rebuilds it from the database
+                index = SimilarityIndex()
+            self._open[user_id] = index
+            evicted = []
+            while len(self._open) > self.max_open:
+                evicted.append(self._open.popitem(last=False))
+
+        for old_user, old in evicted:
+            self._save(old_user, old)
+        return index
+
+    def _save(self, user_id: str, index: SimilarityIndex) -> None:
+        with index.lock:
+            if index.unsaved:
+                index.save(self.path(user_id))
+
+    def search(self, user_id: str, text: str, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Bring the user's index up to date, then return its top k (id, score) for `text`."""
+        index = self.get(user_id)
+        with index.lock:
+            index.sync(shards.engine_for(user_id), user_id)
+            if index.unsaved >= self.save_every:
+                index.save(self.path(user_id))
+            return index.query(text, k, exclude)
+
+    def save_all(self) -> None:
+        with self._lock:
+            indexes = list(self._open.items())
+        for user_id, index in indexes:
+            self._save(user_id, index)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._open), "rows": sum(len(i) for i in self._open.values())}
@@ -0,0 +1,159 @@
+"""Optional shard-per-user storage: each user's transactions in their own SQLite file.
+
+With SHARD_PER_USER=1 the transactions, daily_rollups and data_version
+tables of user U live in SHARD_DIR/U.db, so one user's queries and
+writes never touch (or lock) anyone else's rows. Job and import
+bookkeeping and the extraction cache stay in the main database.
+
+Open engines are kept in an LRU of at most SHARD_MAX_OPEN users; the
+least recently used user's engines are disposed when a new one opens.
+Each shard gets a small connection pool (SHARD_DB_POOL_SIZE) since it
+only serves one user. A shard file remembers the schema version it was
+prepared for in PRAGMA user_version, so reopening it skips the migrations.
+
+Callers do not check the mode; they ask for the user's engine or session
+and get the main database's when sharding is off:
+
+    with shards.session_for(user_id) as db: ...
+    async with shards.async_session_for(user_id) as session: ...
+"""
+import os
+import re
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+import database
+
+SHARD_PER_USER = os.getenv("SHARD_PER_USER", "0") == "1"
+SHARD_DIR = os.getenv("SHARD_DIR", "./shards")
+SHARD_MAX_OPEN = int(os.getenv("SHARD_MAX_OPEN", "64"))
+SHARD_DB_POOL_SIZE = int(os.getenv("SHARD_DB_POOL_SIZE", "2"))
+
+# User IDs used as file names as-is; anything else is hashed (hashed names start with "_")
+_PLAIN_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,99}$")
+
+
+def file_name(user_id: str) -> str:
+    """A file name (without extension) that is safe for any user ID."""
+    # No "/", "." or "%" can reach a database URL, which SQLAlchemy would percent-decode
+    return user_id if _PLAIN_ID.match(user_id) else "_" + hashlib.sha256(user_id.encode()).hexdigest()[:32]
+
+
+class Shard(NamedTuple):
+    engine: Engine
+    async_engine: AsyncEngine
+    Session: sessionmaker
+    AsyncSession: async_sessionmaker
+
+
+class ShardPool:
+    """Engines for per-user SQLite files, at most `max_open` users open at once.
+
+    `prepare` runs on the sync engine of a shard whose user_version is not
+    `schema_version` when it is opened, and creates or upgrades its tables.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_open: int,
+        prepare: Callable[[Engine], None],
+        schema_version: int,
+        pool_size: int = SHARD_DB_POOL_SIZE,
+    ):
+        self.directory = directory
+        self.max_open = max(1, max_open)
+        self.prepare = prepare
+        self.schema_version = schema_version
+        self.pool_size = pool_size
+        self._open: "OrderedDict[str, Shard]" = OrderedDict()
+        # Async engines evicted outside the event loop; disposed by the next close_retired()
+        self._retired: List[AsyncEngine] = []
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.evicted = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, user_id: str) -> str:
+        return os.path.join(self.directory, f"{file_name(user_id)}.db")
+
+    def get(self, user_id: str) -> Shard:
+        with self._lock:
+            shard = self._open.get(user_id)
+            if shard is not None:
+                self._open.move_to_end(user_id)
+                return shard
+
+            url = f"sqlite:///{self.path(user_id)}"
+            engine = database.create_db_engine(url, pool_size=self.pool_size, max_overflow=self.pool_size * 4)
+            self._prepare(engine)
+            async_engine = database.create_async_db_engine(url, pool_size=self.pool_size, max_overflow=self.pool_size * 4)
+            shard = Shard(
+                engine,
+                async_engine,
+                sessionmaker(autocommit=False, autoflush=False, bind=engine),
+                async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False),
+            )
+            self._open[user_id] = shard
+            self.opened += 1
+
+            while len(self._open) > self.max_open:
+                _, old = self._open.popitem(last=False)
+                # Checked-out connections finish their work and are closed when returned
+                old.engine.dispose()
+                self._retired.append(old.async_engine)
+                self.evicted += 1
+            return shard
+
+    def _prepare(self, engine: Engine) -> None:
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA user_version").scalar() == self.schema_version:
+                return
+        self.prepare(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(self.schema_version)}")
+
+    async def close_retired(self) -> None:
+        with self._lock:
+            retired, self._retired = self._retired, []
+        await asyncio.gather(*(e.dispose() for e in retired))
+
+    async def close(self) -> None:
+        with self._lock:
+            shards, self._open = list(self._open.values()), OrderedDict()
+        for shard in shards:
+            shard.engine.dispose()
+            self._retired.append(shard.async_engine)
+        await self.close_retired()
+
+    def stats(self) -> dict:
+        return {"open": len(self._open), "max_open": self.max_open, "opened": self.opened, "evicted": self.evicted}
+
+
+# Set by configure() when SHARD_PER_USER is on
+pool: Optional[ShardPool] = None
+
+
+def configure(prepare: Callable[[Engine], None], schema_version: int) -> None:
+    global pool
+    if SHARD_PER_USER:
+        pool = ShardPool(SHARD_DIR, SHARD_MAX_OPEN, prepare, schema_version)
+
+
+def engine_for(user_id: str) -> Engine:
+    return pool.get(user_id).engine if pool is not None else database.engine
+
+
+def session_for(user_id: str) -> Session:
+    return pool.get(user_id).Session() if pool is not None else database.SessionLocal()
+
+
+def async_session_for(user_id: str) -> AsyncSession:
+    return pool.get(user_id).AsyncSession() if pool is not None else database.AsyncSessionLocal()
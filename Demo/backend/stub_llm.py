@@ -0,0 +1,142 @@
+"""Local stand-in for the DeepSeek chat-completions endpoint.
+
+Used by the tests and benchmarks so LLM-bound paths can be exercised
+without network access or an API key:
+
+    STUB_LLM_LATENCY=0.3 STUB_LLM_FAILURE_RATE=0.05 uvicorn stub_llm:app --port 9000
+    LLM_API_URL=http://127.0.0.1:9000/v1/chat/completions uvicorn app:app
+"""
+import os
+import re
+import json
+import time
+import socket
+import random
+import asyncio
+import datetime
+import threading
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+SENTENCE_RE = re.compile(r'sentence: "(.*)"')
+NUMBERED_RE = re.compile(r'^(\d+): "(.*)"$', re.M)
+PRICE_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def fake_extraction(sentence: str) -> Dict[str, Any]:
+    price = PRICE_RE.search(sentence)
+    kind = "income" if re.search(r"\b(received|salary|earned)\b", sentence, re.I) else "expense"
+    return {
+        "date": datetime.date.today().strftime("%Y-%m-%d"),
+        "type": kind,
+        "category": "salary" if kind == "income" else "general",
+        "description": sentence,
+        "price": float(price.group()) if price else 0.0,
+    }
+
+
+def create_app(
+    latency: float = 0.05,
+    token_latency: float = 0.0,
+    throttle_first: int = 0,
+    retry_after: float = 1,
+    failure_rate: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    """latency is paid per call; token_latency per completion token.
+
+    The first throttle_first calls get a 429 with a Retry-After header.
+    After that, a failure_rate fraction of calls (drawn from a generator
+    seeded with `seed`, so runs repeat) get a 500 after the usual latency.
+    """
+    stub = FastAPI(title="Stub LLM")
+    stub.state.calls = 0
+    stub.state.throttled = 0
+    stub.state.failed = 0
+    rng = random.Random(seed)
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if stub.state.throttled < throttle_first:
+            stub.state.throttled += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached"}}, status_code=429, headers={"Retry-After": str(retry_after)}
+            )
+        if failure_rate and rng.random() < failure_rate:
+            stub.state.failed += 1
+            await asyncio.sleep(latency)
+            return JSONResponse({"error": {"message": "Internal server error"}}, status_code=500)
+        stub.state.calls += 1
+
+        prompt = body["messages"][-1]["content"]
+        numbered = NUMBERED_RE.findall(prompt)
+        if numbered:
+            content = json.dumps([dict(fake_extraction(text), index=int(n)) for n, text in numbered])
+        else:
+            m = SENTENCE_RE.search(prompt)
+            content = json.dumps(fake_extraction(m.group(1) if m else prompt))
+
+        prompt_tokens = sum(len(msg["content"].split()) for msg in body["messages"])
+        completion_tokens = len(content.split())
+        await asyncio.sleep(latency + token_latency * completion_tokens)
+        return {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        }
+
+    return stub
+
+
+app = create_app(
+    latency=float(os.getenv("STUB_LLM_LATENCY", "0.05")),
+    failure_rate=float(os.getenv("STUB_LLM_FAILURE_RATE", "0")),
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a background thread, at base_url."""
+
+    def __init__(self, app):
+        self.app = app
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+class StubServer(ServerThread):
+    """Run a stub app with uvicorn on a background thread."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        token_latency: float = 0.0,
+        throttle_first: int = 0,
+        retry_after: float = 1,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(create_app(latency, token_latency, throttle_first, retry_after, failure_rate, seed))
+        self.url = f"{self.base_url}/v1/chat/completions"
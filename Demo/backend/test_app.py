@@ -0,0 +1,899 @@
+import os
+import json
+import time
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import app as backend
+import rollups
+from stub_llm import ServerThread, StubServer
+
+client = TestClient(backend.app)
+
+
+async def fake_llm(text):
+    if "fail" in text:
+        raise ValueError("LLM API error: boom")
+    await asyncio.sleep(0.2)
+    return {
+        "date": "2025-01-02",
+        "type": "expense",
+        "category": "food",
+        "description": text,
+        "price": 12.5,
+    }
+
+
+def test_health():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_process_batch(monkeypatch):
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+    response = client.post("/process/batch", json={"texts": ["lunch", "please fail", "taxi"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["saved"] == 2
+    ok = [r for r in body["results"] if r["ok"]]
+    assert [r["index"] for r in ok] == [0, 2]
+    assert body["results"][1]["error"] == "LLM API error: boom"
+    assert ok[0]["extracted"]["price"] == 12.5
+    assert ok[0]["extracted"]["date"] == "2025-01-02"
+
+    rows = client.get("/transactions").json()
+    assert {r["id"] for r in rows} >= {r["id"] for r in ok}
+
+
+def test_process_batch_runs_concurrently(monkeypatch):
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+    start = time.perf_counter()
+    response = client.post("/process/batch", json={"texts": [f"item {i}" for i in range(8)]})
+    elapsed = time.perf_counter() - start
+    assert response.json()["saved"] == 8
+    assert elapsed < 0.2 * 4
+
+
+def test_bulk_insert(monkeypatch):
+    async def no_llm(text):
+        raise AssertionError("bulk insert must not call the LLM")
+
+    monkeypatch.setattr(backend, "extract_with_llm", no_llm)
+    rows = [
+        {"date": "2024-03-0%d" % (i % 9 + 1), "type": "expense", "category": "bulk",
+         "description": f"row {i}", "price": i}
+        for i in range(200)
+    ]
+    response = client.post("/transactions/bulk", json={"transactions": rows})
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "saved": 200}
+
+    saved = client.get("/transactions", params={"category": "bulk"}).json()
+    assert len(saved) == 200
+    assert saved[0]["date"] == "2024-03-09"
+
+
+def test_bulk_insert_validates_rows():
+    rows = [{"date": "2024-03-01", "type": "refund", "category": "x", "description": "x", "price": 1}]
+    response = client.post("/transactions/bulk", json={"transactions": rows})
+    assert response.status_code == 422
+
+
+def test_process_against_stub_llm(monkeypatch):
+    """100 concurrent /process calls share one pooled client and overlap."""
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+
+    async def run(n):
+        async with backend.lifespan(backend.app):
+            transport = httpx.ASGITransport(app=backend.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                start = time.perf_counter()
+                responses = await asyncio.gather(
+                    *(ac.post("/process", json={"text": f"Team lunch, my share was {i}"}) for i in range(n))
+                )
+                return responses, time.perf_counter() - start
+
+    with StubServer(latency=0.2) as stub:
+        monkeypatch.setattr(backend, "LLM_API_URL", stub.url)
+        responses, elapsed = asyncio.run(run(100))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert responses[7].json()["extracted"]["price"] == 7.0
+    assert stub.app.state.calls == 100
+    assert elapsed < 100 * 0.2 / 5
+
+
+def test_process_uses_extraction_cache(monkeypatch):
+    calls = []
+
+    async def counting_llm(text):
+        calls.append(text)
+        return await fake_llm(text)
+
+    monkeypatch.setattr(backend, "extract_with_llm", counting_llm)
+    first = client.post("/process", json={"text": "Team dinner, my share was 30"})
+    again = client.post("/process", json={"text": "team dinner, my share  was 30"})
+    assert first.status_code == again.status_code == 200
+    assert again.json()["extracted"] == first.json()["extracted"]
+    assert [first.json()["path"], again.json()["path"]] == ["llm", "cache"]
+    assert len(calls) == 1
+
+    client.post("/process", json={"text": "Team dinner, my share was 30", "bypass_cache": True})
+    assert len(calls) == 2
+    assert client.get("/cache/stats").json()["hits"] >= 1
+
+
+def test_process_fast_path_skips_llm(monkeypatch):
+    async def no_llm(text):
+        raise AssertionError("fast path must not call the LLM")
+
+    monkeypatch.setattr(backend, "extract_with_llm", no_llm)
+    before = client.get("/extraction/stats").json()["paths"].get("fast", 0)
+    response = client.post("/process", json={"text": "Spent 30 on transportation"})
+    assert response.status_code == 200
+    assert response.json()["path"] == "fast"
+    assert response.json()["extracted"]["category"] == "transportation"
+    assert client.get("/extraction/stats").json()["paths"]["fast"] == before + 1
+
+
+def test_process_batch_packed_reasks_failed_elements(monkeypatch):
+    prompts = []
+
+    async def fake_chat(system_prompt, user_prompt):
+        prompts.append(user_prompt)
+        if len(prompts) == 1:
+            # Element 1 comes back with a bad type and element 2 is missing
+            return json.dumps([
+                {"index": 0, "date": "2025-01-02", "type": "expense", "category": "a", "description": "a", "price": 1},
+                {"index": 1, "date": "2025-01-02", "type": "refund", "category": "b", "description": "b", "price": 2},
+            ])
+        return json.dumps([
+            {"index": 0, "date": "2025-01-02", "type": "income", "category": "b", "description": "b", "price": 2},
+            {"index": 1, "date": "2025-01-02", "type": "expense", "category": "c", "description": "c", "price": "3"},
+        ])
+
+    monkeypatch.setattr(backend, "chat_completion", fake_chat)
+    texts = ["packed one", "packed two", "packed three"]
+    response = client.post("/process/batch", json={"texts": texts, "pack_size": 5})
+    body = response.json()
+    assert body["saved"] == 3
+    assert [r["extracted"]["category"] for r in body["results"]] == ["a", "b", "c"]
+    assert body["results"][2]["extracted"]["price"] == 3.0
+    assert len(prompts) == 2
+    assert '"packed one"' not in prompts[1]
+
+
+def test_process_batch_packed_malformed_response_fails_elements(monkeypatch):
+    async def malformed_chat(system_prompt, user_prompt):
+        raise KeyError("choices")
+
+    monkeypatch.setattr(backend, "chat_completion", malformed_chat)
+    response = client.post("/process/batch", json={"texts": ["odd one", "odd two"], "pack_size": 5})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["saved"] == 0
+    assert [r["ok"] for r in body["results"]] == [False, False]
+    assert "choices" in body["results"][0]["error"]
+
+
+def test_transactions_keyset_pagination():
+    rows = [
+        {"date": f"2023-06-{d:02d}", "type": "income", "category": "paged", "description": f"p{d}-{n}", "price": 1}
+        for d in range(1, 8) for n in range(3)
+    ]
+    client.post("/transactions/bulk", json={"transactions": rows})
+    everything = client.get("/transactions", params={"category": "paged"}).json()
+
+    pages, cursor = [], None
+    while True:
+        params = {"category": "paged", "limit": 5}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/transactions", params=params)
+        assert len(response.json()) <= 5
+        pages.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == everything
+    assert len(pages) == 21
+    assert client.get("/transactions", params={"category": "AGE"}).json() == everything
+    assert client.get("/transactions", params={"cursor": "nope"}).status_code == 400
+
+
+def test_transactions_stream_ndjson():
+    expected = client.get("/transactions", params={"type": "expense"}).json()
+    response = client.get("/transactions/stream", params={"type": "expense"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+
+def test_transactions_json_shape_is_unchanged():
+    client.post("/transactions/bulk", json={"transactions": [
+        {"date": "2019-03-04", "type": "income", "category": "Shape", "description": "shape \"check\" é", "price": 7},
+    ]})
+    response = client.get("/transactions", params={"category": "shape"})
+    assert response.headers["content-type"] == "application/json"
+    (row,) = response.json()
+    assert row == {
+        "id": row["id"],
+        "date": "2019-03-04",
+        "type": "income",
+        "category": "Shape",
+        "description": 'shape "check" é',
+        "price": 7.0,
+    }
+    assert list(row) == list(backend.TransactionOut.model_fields)
+    assert isinstance(row["id"], int) and isinstance(row["price"], float)
+
+
+def test_summary_matches_raw_rows():
+    rows = [
+        {"date": "2022-02-27", "type": "income", "category": "salary", "description": "pay", "price": 1000},
+        {"date": "2022-02-27", "type": "expense", "category": "food", "description": "lunch", "price": 12.5},
+        {"date": "2022-03-01", "type": "expense", "category": "food", "description": "dinner", "price": 30},
+        {"date": "2022-03-01", "type": "expense", "category": "rent", "description": "rent", "price": 500},
+    ]
+    client.post("/transactions/bulk", json={"transactions": rows})
+    summary = client.get("/summary", params={"date_from": "2022-02-01", "date_to": "2022-03-31"}).json()
+
+    assert summary["totals"] == {"income": 1000.0, "expense": 542.5, "net": 457.5, "count": 4}
+    assert summary["by_category"] == [
+        {"type": "expense", "category": "rent", "total": 500.0, "count": 1},
+        {"type": "expense", "category": "food", "total": 42.5, "count": 2},
+        {"type": "income", "category": "salary", "total": 1000.0, "count": 1},
+    ]
+    assert summary["daily"] == [
+        {"day": "2022-02-27", "income": 1000.0, "expense": 12.5, "net": 987.5},
+        {"day": "2022-03-01", "income": 0.0, "expense": 530.0, "net": -530.0},
+    ]
+    assert [(m["month"], m["net"]) for m in summary["monthly"]] == [("2022-02", 987.5), ("2022-03", -530.0)]
+
+
+def test_rollups_stay_consistent(monkeypatch):
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+    client.post("/process", json={"text": "Bought groceries for 85.3 yesterday"})
+    client.post("/process/batch", json={"texts": ["rollup a", "rollup b"]})
+    assert rollups.check_consistency(backend.engine, backend.Transaction.__table__) == []
+
+    with backend.engine.begin() as conn:
+        conn.execute(rollups.rollup_table.delete())
+    assert rollups.check_consistency(backend.engine, backend.Transaction.__table__)
+
+    with backend.engine.begin() as conn:
+        rollups.rebuild(conn, backend.Transaction.__table__)
+    assert rollups.check_consistency(backend.engine, backend.Transaction.__table__) == []
+
+
+def test_conditional_get_with_etag():
+    etags = {}
+    for path in ["/transactions", "/summary"]:
+        first = client.get(path, params={"date_from": "2022-01-01"})
+        etag = etags[path] = first.headers["ETag"]
+        assert first.headers["Last-Modified"]
+
+        unchanged = client.get(path, params={"date_from": "2022-01-01"}, headers={"If-None-Match": etag})
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+
+        other_filter = client.get(path, params={"date_from": "2022-01-02"}, headers={"If-None-Match": etag})
+        assert other_filter.status_code == 200
+
+    row = {"date": "2022-05-05", "type": "expense", "category": "etag", "description": "x", "price": 1}
+    client.post("/transactions/bulk", json={"transactions": [row]})
+    assert etags["/transactions"] != etags["/summary"]
+    for path, etag in etags.items():
+        changed = client.get(path, params={"date_from": "2022-01-01"}, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+
+
+def test_export_formats(monkeypatch):
+    import csv
+    import io
+
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    monkeypatch.setattr(backend, "STREAM_BATCH_SIZE", 4)
+    expected = client.get("/transactions", params={"category": "paged"}).json()
+    params = {"category": "paged"}
+
+    response = client.get("/transactions/export", params=params)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(r["id"]) for r in rows] == [r["id"] for r in expected]
+    assert rows[0]["date"] == expected[0]["date"]
+
+    response = client.get("/transactions/export", params={**params, "format": "parquet"})
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("id").to_pylist() == [r["id"] for r in expected]
+
+    response = client.get("/transactions/export", params={**params, "format": "arrow"})
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("price").to_pylist() == [r["price"] for r in expected]
+
+
+IMPORT_CSV = """Date,Description,Category,Type,Amount
+2021-07-01,Monthly salary,salary,income,3000
+2021-07-02,Corner shop,,,-12.40
+2021-07-03,Mystery charge please fail,,,-5
+not a date,Broken row,food,expense,1
+2021-07-04,Uber trip,,,-18
+"""
+
+IMPORT_OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20210710120000<TRNAMT>-42.00<NAME>Electricity bill</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20210711<TRNAMT>100.00<NAME>Dividend payout</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def post_import(content: bytes, **params) -> httpx.Response:
+    """POST /import and wait for the import task it starts, as a client polling until done would."""
+    async def run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            response = await ac.post("/import", params=params, content=content)
+            await asyncio.gather(*backend._import_tasks)
+        return response
+
+    return asyncio.run(run())
+
+
+def test_import_csv(monkeypatch):
+    calls = []
+
+    async def counting_llm(text):
+        calls.append(text)
+        return await fake_llm(text)
+
+    monkeypatch.setattr(backend, "extract_with_llm", counting_llm)
+    response = post_import(IMPORT_CSV.encode(), format="csv")
+    assert response.status_code == 200
+    job = client.get(f"/import/{response.json()['id']}").json()
+    assert client.get(f"/import/{job['id']}", headers={"X-User-ID": "mallory"}).status_code == 404
+
+    assert job["status"] == "done"
+    assert job["progress"] == 1.0
+    assert (job["total_rows"], job["rows_done"], job["inserted"], job["extracted"], job["failed"]) == (5, 5, 3, 1, 2)
+    # Only the row the keyword dictionary could not classify reached the LLM
+    assert calls == ["Corner shop", "Mystery charge please fail"]
+
+    rows = client.get("/transactions", params={"date_from": "2021-07-01", "date_to": "2021-07-04"}).json()
+    assert sorted((r["date"], r["type"], r["category"], r["price"]) for r in rows) == [
+        ("2021-07-01", "income", "salary", 3000.0),
+        ("2021-07-02", "expense", "food", 12.4),
+        ("2021-07-04", "expense", "transportation", 18.0),
+    ]
+
+
+def test_import_ofx():
+    response = post_import(IMPORT_OFX.encode(), format="ofx")
+    job = client.get(f"/import/{response.json()['id']}").json()
+    assert (job["status"], job["inserted"], job["extracted"]) == ("done", 2, 0)
+
+    rows = client.get("/transactions", params={"date_from": "2021-07-10", "date_to": "2021-07-11"}).json()
+    assert sorted((r["date"], r["type"], r["category"], r["price"]) for r in rows) == [
+        ("2021-07-10", "expense", "utilities", 42.0),
+        ("2021-07-11", "income", "investment", 100.0),
+    ]
+
+
+def test_import_reads_one_date_format_per_file():
+    us = "Date,Description,Category,Type,Amount\n01/12/2023,Datefmt rent,housing,expense,\"1,234.50\"\n12/25/2023,Datefmt gift,shopping,expense,20\n"
+    assert post_import(us.encode()).status_code == 200
+    eu = "Date,Description,Category,Type,Amount\n03.01.2023,Datefmt flat,housing,expense,\"1.234,50\"\n"
+    assert post_import(eu.encode()).status_code == 200
+    rows = client.get("/transactions", params={"date_from": "2023-01-01", "date_to": "2023-12-31"}).json()
+    assert sorted((r["date"], r["price"]) for r in rows if r["description"].startswith("Datefmt")) == [
+        ("2023-01-03", 1234.5), ("2023-01-12", 1234.5), ("2023-12-25", 20.0),
+    ]
+
+    ambiguous = "Date,Description,Category,Type,Amount\n01/02/2023,Datefmt coffee,food,expense,3\n"
+    response = client.post("/import", content=ambiguous.encode())
+    assert response.status_code == 400 and "date_format" in response.json()["detail"]
+    response = post_import(ambiguous.encode(), date_format="%d/%m/%Y")
+    assert client.get(f"/import/{response.json()['id']}").json()["date_format"] == "%d/%m/%Y"
+    rows = client.get("/transactions", params={"date_from": "2023-02-01", "date_to": "2023-02-01"}).json()
+    assert [r["description"] for r in rows] == ["Datefmt coffee"]
+
+
+def test_import_reads_one_decimal_separator_per_file():
+    eu = "Date,Description,Category,Type,Amount\n2023-03-01,Decimal flat,housing,expense,\"1.234,50\"\n2023-03-02,Decimal rent,housing,expense,€ 1.500\n"
+    response = post_import(eu.encode())
+    assert response.json()["decimal_separator"] == ","
+    rows = client.get("/transactions", params={"date_from": "2023-03-01", "date_to": "2023-03-02"}).json()
+    assert sorted(r["price"] for r in rows if r["description"].startswith("Decimal")) == [1234.5, 1500.0]
+
+    ambiguous = "Date,Description,Category,Type,Amount\n2023-04-01,Decimal deposit,housing,expense,1.500\n"
+    response = client.post("/import", content=ambiguous.encode())
+    assert response.status_code == 400 and "decimal_separator" in response.json()["detail"]
+    response = post_import(ambiguous.encode(), decimal_separator=",")
+    assert client.get(f"/import/{response.json()['id']}").json()["decimal_separator"] == ","
+    rows = client.get("/transactions", params={"date_from": "2023-04-01", "date_to": "2023-04-01"}).json()
+    assert [r["price"] for r in rows] == [1500.0]
+
+
+def test_import_resumes_from_committed_offset(monkeypatch):
+    lines = ["Date,Description,Category,Amount"] + [f"2020-01-{d:02d},row {d},resume,-{d}" for d in range(1, 11)]
+    monkeypatch.setattr(backend, "IMPORT_CHUNK_SIZE", 3)
+
+    async def never_runs(job_id):
+        pass
+
+    monkeypatch.setattr(backend, "run_import_job", never_runs)
+    job_id = client.post("/import", content="\n".join(lines).encode()).json()["id"]
+    monkeypatch.undo()
+
+    # Pretend an earlier run committed the first four rows before the crash
+    client.post("/transactions/bulk", json={"transactions": [
+        {"date": f"2020-01-{d:02d}", "type": "expense", "category": "resume", "description": f"row {d}", "price": d}
+        for d in range(1, 5)
+    ]})
+    backend.update_import_job(job_id, status="running", rows_done=4, inserted=4)
+
+    asyncio.run(backend.run_import_job(job_id))
+    job = client.get(f"/import/{job_id}").json()
+    assert (job["status"], job["rows_done"], job["inserted"]) == ("done", 10, 10)
+    rows = client.get("/transactions", params={"category": "resume"}).json()
+    assert sorted(r["price"] for r in rows) == [float(d) for d in range(1, 11)]
+
+
+def read_sse(response):
+    events, kind = [], None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            kind = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((kind, json.loads(line[len("data: "):])))
+    return events
+
+
+def test_job_streams_results_per_line(monkeypatch):
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+    texts = ["Team dinner, my share was 31", "", "please fail this one", "Team dinner, my share was 32"]
+
+    with TestClient(backend.app) as c:
+        job = c.post("/jobs", json={"texts": texts}).json()
+        assert (job["status"], job["total"], job["failed"]) == ("pending", 4, 1)
+
+        with c.stream("GET", f"/jobs/{job['id']}/events") as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = read_sse(response)
+
+        status = c.get(f"/jobs/{job['id']}").json()
+
+    results = {data["index"]: data for kind, data in events if kind == "result"}
+    assert sorted(results) == [0, 1, 2, 3]
+    assert [results[i]["ok"] for i in range(4)] == [True, False, False, True]
+    assert results[1]["error"] == "Empty sentence"
+    assert "boom" in results[2]["error"]
+    assert events[-1][0] == "end"
+    assert (events[-1][1]["status"], events[-1][1]["succeeded"], events[-1][1]["failed"]) == ("done", 2, 2)
+
+    assert status["progress"] == 1.0
+    assert [r["index"] for r in status["results"]] == [0, 1, 2, 3]
+    saved = client.get("/transactions", params={"date_from": "2025-01-02", "date_to": "2025-01-02"}).json()
+    assert {results[0]["id"], results[3]["id"]} <= {t["id"] for t in saved}
+
+
+def test_extract_only_job_saves_nothing(monkeypatch):
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+    text = "Review first, my share was 33"
+
+    with TestClient(backend.app) as c:
+        job = c.post("/jobs", json={"texts": [text], "save": False}).json()
+        with c.stream("GET", f"/jobs/{job['id']}/events") as response:
+            events = read_sse(response)
+
+    (kind, result), end = events
+    assert result["ok"] and result["extracted"]["description"] == text and result["id"] is None
+    assert end[1]["status"] == "done"
+    saved = client.get("/transactions", params={"date_from": "2025-01-02", "date_to": "2025-01-02"}).json()
+    assert text not in {t["description"] for t in saved}
+
+
+def test_job_worker_fails_lines_it_cannot_run(monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("worker bug")
+
+    monkeypatch.setattr(backend, "run_job_item", broken)
+    with TestClient(backend.app) as c:
+        job = c.post("/jobs", json={"texts": ["Anything at all, 5"]}).json()
+        with c.stream("GET", f"/jobs/{job['id']}/events") as response:
+            events = read_sse(response)
+        metrics = c.get("/metrics").text
+
+    assert [kind for kind, _ in events] == ["result", "end"]
+    assert "worker bug" in events[0][1]["error"]
+    assert (events[1][1]["status"], events[1][1]["failed"]) == ("done", 1)
+    assert 'errors_total{cause="job_worker"}' in metrics
+
+
+def test_job_cancel_stops_pending_lines(monkeypatch):
+    started = []
+
+    async def stuck_llm(text):
+        started.append(text)
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(backend, "extract_with_llm", stuck_llm)
+    monkeypatch.setattr(backend, "JOB_WORKERS", 2)
+
+    with TestClient(backend.app) as c:
+        job = c.post("/jobs", json={"texts": [f"Stuck errand number {i}" for i in range(5)]}).json()
+        deadline = time.time() + 5
+        while len(started) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        # Another user cannot see, follow or cancel the job
+        other = {"X-User-ID": "mallory"}
+        assert c.get(f"/jobs/{job['id']}", headers=other).status_code == 404
+        assert c.get(f"/jobs/{job['id']}/events", headers=other).status_code == 404
+        assert c.post(f"/jobs/{job['id']}/cancel", headers=other).status_code == 404
+
+        cancelled = c.post(f"/jobs/{job['id']}/cancel").json()
+        assert (cancelled["status"], cancelled["cancelled"], cancelled["succeeded"]) == ("cancelled", 5, 0)
+        with c.stream("GET", f"/jobs/{job['id']}/events") as response:
+            events = read_sse(response)
+        assert c.post("/jobs/missing/cancel").status_code == 404
+
+    assert len(started) == 2
+    assert [kind for kind, _ in events] == ["result"] * 5 + ["end"]
+    assert {data["status"] for _, data in events[:5]} == {"cancelled"}
+    assert backend.get_extraction_job(job["id"]).status == "cancelled"
+
+
+def test_llm_429_is_retried_after_retry_after(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setattr(backend, "llm_limiter", backend.rate_limiter.LlmLimiter())
+    monkeypatch.setattr(backend, "llm_client", None)  # created on this test's event loop
+
+    with StubServer(latency=0.01, throttle_first=2, retry_after=0.1) as stub:
+        monkeypatch.setattr(backend, "LLM_API_URL", stub.url)
+        start = time.perf_counter()
+        response = client.post("/process", json={"text": "Paid the plumber 88 for the call-out"})
+        elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert response.json()["path"] == "llm"
+    assert (stub.app.state.throttled, stub.app.state.calls) == (2, 1)
+    assert elapsed >= 0.2
+    stats = client.get("/llm/stats").json()
+    assert (stats["throttled"], stats["retries"]) == (2, 2)
+
+
+def test_llm_exhausted_retries_return_503(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setattr(backend, "llm_limiter", backend.rate_limiter.LlmLimiter())
+    monkeypatch.setattr(backend, "llm_client", None)  # created on this test's event loop
+    monkeypatch.setattr(backend, "LLM_MAX_RETRIES", 1)
+
+    with StubServer(latency=0.01, throttle_first=10, retry_after=0.05) as stub:
+        monkeypatch.setattr(backend, "LLM_API_URL", stub.url)
+        response = client.post("/process", json={"text": "Paid the locksmith 45 for a spare key"})
+
+    assert response.status_code == 503, response.text
+    assert response.headers["Retry-After"] == "1"
+    assert stub.app.state.throttled == 2
+
+
+def test_process_reports_stage_timings_and_metrics(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setattr(backend, "llm_limiter", backend.rate_limiter.LlmLimiter())
+    monkeypatch.setattr(backend, "llm_client", None)  # created on this test's event loop
+    throttled = backend.metrics.errors.value(cause="llm_http_429")
+
+    with StubServer(latency=0.01, throttle_first=1, retry_after=0.05) as stub:
+        monkeypatch.setattr(backend, "LLM_API_URL", stub.url)
+        response = client.post(
+            "/process", json={"text": "Paid the gardener 60 for the hedge"}, headers={"X-Request-ID": "trace-42"}
+        )
+
+    assert response.status_code == 200, response.text
+    assert response.headers["X-Request-ID"] == "trace-42"
+    timing = response.headers["Server-Timing"]
+    for stage in ("llm_queue", "llm;", "llm_parse", "db;", "app;"):
+        assert stage in timing
+    assert 'llm;dur=' in timing and 'desc="x2"' in timing  # the 429 and the retry
+
+    text = client.get("/metrics").text
+    assert backend.metrics.errors.value(cause="llm_http_429") == throttled + 1
+    assert 'http_requests_total{method="POST",route="/process",status="200"}' in text
+    assert 'stage_duration_seconds_bucket{stage="llm",le="+Inf"}' in text
+    assert 'llm_tokens_total{kind="prompt"}' in text
+    assert 'db_pool_connections{engine="sync",state="idle"}' in text
+
+
+def test_request_ids_and_route_labels():
+    response = client.get("/jobs/not-a-job", headers={"X-Request-ID": "not a valid id"})
+    assert response.status_code == 404
+    assert len(response.headers["X-Request-ID"]) == 32  # replaced by a fresh one
+    assert client.get("/health").headers["X-Request-ID"] != response.headers["X-Request-ID"]
+
+    text = client.get("/metrics").text
+    # Path templates, not raw paths, so job IDs do not create new series
+    assert 'route="/jobs/{job_id}",status="404"' in text
+    assert "not-a-job" not in text
+
+
+def test_llm_server_errors_are_retried_then_503(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setattr(backend, "llm_limiter", backend.rate_limiter.LlmLimiter())
+    monkeypatch.setattr(backend, "llm_client", None)  # created on this test's event loop
+    monkeypatch.setattr(backend, "LLM_MAX_RETRIES", 1)
+    monkeypatch.setattr(backend, "LLM_BACKOFF_SEC", 0.01)
+
+    with StubServer(latency=0.01, failure_rate=1.0) as stub:
+        monkeypatch.setattr(backend, "LLM_API_URL", stub.url)
+        response = client.post("/process", json={"text": "Paid the electrician 70 for a socket"})
+
+    assert response.status_code == 503, response.text
+    assert (stub.app.state.failed, stub.app.state.calls) == (2, 0)
+
+
+def bulk_for(c, user_id, category, n, day="2024-05-01"):
+    rows = [{"date": day, "type": "expense", "category": category, "description": f"{user_id} {i}", "price": 10}
+            for i in range(n)]
+    response = c.post("/transactions/bulk", json={"transactions": rows}, headers={"X-User-ID": user_id})
+    assert response.status_code == 200, response.text
+
+
+def test_users_only_see_their_own_rows():
+    import csv
+    import io
+
+    bulk_for(client, "alice", "Books", 3)
+    bulk_for(client, "bob", "Books", 5)
+
+    def get(path, user, **params):
+        return client.get(path, params=params, headers={"X-User-ID": user})
+
+    assert len(get("/transactions", "alice", category="book").json()) == 3
+    assert {t["description"].split()[0] for t in get("/transactions", "bob", category="book").json()} == {"bob"}
+    assert get("/transactions", "carol", category="book").json() == []
+    assert get("/summary", "bob", date_from="2024-05-01", date_to="2024-05-01").json()["totals"]["count"] == 5
+    # The same query for another user must not validate against the first user's ETag
+    etag = get("/transactions", "alice", category="book").headers["ETag"]
+    r = client.get("/transactions", params={"category": "book"}, headers={"X-User-ID": "bob", "If-None-Match": etag})
+    assert r.status_code == 200 and len(r.json()) == 5
+    lines = client.get("/transactions/stream", params={"category": "book"}, headers={"X-User-ID": "alice"}).text
+    assert len(lines.splitlines()) == 3
+    # Download links cannot send headers; the user comes from the query string
+    export = client.get("/transactions/export", params={"category": "book", "user_id": "bob"}).text
+    exported = list(csv.DictReader(io.StringIO(export)))
+    assert len(exported) == 5 and {r["description"].split()[0] for r in exported} == {"bob"}
+
+
+def test_shard_per_user_mode(monkeypatch, tmp_path):
+    prepared = []
+
+    def prepare(engine):
+        prepared.append(engine.url.database)
+        backend.prepare_transactions_db(engine)
+
+    pool = backend.shards.ShardPool(str(tmp_path), max_open=2, prepare=prepare, schema_version=backend.SCHEMA_VERSION)
+    monkeypatch.setattr(backend.shards, "pool", pool)
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+
+    with TestClient(backend.app) as c:
+        for n, user in enumerate(["ann", "ben", "cy/../x"], 1):
+            bulk_for(c, user, "Shards", n)
+        assert pool.stats()["evicted"] == 1  # three users through two open slots
+
+        ann = {"X-User-ID": "ann"}
+        job = c.post("/jobs", json={"texts": ["Team dinner, my share was 31"]}, headers=ann).json()
+        with c.stream("GET", f"/jobs/{job['id']}/events", headers=ann) as response:
+            assert read_sse(response)[-1][0] == "end"
+
+        def rows(user):
+            return c.get("/transactions", params={"limit": 50}, headers={"X-User-ID": user}).json()
+
+        assert len(rows("ann")) == 2  # reopened after eviction, plus the job's row
+        assert len(rows("ben")) == 2
+        assert [t["category"] for t in rows("cy/../x")] == ["Shards"] * 3
+        # Reopened shards are already at the current schema and skip the migrations
+        assert pool.stats()["opened"] > 3 and len(prepared) == 3
+
+    files = sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".db")
+    assert files[1:] == ["ann.db", "ben.db"] and files[0].startswith("_")  # "cy/../x" is hashed
+    # Nothing went to the main database
+    with backend.engine.connect() as conn:
+        stmt = backend.select(backend.Transaction.id).where(backend.Transaction.category == "Shards")
+        assert conn.execute(stmt).first() is None
+
+
+def test_search_and_similar():
+    rows = [
+        {"date": "2024-06-01", "type": "expense", "category": "Coffee", "description": "Starbucks latte", "price": 5},
+        {"date": "2024-06-02", "type": "expense", "category": "Coffee", "description": "Starbucks flat white", "price": 4},
+        {"date": "2024-06-03", "type": "expense", "category": "Transport", "description": "Uber to office", "price": 18},
+    ]
+    headers = {"X-User-ID": "searcher"}
+    assert client.post("/transactions/bulk", json={"transactions": rows}, headers=headers).status_code == 200
+
+    hits = client.get("/transactions/search", params={"q": "starbuks", "k": 5}, headers=headers).json()
+    assert {h["description"] for h in hits[:2]} == {"Starbucks latte", "Starbucks flat white"}
+    assert all(0 < h["score"] <= 1 for h in hits)
+    # Other users' rows are never returned
+    assert client.get("/transactions/search", params={"q": "starbuks"}).json() == []
+
+    # Rows inserted after the index was built are picked up by the next query
+    more = [{"date": "2024-06-04", "type": "expense", "category": "Coffee", "description": "Starbucks mocha", "price": 6}]
+    client.post("/transactions/bulk", json={"transactions": more}, headers=headers)
+    latte = next(h["id"] for h in hits if h["description"] == "Starbucks latte")
+    similar = client.get(f"/transactions/{latte}/similar", headers=headers).json()
+    assert latte not in [s["id"] for s in similar]
+    assert {s["description"] for s in similar[:2]} == {"Starbucks flat white", "Starbucks mocha"}
+
+    assert client.get(f"/transactions/{latte}/similar").status_code == 404
+    backend.search_indexes.save_all()
+    assert os.path.exists(backend.search_indexes.path("searcher"))
+
+
+def test_reviewed_categories_train_the_classifier(monkeypatch):
+    headers = {"X-User-ID": "learner"}
+    rows = [
+        {"date": "2024-07-01", "type": "expense", "category": category, "description": description,
+         "price": 10, "suggested_category": "other"}
+        for description, category in [
+            ("Gift for mum", "Gifts"), ("Birthday gift", "Gifts"), ("Gift card", "Gifts"),
+            ("Starbucks latte", "Coffee"), ("Starbucks mocha", "Coffee"), ("Pret coffee", "Coffee"),
+        ]
+    ]
+    assert client.get("/classifier/stats", headers=headers).json()["examples"] == 0
+    assert client.post("/transactions/bulk", json={"transactions": rows}, headers=headers).status_code == 200
+    stats = client.get("/classifier/stats", headers=headers).json()
+    assert stats["examples"] == 6 and stats["corrections"] == 6
+    assert stats["categories"] == {"Gifts": 3, "Coffee": 3}
+    # A second save is learned incrementally
+    client.post("/transactions/bulk", json={"transactions": rows[:1]}, headers=headers)
+    assert client.get("/classifier/stats", headers=headers).json()["examples"] == 7
+
+    async def no_llm(text, category=None):
+        raise AssertionError("the fast path should answer")
+
+    # The rule parser alone cannot categorize this one and would ask the LLM
+    monkeypatch.setattr(backend, "extract_with_llm", no_llm)
+    body = client.post("/process", json={"text": "Paid 40 for a gift for mum"}, headers=headers).json()
+    assert body["path"] == "fast" and body["extracted"]["category"] == "Gifts"
+
+    asked = []
+
+    async def short_llm(text, category=None):
+        asked.append(category)
+        return {"date": "2024-07-02", "type": "expense", "category": category, "description": "Coffee", "price": 4.2}
+
+    monkeypatch.setattr(backend, "extract_with_llm", short_llm)
+    text = "Grabbed a starbucks with Ann, my share was 4.2"
+    body = client.post("/process", json={"text": text}, headers=headers).json()
+    assert body["path"] == "llm" and body["extracted"]["category"] == "Coffee"
+    assert asked == ["Coffee"]
+    # Another user has no model, so the sentence is not answered with this user's category
+    body = client.post("/process", json={"text": text}).json()
+    assert asked == ["Coffee", None]
+
+
+def test_input_page_review_saves_through_bulk(monkeypatch):
+    """Process on the Input page, correct a category, then Confirm: the rows are saved once and the correction is learned."""
+    apptest = pytest.importorskip("streamlit.testing.v1")
+    frontend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+    monkeypatch.syspath_prepend(frontend)
+    monkeypatch.setattr(backend, "extract_with_llm", fake_llm)
+    headers = {"X-User-ID": "reviewer"}
+
+    with ServerThread(backend.app) as server:
+        at = apptest.AppTest.from_file(os.path.join(frontend, "pages", "1_Input.py"), default_timeout=30)
+        at.session_state["api_base_url"] = server.base_url
+        at.session_state["api_timeout_sec"] = 15
+        at.session_state["api_pool_size"] = 2
+        at.session_state["user_id"] = "reviewer"
+        at.run()
+        at.text_area[0].input("Reviewed dinner, my share was 31\nReviewed lunch, my share was 9").run()
+        next(b for b in at.button if b.label == "Process Transactions").click().run()
+        # Extraction alone saves nothing
+        assert len(at.session_state["review_rows"]) == 2
+        assert client.get("/transactions", params={"category": "food"}, headers=headers).json() == []
+
+        # Correct the first row's category in the review grid, as a user would
+        at.session_state["review_editor"] = {"edited_rows": {0: {"category": "Dining"}}, "added_rows": [], "deleted_rows": []}
+        next(b for b in at.button if b.label.startswith("Confirm")).click().run()
+        assert not at.exception
+        assert "saved successfully" in at.success[0].value
+        assert "review_rows" not in at.session_state
+
+    saved = client.get("/transactions", params={"date_from": "2025-01-02", "date_to": "2025-01-02"}, headers=headers).json()
+    assert sorted(t["category"] for t in saved) == ["Dining", "food"]
+    # The correction reached the classifier's feedback, next to what the extractor suggested
+    fb = backend.category_model.feedback_table
+    with backend.engine.connect() as conn:
+        stmt = backend.select(fb.c.description, fb.c.category, fb.c.suggested_category).where(fb.c.user_id == "reviewer")
+        feedback = sorted(tuple(r) for r in conn.execute(stmt))
+    assert feedback == [
+        ("Reviewed dinner, my share was 31", "Dining", "food"),
+        ("Reviewed lunch, my share was 9", "food", "food"),
+    ]
+    stats = client.get("/classifier/stats", headers=headers).json()
+    assert (stats["examples"], stats["corrections"]) == (2, 1)
+
+
+def test_history_page_loads_more_by_cursor(monkeypatch):
+    """History shows the newest page first and follows X-Next-Cursor on "Load more"."""
+    apptest = pytest.importorskip("streamlit.testing.v1")
+    frontend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+    monkeypatch.syspath_prepend(frontend)
+    headers = {"X-User-ID": "historian"}
+    client.post("/transactions/bulk", headers=headers, json={"transactions": [
+        {"date": f"2021-{m:02d}-{d:02d}", "type": "expense", "category": "history", "description": f"row {m}-{d}", "price": d}
+        for m in range(1, 11) for d in range(1, 26)
+    ]})
+
+    with ServerThread(backend.app) as server:
+        at = apptest.AppTest.from_file(os.path.join(frontend, "pages", "2_History.py"), default_timeout=30)
+        at.session_state["api_base_url"] = server.base_url
+        at.session_state["api_timeout_sec"] = 15
+        at.session_state["api_pool_size"] = 2
+        at.session_state["user_id"] = "historian"
+        at.run()
+        next(b for b in at.button if b.label == "Fetch History").click().run()
+        rows = at.session_state["history_rows"]
+        assert len(rows) == 200 and rows[0]["date"] == "2021-10-25"
+
+        next(b for b in at.button if b.label == "Load more").click().run()
+        assert not at.exception
+        rows = at.session_state["history_rows"]
+        assert len(rows) == 250 and len({r["id"] for r in rows}) == 250
+        assert rows[-1]["date"] == "2021-01-01"
+        assert at.session_state["history_cursor"] is None
+        assert not any(b.label == "Load more" for b in at.button)
+
+
+def test_async_api_client_loads_views_concurrently(monkeypatch):
+    """AsyncApiClient reads the summary and transaction pages concurrently, and retries a 503."""
+    frontend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+    monkeypatch.syspath_prepend(frontend)
+    from lib.api import ApiClient, AsyncApiClient
+
+    headers = {"X-User-ID": "concurrent"}
+    client.post("/transactions/bulk", headers=headers, json={"transactions": [
+        {"date": f"2022-03-{d:02d}", "type": "expense", "category": "async", "description": f"async {d}", "price": d}
+        for d in range(1, 31)
+    ]})
+    march = {"date_from": "2022-03-01", "date_to": "2022-03-31"}
+
+    async def load(base_url):
+        async with AsyncApiClient(base_url, user_id="concurrent") as ac:
+            return await asyncio.gather(
+                ac.get_summary(**march), ac.get_transactions(limit=25, **march), ac.get_transactions(**march)
+            )
+
+    with ServerThread(backend.app) as server:
+        summary, first, every = asyncio.run(load(server.base_url))
+        expected = ApiClient(server.base_url, user_id="concurrent").get_transactions(use_cache=False, **march)
+    assert summary["totals"]["count"] == 30
+    assert first == expected[:25] and every == expected and len(expected) == 30
+
+    flaky = FastAPI()
+    calls = []
+
+    @flaky.get("/summary")
+    async def summary_once_unavailable():
+        calls.append(1)
+        return JSONResponse({}, status_code=503) if len(calls) == 1 else {"totals": {"count": 0}}
+
+    async def load_flaky(base_url):
+        async with AsyncApiClient(base_url, backoff_sec=0.01) as ac:
+            return await ac.get_summary(date_from="1999-01-01")
+
+    with ServerThread(flaky) as server:
+        assert asyncio.run(load_flaky(server.base_url)) == {"totals": {"count": 0}}
+    assert len(calls) == 2
@@ -0,0 +1,49 @@
+import time
+
+from category_model import CLASSIFIER_MIN_CONFIDENCE, CategoryModel
+
+REVIEWED = [
+    ("Starbucks latte", "Coffee", "food"),
+    ("Starbucks flat white", "Coffee", "food"),
+    ("Pret coffee", "Coffee", "food"),
+    ("Uber to office", "Commute", "transportation"),
+    ("Uber home", "Commute", "transportation"),
+    ("Metro card top up", "Commute", "transportation"),
+    ("Tesco weekly shop", "Groceries", "groceries"),
+]
+
+
+def trained():
+    model = CategoryModel()
+    for description, category, suggested in REVIEWED * 2:
+        model.learn(description, category, suggested)
+    return model
+
+
+def test_predicts_corrected_categories():
+    model = trained()
+    category, confidence = model.predict("Paid 5 for a Starbucks mocha today")
+    assert category == "Coffee" and confidence >= CLASSIFIER_MIN_CONFIDENCE
+    assert model.predict("uber to the airport")[0] == "Commute"
+    # Too few examples of Groceries, and nothing known about the last sentence
+    assert model.predict("Tesco") == (None, 0.0)
+    assert model.predict("Dentist appointment") == (None, 0.0)
+
+    stats = model.stats()
+    assert stats["examples"] == 14 and stats["corrections"] == 14
+    assert stats["confident_accuracy"] == 1.0
+
+
+def test_one_category_is_never_predicted():
+    model = CategoryModel()
+    for _ in range(5):
+        model.learn("Starbucks latte", "Coffee")
+    assert model.predict("Starbucks latte") == (None, 0.0)
+
+
+def test_predict_is_fast():
+    model = trained()
+    start = time.perf_counter()
+    for _ in range(1000):
+        model.predict("Paid 5 for a Starbucks mocha today")
+    assert (time.perf_counter() - start) / 1000 < 1e-3
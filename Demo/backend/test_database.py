@@ -0,0 +1,51 @@
+import tempfile
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import create_db_engine
+
+
+def test_sqlite_file_runs_in_wal_mode():
+    engine = create_db_engine(f"sqlite:///{tempfile.mkdtemp()}/wal.db")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_in_memory_sqlite_shares_one_connection():
+    engine = create_db_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
+
+
+def test_category_lc_folds_non_ascii_like_python():
+    from migrations import add_category_lc
+    from models import Base, Transaction
+
+    engine = create_db_engine(f"sqlite:///{tempfile.mkdtemp()}/lc.db")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO transactions (user_id, date, type, category, category_lc, description, price) VALUES "
+            "('u', '2024-01-01', 'expense', 'ÉPICERIE', NULL, 'a', 1), "
+            "('u', '2024-01-01', 'expense', 'CAFÉ', lower('CAFÉ'), 'b', 1)"
+        ))
+        add_category_lc(conn, Transaction.__table__)
+        assert conn.execute(text("SELECT category_lc FROM transactions ORDER BY id")).scalars().all() == [
+            "épicerie", "café",
+        ]
+
+    with Session(engine) as session:
+        row = session.get(Transaction, 1)
+        row.price = 2  # an update that does not touch category keeps category_lc
+        session.commit()
+        row.category = "Straße"
+        session.commit()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT category_lc FROM transactions ORDER BY id")).scalars().all() == [
+            "straße", "café",
+        ]
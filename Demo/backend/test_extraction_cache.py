@@ -0,0 +1,44 @@
+import time
+
+from sqlalchemy import create_engine
+
+from extraction_cache import ExtractionCache, make_key
+
+VALUE = {"date": "2025-01-02", "type": "expense", "category": "food", "description": "lunch", "price": 12.5}
+
+
+def new_cache(**kwargs):
+    return ExtractionCache(create_engine("sqlite://"), **kwargs)
+
+
+def test_key_normalizes_text_and_tracks_today():
+    assert make_key("Paid 12.5 for lunch today", "2025-01-02") == make_key("  paid 12.5   FOR lunch today. ", "2025-01-02")
+    assert make_key("Paid 12.5 for lunch today", "2025-01-02") != make_key("Paid 12.5 for lunch today", "2025-01-03")
+
+
+def test_memory_and_sqlite_tiers():
+    cache = new_cache(max_entries=1)
+    cache.put("a", VALUE)
+    cache.put("b", VALUE)  # evicts "a" from memory only
+
+    assert cache.get("b") == VALUE
+    assert cache.get("a") == VALUE
+    assert cache.get("c") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["db_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_and_row_limit():
+    cache = new_cache(ttl_sec=0.05, max_rows=2)
+    cache.put("a", VALUE)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+    cache.ttl_sec = 3600
+    for key in "bcde":
+        cache.put(key, VALUE)
+    cache.prune()
+    cache._lru.clear()
+    assert cache.get("b") is None
+    assert cache.get("e") == VALUE
@@ -0,0 +1,13 @@
+from benchmarks.generator import END, generate
+
+
+def test_generator_is_deterministic_and_chronological():
+    first = [row for batch in generate(2_000, seed=7, chunk=300) for row in batch]
+    again = [row for batch in generate(2_000, seed=7, chunk=1_000) for row in batch]
+    assert first == again  # chunk size does not change the rows
+    assert first != [row for batch in generate(2_000, seed=8) for row in batch]
+
+    dates = [row["date"] for row in first]
+    assert dates == sorted(dates) and dates[-1] <= END
+    assert {row["type"] for row in first} == {"income", "expense"}
+    assert all(row["category_lc"] == row["category"].lower() and row["price"] > 0 for row in first)
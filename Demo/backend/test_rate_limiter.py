@@ -0,0 +1,88 @@
+import time
+import asyncio
+
+from rate_limiter import BULK, INTERACTIVE, LlmLimiter, TokenBucket, lane
+
+
+def test_token_bucket_refills_per_minute():
+    bucket = TokenBucket(60)  # one unit per second
+    now = time.monotonic()
+    bucket.take(60, now)
+    assert bucket.wait_time(1, now) == 1.0
+    assert bucket.wait_time(1, now + 0.5) == 0.5
+    assert TokenBucket(0).wait_time(10**9, now) == 0.0
+
+
+def test_concurrency_cap_and_lane_priority():
+    order = []
+
+    async def call(limiter, name, priority):
+        async with limiter.slot(priority=priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        limiter = LlmLimiter(max_concurrency=1)
+        await limiter.acquire(INTERACTIVE, 0)  # hold the only slot while the queue builds
+        tasks = [asyncio.create_task(call(limiter, f"bulk{i}", BULK)) for i in range(3)]
+        tasks.append(asyncio.create_task(call(limiter, "interactive", INTERACTIVE)))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == {"interactive": 1, "bulk": 3}
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert order == ["interactive", "bulk0", "bulk1", "bulk2"]
+    assert stats["in_flight"] == 0
+    assert stats["wait"]["bulk"]["count"] == 3
+
+
+def test_lane_context_reaches_tasks():
+    async def run():
+        limiter = LlmLimiter(max_concurrency=1)
+        await limiter.acquire(INTERACTIVE, 0)
+        with lane(BULK):
+            task = asyncio.create_task(_slot(limiter))
+            queued = asyncio.create_task(_slot(limiter))
+        await asyncio.sleep(0)
+        depth = limiter.stats()["queue_depth"]
+        for t in (task, queued):
+            t.cancel()
+        await asyncio.gather(task, queued, return_exceptions=True)
+        return depth, limiter.stats()["queue_depth"]
+
+    async def _slot(limiter):
+        async with limiter.slot():
+            pass
+
+    depth, after_cancel = asyncio.run(run())
+    assert depth == {"interactive": 0, "bulk": 2}
+    assert after_cancel == {"interactive": 0, "bulk": 0}
+
+
+def test_requests_per_minute_spreads_calls():
+    async def run():
+        limiter = LlmLimiter(requests_per_minute=600, max_concurrency=100)  # 10/s, burst of 600
+        limiter.requests.level = 0
+        start = time.monotonic()
+        for _ in range(3):
+            async with limiter.slot():
+                pass
+        return time.monotonic() - start
+
+    assert 0.25 <= asyncio.run(run()) < 1.0
+
+
+def test_pause_holds_every_lane():
+    async def run():
+        limiter = LlmLimiter()
+        limiter.pause(0.2)
+        start = time.monotonic()
+        async with limiter.slot(priority=INTERACTIVE):
+            pass
+        return time.monotonic() - start, limiter.stats()["throttled"]
+
+    waited, throttled = asyncio.run(run())
+    assert waited >= 0.19
+    assert throttled == 1
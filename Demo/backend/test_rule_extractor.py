@@ -0,0 +1,57 @@
+import datetime
+
+from rule_extractor import extract_fast
+
+TODAY = datetime.date(2025, 3, 15)
+
+
+def test_simple_sentences():
+    cases = {
+        "Paid 12.5 for lunch today": ("2025-03-15", "expense", "food", 12.5),
+        "Received 1000 salary on December 20": ("2024-12-20", "income", "salary", 1000.0),
+        "Bought groceries for 85.3 yesterday": ("2025-03-14", "expense", "groceries", 85.3),
+        "Spent 30 on transportation": ("2025-03-15", "expense", "transportation", 30.0),
+        "Paid $1,200 for rent on 2025-03-01": ("2025-03-01", "expense", "housing", 1200.0),
+    }
+    for text, (date, type_, category, price) in cases.items():
+        extracted, confidence = extract_fast(text, TODAY)
+        assert confidence >= 0.8, text
+        assert (extracted["date"], extracted["type"], extracted["category"], extracted["price"]) == (
+            date, type_, category, price,
+        ), text
+
+
+def test_low_confidence_falls_back():
+    extracted, confidence = extract_fast("Paid 40 for a gift for mum", TODAY)
+    assert extracted["category"] == "other"
+    assert confidence < 0.8
+
+    assert extract_fast("Lunch with Ann, my share was 12", TODAY) == (None, 0.0)
+    assert extract_fast("Paid 12 for lunch on February 30", TODAY) == (None, 0.0)
+
+
+def test_unparsed_dates_are_not_today():
+    for text in [
+        "Paid 20 for lunch on Monday",
+        "Paid 50 for dinner last week",
+        "Spent 30 on taxi 2 days ago",
+        "Paid 15 for lunch on 3/10",
+        "Paid 12 for lunch yesterday morning",
+        "Paid 10 for lunch tomorrow",
+        "Paid 15 for lunch on 3rd",
+        "Spent 20 on taxi 2 days earlier",
+        "Paid 30 for dinner in two days",
+    ]:
+        assert extract_fast(text, TODAY) == (None, 0.0), text
+
+
+def test_verb_and_category_conflicts_fall_back():
+    for text in ["Got 5 for coffee", "Paid 200 for credit card interest"]:
+        _, confidence = extract_fast(text, TODAY)
+        assert confidence < 0.8, text
+
+
+def test_ambiguous_thousands_fall_back():
+    assert extract_fast("Paid 1.000 for rent", TODAY) == (None, 0.0)
+    assert extract_fast("Paid 12.500 for lunch", TODAY) == (None, 0.0)
+    assert extract_fast("Paid 1,000 for rent", TODAY)[0]["price"] == 1000.0
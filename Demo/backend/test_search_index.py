@@ -0,0 +1,51 @@
+from search_index import SimilarityIndex, trigrams
+
+ROWS = {
+    1: "Sushi Go takeaway food",
+    2: "Uber trip to airport transportation",
+    3: "Monthly salary salary",
+    4: "Corner shop groceries",
+    5: "Uber Eats sushi food",
+}
+
+
+def build(rows=ROWS):
+    index = SimilarityIndex()
+    index.add(list(rows), list(rows.values()))
+    return index
+
+
+def test_trigrams_stay_within_each_text():
+    doc, buckets = trigrams(["ab", "abc", ""])
+    # " ab", "ab " | " ab", "abc", "bc "; nothing for the empty text or across texts
+    assert doc.tolist() == [0, 0, 1, 1, 1]
+    assert len(set(buckets[doc == 0].tolist()) & set(buckets[doc == 1].tolist())) == 1
+
+
+def test_query_ranks_fuzzy_matches():
+    index = build()
+    assert {id for id, _ in index.query("suhsi", 2)} == {1, 5}
+    assert {id for id, _ in index.query("uber", 2)} == {2, 5}
+    assert index.query("salary", 5)[0][0] == 3
+    assert all(0 < score <= 1 for _, score in index.query("uber sushi", 5))
+    assert index.query("zzzz", 3) == []
+    assert 1 not in [id for id, _ in index.query("Sushi Go takeaway food", 3, exclude=1)]
+
+
+def test_incremental_adds_match_a_fresh_build(tmp_path):
+    index = build({i: t for i, t in ROWS.items() if i <= 3})
+    index.merge()
+    index.add([5, 4, 2], [ROWS[5], ROWS[4], "ignored: at or below the watermark"])
+    assert len(index) == 5 and index.watermark == 5
+
+    fresh = build()
+    for q in ["sushi", "uber trip", "groceries"]:
+        assert index.query(q, 5) == fresh.query(q, 5)
+        index.merge()
+        assert index.query(q, 5) == fresh.query(q, 5)
+
+    path = str(tmp_path / "user.npz")
+    index.save(path)
+    loaded = SimilarityIndex.load(path)
+    assert loaded.query("uber trip", 5) == fresh.query("uber trip", 5)
+    assert loaded.watermark == 5 and loaded.unsaved == 0
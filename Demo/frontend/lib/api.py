@@ -1,35 +1,43 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from lib.cache import data_cache
 
 class ApiError(RuntimeError):
-    pass
+    """A failed backend call; `request_id` is the X-Request-ID to look for in backend logs and metrics."""
+
+    def __init__(self, message: str, request_id: Optional[str] = None):
+        super().__init__(f"{message} (request {request_id})" if request_id else message)
+        self.request_id = request_id
+
+def _response_error(r: Any) -> ApiError:
+    return ApiError(f"{r.status_code} {r.text}", r.headers.get("X-Request-ID"))
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
 
 def _join(base_url: str, path: str) -> str:
     base = base_url.rstrip("/")
     p = path if path.startswith("/") else f"/{path}"
     return f"{base}{p}"
 
-def process_text(*, text: str, base_url: str, timeout_sec: int = 15) -> Dict[str, Any]:
-    url = _join(base_url, "/process")
-    try:
-        r = requests.post(url, json={"text": text}, timeout=timeout_sec)
-        if r.status_code != 200:
-            raise ApiError(f"{r.status_code} {r.text}")
-        return r.json()
-    except requests.RequestException as e:
-        raise ApiError(str(e)) from e
-
-def get_transactions(
-    *,
-    base_url: str,
-    timeout_sec: int = 15,
+def _filters(
     type_: Optional[str] = None,
     category: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-) -> List[Dict[str, Any]]:
-    url = _join(base_url, "/transactions")
+) -> Dict[str, Any]:
     params: Dict[str, Any] = {}
     if type_:
         params["type"] = type_
@@ -39,11 +47,494 @@ def get_transactions(
         params["date_from"] = date_from
     if date_to:
         params["date_to"] = date_to
+    return params
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_USER_ID = "default"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SEC = 0.2
+RETRY_STATUSES = {502, 503, 504}
+
+def backoff_delay(attempt: int, base_sec: float = DEFAULT_BACKOFF_SEC, cap_sec: float = 5.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap_sec, base_sec * (2 ** attempt)))
 
-    try:
-        r = requests.get(url, params=params, timeout=timeout_sec)
+# Last response per (url, user, params) with its ETag, replayed when the backend answers 304
+_ETAG_CACHE_SIZE = 256
+_etag_cache: "OrderedDict[tuple, Tuple[str, Any, Mapping[str, str]]]" = OrderedDict()
+_etag_lock = threading.Lock()
+
+def _etag_lookup(key: tuple) -> Optional[Tuple[str, Any, Mapping[str, str]]]:
+    with _etag_lock:
+        cached = _etag_cache.get(key)
+        if cached is not None:
+            _etag_cache.move_to_end(key)
+        return cached
+
+def _etag_store(key: tuple, etag: str, data: Any, headers: Mapping[str, str]) -> None:
+    with _etag_lock:
+        _etag_cache[key] = (etag, data, headers)
+        _etag_cache.move_to_end(key)
+        while len(_etag_cache) > _ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+
+class ApiClient:
+    """Backend client on one pooled keep-alive session.
+
+    Reads (GET) are retried on connection errors and 502/503/504 with jittered
+    exponential backoff; writes are sent once, since repeating them could
+    insert the same transactions twice.
+
+    Every call carries an X-Request-ID (kept across its retries); `last_trace`
+    holds the ID and the backend's Server-Timing of the latest response.
+    Calls are made as `user_id` (the X-User-ID header), and cached reads
+    are kept per user.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_sec: int = 15,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff_sec: float = DEFAULT_BACKOFF_SEC,
+        user_id: str = DEFAULT_USER_ID,
+    ):
+        self.base_url = base_url
+        self.timeout_sec = timeout_sec
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_sec = backoff_sec
+        self.user_id = user_id
+        self.last_trace: Dict[str, str] = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _request(self, method: str, path: str, *, idempotent: bool, **kwargs: Any) -> requests.Response:
+        url = _join(self.base_url, path)
+        request_id = new_request_id()
+        kwargs["headers"] = {"X-Request-ID": request_id, "X-User-ID": self.user_id, **kwargs.get("headers", {})}
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                r = self.session.request(method, url, **{"timeout": self.timeout_sec, **kwargs})
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    raise ApiError(str(e), request_id) from e
+            except requests.RequestException as e:
+                raise ApiError(str(e), request_id) from e
+            else:
+                if r.status_code not in RETRY_STATUSES or last:
+                    self.last_trace = {
+                        "request_id": r.headers.get("X-Request-ID", request_id),
+                        "server_timing": r.headers.get("Server-Timing", ""),
+                    }
+                    return r
+            time.sleep(backoff_delay(attempt, self.backoff_sec))
+        raise AssertionError("unreachable")
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        r = self._request("POST", path, idempotent=False, json=payload)
         if r.status_code != 200:
-            raise ApiError(f"{r.status_code} {r.text}")
+            raise _response_error(r)
+        data_cache.invalidate(self.base_url)
         return r.json()
-    except requests.RequestException as e:
-        raise ApiError(str(e)) from e
+
+    def _get(self, path: str, params: Dict[str, Any]) -> Tuple[Any, Mapping[str, str]]:
+        """GET with If-None-Match; a 304 replays the cached body and headers."""
+        key = (_join(self.base_url, path), self.user_id, tuple(sorted(params.items())))
+        cached = _etag_lookup(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        r = self._request("GET", path, idempotent=True, params=params, headers=headers)
+        if r.status_code == 304 and cached:
+            return cached[1], cached[2]
+        if r.status_code != 200:
+            raise _response_error(r)
+
+        data = r.json()
+        etag = r.headers.get("ETag")
+        if etag:
+            _etag_store(key, etag, data, r.headers.copy())
+        return data, r.headers
+
+    def process_text(self, text: str) -> Dict[str, Any]:
+        return self._post("/process", {"text": text})
+
+    def process_batch(self, texts: List[str]) -> Dict[str, Any]:
+        return self._post("/process/batch", {"texts": texts})
+
+    def save_transactions(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._post("/transactions/bulk", {"transactions": rows})
+
+    def submit_job(self, texts: List[str], save: bool = True) -> Dict[str, Any]:
+        """Queue sentences for background extraction; follow with iter_job_events.
+
+        With save=False lines are only extracted, for review before save_transactions.
+        """
+        return self._post("/jobs", {"texts": texts, "save": save})
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        r = self._request("GET", f"/jobs/{job_id}", idempotent=True)
+        if r.status_code != 200:
+            raise _response_error(r)
+        return r.json()
+
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        return self._post(f"/jobs/{job_id}/cancel", {})
+
+    def iter_job_events(self, job_id: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ("result", line) as each line finishes, then ("end", job)."""
+        # No read timeout: the server sends keep-alives while lines are in flight
+        r = self._request(
+            "GET", f"/jobs/{job_id}/events", idempotent=True, stream=True, timeout=(self.timeout_sec, None)
+        )
+        with r:
+            if r.status_code != 200:
+                raise _response_error(r)
+            kind = None
+            for line in r.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    kind = line[len("event: "):]
+                elif line.startswith("data: "):
+                    if kind == "end":
+                        # Lines may have been saved as they finished
+                        data_cache.invalidate(self.base_url)
+                    yield kind, json.loads(line[len("data: "):])
+                    if kind == "end":
+                        return
+
+    def start_import(
+        self,
+        data: Any,
+        fmt: str = "csv",
+        filename: Optional[str] = None,
+        date_format: Optional[str] = None,
+        decimal_separator: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Upload a CSV/OFX statement; returns the import job to poll with get_import."""
+        params = {"format": fmt, **({"filename": filename} if filename else {})}
+        if date_format:
+            params["date_format"] = date_format
+        if decimal_separator:
+            params["decimal_separator"] = decimal_separator
+        r = self._request("POST", "/import", idempotent=False, params=params, data=data)
+        if r.status_code != 200:
+            raise _response_error(r)
+        return r.json()
+
+    def get_import(self, job_id: str) -> Dict[str, Any]:
+        r = self._request("GET", f"/import/{job_id}", idempotent=True)
+        if r.status_code != 200:
+            raise _response_error(r)
+        job = r.json()
+        # Rows land chunk by chunk while the job runs
+        data_cache.invalidate(self.base_url)
+        return job
+
+    def get_summary(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+        key = (self.base_url, "summary", self.user_id, date_from, date_to)
+        cached = data_cache.get(key)
+        if cached is not None:
+            return cached
+
+        data, _ = self._get("/summary", _filters(date_from=date_from, date_to=date_to))
+        data_cache.put(key, data)
+        return data
+
+    def get_transactions_page(
+        self,
+        type_: Optional[str] = None,
+        category: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        use_cache: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of transactions, newest first, and the cursor of the next page (None on the last).
+
+        Pages are cached one by one, so no cache entry holds a whole history.
+        """
+        key = (self.base_url, "transactions", self.user_id, type_, category, date_from, date_to, cursor, page_size)
+        cached = data_cache.get(key) if use_cache else None
+        if cached is not None:
+            return cached
+
+        params = _filters(type_, category, date_from, date_to)
+        params["limit"] = page_size
+        if cursor:
+            params["cursor"] = cursor
+        page, headers = self._get("/transactions", params)
+        data = (page, headers.get("X-Next-Cursor"))
+        data_cache.put(key, data)
+        return data
+
+    def iter_transactions(
+        self,
+        type_: Optional[str] = None,
+        category: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        use_cache: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield transactions newest first, fetching the next page only when needed."""
+        cursor = None
+        while True:
+            page, cursor = self.get_transactions_page(
+                type_, category, date_from, date_to, cursor=cursor, page_size=page_size, use_cache=use_cache
+            )
+            yield from page
+            if not cursor:
+                return
+
+    def get_transactions(
+        self,
+        type_: Optional[str] = None,
+        category: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        limit: Optional[int] = None,
+        use_cache: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Up to `limit` transactions (all with None), newest first, read page by page."""
+        rows = self.iter_transactions(
+            type_=type_,
+            category=category,
+            date_from=date_from,
+            date_to=date_to,
+            page_size=min(limit, DEFAULT_PAGE_SIZE) if limit else DEFAULT_PAGE_SIZE,
+            use_cache=use_cache,
+        )
+        return list(islice(rows, limit))
+
+    def export_url(
+        self,
+        format: str = "csv",
+        type_: Optional[str] = None,
+        category: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> str:
+        """Link to /transactions/export; the browser streams the file from the backend.
+
+        A link cannot send X-User-ID, so the user goes in the query string.
+        """
+        params = _filters(type_, category, date_from, date_to)
+        params["format"] = format
+        params["user_id"] = self.user_id
+        return f"{_join(self.base_url, '/transactions/export')}?{urlencode(params)}"
+
+class AsyncApiClient:
+    """Read-only async counterpart of ApiClient, for loading several views at once.
+
+        async with AsyncApiClient(base_url, user_id=user_id) as client:
+            summary, (recent, _) = await asyncio.gather(
+                client.get_summary(date_from=...), client.get_transactions_page(page_size=50)
+            )
+
+    Retries, request IDs, last_trace and both caches work as in ApiClient.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_sec: int = 15,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff_sec: float = DEFAULT_BACKOFF_SEC,
+        user_id: str = DEFAULT_USER_ID,
+    ):
+        self.base_url = base_url
+        self.timeout_sec = timeout_sec
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_sec = backoff_sec
+        self.user_id = user_id
+        self.last_trace: Dict[str, str] = {}
+        self.client = httpx.AsyncClient(
+            timeout=timeout_sec,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def __aenter__(self) -> "AsyncApiClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Tuple[Any, Mapping[str, str]]:
+        """GET with retries and If-None-Match; a 304 replays the cached body and headers."""
+        url = _join(self.base_url, path)
+        key = (url, self.user_id, tuple(sorted(params.items())))
+        cached = _etag_lookup(key)
+        request_id = new_request_id()
+        headers = {"X-Request-ID": request_id, "X-User-ID": self.user_id}
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        for attempt in range(1 + self.retries):
+            last = attempt == self.retries
+            try:
+                r = await self.client.get(url, params=params, headers=headers)
+            except httpx.TransportError as e:
+                if last:
+                    raise ApiError(str(e), request_id) from e
+            else:
+                if r.status_code not in RETRY_STATUSES or last:
+                    break
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_sec))
+
+        self.last_trace = {
+            "request_id": r.headers.get("X-Request-ID", request_id),
+            "server_timing": r.headers.get("Server-Timing", ""),
+        }
+        if r.status_code == 304 and cached:
+            return cached[1], cached[2]
+        if r.status_code != 200:
+            raise _response_error(r)
+
+        data = r.json()
+        etag = r.headers.get("ETag")
+        if etag:
+            _etag_store(key, etag, data, r.headers.copy())
+        return data, r.headers
+
+    async def get_summary(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+        key = (self.base_url, "summary", self.user_id, date_from, date_to)
+        cached = data_cache.get(key)
+        if cached is not None:
+            return cached
+
+        data, _ = await self._get("/summary", _filters(date_from=date_from, date_to=date_to))
+        data_cache.put(key, data)
+        return data
+
+    async def get_transactions_page(
+        self,
+        type_: Optional[str] = None,
+        category: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        cursor: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        use_cache: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Same page, cursor and cache entry as ApiClient.get_transactions_page."""
+        key = (self.base_url, "transactions", self.user_id, type_, category, date_from, date_to, cursor, page_size)
+        cached = data_cache.get(key) if use_cache else None
+        if cached is not None:
+            return cached
+
+        params = _filters(type_, category, date_from, date_to)
+        params["limit"] = page_size
+        if cursor:
+            params["cursor"] = cursor
+        page, headers = await self._get("/transactions", params)
+        data = (page, headers.get("X-Next-Cursor"))
+        data_cache.put(key, data)
+        return data
+
+    async def get_transactions(
+        self,
+        type_: Optional[str] = None,
+        category: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        limit: Optional[int] = None,
+        use_cache: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Up to `limit` transactions (all with None), newest first, read page by page."""
+        page_size = min(limit, DEFAULT_PAGE_SIZE) if limit else DEFAULT_PAGE_SIZE
+        data: List[Dict[str, Any]] = []
+        cursor = None
+        while limit is None or len(data) < limit:
+            page, cursor = await self.get_transactions_page(
+                type_, category, date_from, date_to, cursor=cursor, page_size=page_size, use_cache=use_cache
+            )
+            data.extend(page)
+            if not cursor:
+                break
+        return data[:limit]
+
+# One shared client per (base_url, timeout, user) for callers that use the plain functions below
+_clients: Dict[Tuple[str, int, str], ApiClient] = {}
+_clients_lock = threading.Lock()
+
+def _client(base_url: str, timeout_sec: int, user_id: str = DEFAULT_USER_ID) -> ApiClient:
+    with _clients_lock:
+        client = _clients.get((base_url, timeout_sec, user_id))
+        if client is None:
+            client = _clients[(base_url, timeout_sec, user_id)] = ApiClient(base_url, timeout_sec, user_id=user_id)
+        return client
+
+def process_text(*, text: str, base_url: str, timeout_sec: int = 15, user_id: str = DEFAULT_USER_ID) -> Dict[str, Any]:
+    return _client(base_url, timeout_sec, user_id).process_text(text)
+
+def process_batch(
+    *, texts: List[str], base_url: str, timeout_sec: int = 15, user_id: str = DEFAULT_USER_ID
+) -> Dict[str, Any]:
+    return _client(base_url, timeout_sec, user_id).process_batch(texts)
+
+def save_transactions(
+    *, rows: List[Dict[str, Any]], base_url: str, timeout_sec: int = 15, user_id: str = DEFAULT_USER_ID
+) -> Dict[str, Any]:
+    return _client(base_url, timeout_sec, user_id).save_transactions(rows)
+
+def get_summary(
+    *,
+    base_url: str,
+    timeout_sec: int = 15,
+    user_id: str = DEFAULT_USER_ID,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    return _client(base_url, timeout_sec, user_id).get_summary(date_from=date_from, date_to=date_to)
+
+def iter_transactions(
+    *,
+    base_url: str,
+    timeout_sec: int = 15,
+    user_id: str = DEFAULT_USER_ID,
+    type_: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    return _client(base_url, timeout_sec, user_id).iter_transactions(
+        type_=type_, category=category, date_from=date_from, date_to=date_to, page_size=page_size
+    )
+
+def get_transactions(
+    *,
+    base_url: str,
+    timeout_sec: int = 15,
+    user_id: str = DEFAULT_USER_ID,
+    type_: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    return _client(base_url, timeout_sec, user_id).get_transactions(
+        type_=type_,
+        category=category,
+        date_from=date_from,
+        date_to=date_to,
+        limit=limit,
+        use_cache=use_cache,
+    )
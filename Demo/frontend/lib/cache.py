@@ -0,0 +1,67 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+DEFAULT_TTL_SEC = 60
+DEFAULT_MAX_ENTRIES = 256
+
+class DataCache:
+    """Process-wide TTL cache for backend reads.
+
+    Keys start with the backend base_url, so every Streamlit session talking
+    to the same backend shares entries and invalidate(base_url) drops exactly
+    that backend's data. Cached values are shared; callers must not mutate them.
+    """
+
+    def __init__(self, ttl_sec: float = DEFAULT_TTL_SEC, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_sec:
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            if len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+
+    def invalidate(self, base_url: Optional[str] = None) -> None:
+        """Drop every entry for base_url, or everything when base_url is None."""
+        with self._lock:
+            if base_url is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == base_url]:
+                    del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "ttl_sec": self.ttl_sec,
+            }
+
+data_cache = DataCache()
@@ -1,4 +1,5 @@
 import streamlit as st
+from lib.api import ApiClient, DEFAULT_POOL_SIZE, DEFAULT_USER_ID
 
 DEFAULT_BASE_URL = "http://localhost:8000"
 DEFAULT_TIMEOUT_SEC = 15
@@ -10,5 +11,28 @@ def init_app_state() -> None:
     if "api_timeout_sec" not in st.session_state:
         st.session_state.api_timeout_sec = DEFAULT_TIMEOUT_SEC
 
+    if "api_pool_size" not in st.session_state:
+        st.session_state.api_pool_size = DEFAULT_POOL_SIZE
+
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = DEFAULT_USER_ID
+
     if "dashboard_days" not in st.session_state:
         st.session_state.dashboard_days = 30
+
+def get_api_client() -> ApiClient:
+    """The session's pooled client, rebuilt when the connection settings change."""
+    client = st.session_state.get("api_client")
+    settings = (
+        st.session_state.api_base_url,
+        int(st.session_state.api_timeout_sec),
+        int(st.session_state.api_pool_size),
+        st.session_state.user_id,
+    )
+    if client is None or (client.base_url, client.timeout_sec, client.pool_size, client.user_id) != settings:
+        if client is not None:
+            client.close()
+        base_url, timeout_sec, pool_size, user_id = settings
+        client = ApiClient(base_url, timeout_sec, pool_size, user_id=user_id)
+        st.session_state.api_client = client
+    return client
@@ -1,7 +1,9 @@
+import time
 import streamlit as st
 import pandas as pd
 from datetime import date
-from lib.api import process_text, ApiError
+from lib.api import ApiError
+from lib.state import get_api_client
 
 st.title("Expense Tracker")
 st.header("Add Transactions")
@@ -10,6 +12,10 @@ st.header("Add Transactions")
 if st.session_state.get("save_success", False):
     st.success(f"✅ All transactions saved successfully!")
     st.balloons()
+    trace = st.session_state.get("save_trace")
+    if trace:
+        # Quote the request ID to find this save in the backend's /metrics and logs
+        st.caption(f"Request {trace['request_id']} · {trace['server_timing']}")
     st.session_state.save_success = False  # Reset flag
 
 # Multi-line input
@@ -31,118 +37,181 @@ if submitted:
         st.warning("No valid sentences found.")
         st.stop()
 
-    with st.spinner(f"Processing {len(lines)} transaction(s)..."):
-        results = []
-        errors = []
-
-        for i, sentence in enumerate(lines, 1):
-            try:
-                result = process_text(
-                    text=sentence,
-                    base_url=st.session_state.api_base_url,
-                    timeout_sec=int(st.session_state.api_timeout_sec),
-                )
-                extracted = result.get("extracted", {})
-                if extracted:
-                    extracted["original_sentence"] = sentence
-                    results.append(extracted)
-                else:
-                    errors.append(f"Line {i}: No data extracted from response")
-            except ApiError as e:
-                errors.append(f"Line {i}: API error - {e}")
-
-        if errors:
-            st.error("Some lines failed to process:\n" + "\n".join(errors))
-
-        if results:
-            df = pd.DataFrame(results)
-
-            # Convert date string to datetime.date
-            df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-
-            # Ensure price is float
-            df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0)
-
-            # Column order
-            preferred_order = ["original_sentence", "date", "type", "category", "description", "price"]
-            cols = [c for c in preferred_order if c in df.columns] + [c for c in df.columns if c not in preferred_order]
-            df = df[cols]
-
-            st.subheader("Review and Edit Transactions")
-            st.info("You can edit fields directly. Changes will be saved upon confirmation.")
-
-            edited_df = st.data_editor(
-                df,
-                num_rows="fixed",
+    results = []
+    errors = []
+    finished = []
+
+    # Lines are extracted by a background job; show each one as it finishes
+    api = get_api_client()
+    progress = st.progress(0.0, text=f"Processing {len(lines)} transaction(s)...")
+    live = st.empty()
+    try:
+        # Extract only: the rows are saved once, by Confirm & Save below
+        job = api.submit_job(lines, save=False)
+        st.button("Cancel", on_click=api.cancel_job, args=(job["id"],))
+        for kind, item in api.iter_job_events(job["id"]):
+            if kind != "result":
+                continue
+            finished.append(item)
+            progress.progress(len(finished) / len(lines), text=f"{len(finished)}/{len(lines)} line(s) processed")
+            live.dataframe(
+                pd.DataFrame(
+                    [{"line": i["index"] + 1, "sentence": i["text"], "status": i["status"]} for i in finished]
+                ),
                 use_container_width=True,
-                column_config={
-                    "original_sentence": st.column_config.TextColumn(
-                        "Original Sentence",
-                        disabled=True,
-                    ),
-                    "date": st.column_config.DateColumn(
-                        "Date",
-                        format="YYYY-MM-DD",
-                        required=True,
-                        default=date.today(),
-                    ),
-                    "type": st.column_config.SelectboxColumn(
-                        "Type",
-                        options=["income", "expense"],
-                        required=True,
-                    ),
-                    "category": st.column_config.TextColumn("Category", required=True),
-                    "description": st.column_config.TextColumn("Description", required=True),
-                    "price": st.column_config.NumberColumn(
-                        "Price",
-                        format="%.2f",
-                        min_value=0.0,
-                        step=0.01,
-                        required=True,
-                    ),
-                },
+                hide_index=True,
             )
-
-            # Confirm save button with enhanced feedback
-            if st.button("Confirm & Save All Transactions", type="primary"):
-                # Prevent duplicate saves
-                if st.session_state.get("last_saved_df") is not None and edited_df.equals(st.session_state.last_saved_df):
-                    st.info("Transactions already saved. No changes detected.")
-                    st.stop()
-
-                with st.spinner("Saving transactions to database..."):
-                    save_errors = []
-                    success_count = 0
-                    total = len(edited_df)
-
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-
-                    for idx, (_, row) in enumerate(edited_df.iterrows()):
-                        try:
-                            mock_text = (
-                                f"{row['type'].capitalize()} {row['price']:.2f} "
-                                f"for {row['description']} on {row['date']} "
-                                f"in category {row['category']}"
-                            )
-                            process_text(
-                                text=mock_text,
-                                base_url=st.session_state.api_base_url,
-                                timeout_sec=int(st.session_state.api_timeout_sec),
-                            )
-                            success_count += 1
-                        except ApiError as e:
-                            save_errors.append(f"{row['original_sentence'] or 'Row ' + str(idx+1)}: {e}")
-                        finally:
-                            progress_bar.progress((idx + 1) / total)
-                            status_text.text(f"Processing {idx + 1}/{total}...")
-
-                    st.session_state.last_saved_df = edited_df.copy()
-
-                    if save_errors:
-                        st.error(f"⚠️ {success_count}/{total} saved. Failed:\n" + "\n".join(save_errors))
-                    else:
-                        st.session_state.save_success = True  # Set flag for post-rerun display
-                        st.rerun()  # Rerun to clear form and trigger success display
+    except ApiError as e:
+        errors.append(f"API error - {e}")
+    progress.empty()
+    live.empty()
+
+    for item in sorted(finished, key=lambda i: i["index"]):
+        i = item["index"] + 1
+        if not item.get("ok"):
+            errors.append(f"Line {i}: {item.get('error', 'unknown error')}")
+            continue
+        extracted = item.get("extracted", {})
+        if extracted:
+            extracted["original_sentence"] = item["text"]
+            results.append(extracted)
         else:
-            st.info("No transactions were successfully extracted.")
\ No newline at end of file
+            errors.append(f"Line {i}: No data extracted from response")
+
+    # Kept across reruns: clicking Confirm below starts a run in which `submitted` is False
+    st.session_state.review_rows = results
+    st.session_state.review_errors = errors
+    st.session_state.pop("review_editor", None)
+    if not results:
+        st.info("No transactions were successfully extracted.")
+
+if st.session_state.get("review_errors"):
+    st.error("Some lines failed to process:\n" + "\n".join(st.session_state.review_errors))
+
+if st.session_state.get("review_rows"):
+    df = pd.DataFrame(st.session_state.review_rows)
+
+    # Convert date string to datetime.date
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
+
+    # Ensure price is float
+    df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0)
+
+    # Hidden; sent with the save so the backend learns from category corrections
+    df["suggested_category"] = df["category"]
+
+    # Column order
+    preferred_order = ["original_sentence", "date", "type", "category", "description", "price"]
+    cols = [c for c in preferred_order if c in df.columns] + [c for c in df.columns if c not in preferred_order]
+    df = df[cols]
+
+    st.subheader("Review and Edit Transactions")
+    st.info("You can edit fields directly. Changes will be saved upon confirmation.")
+
+    edited_df = st.data_editor(
+        df,
+        key="review_editor",
+        num_rows="fixed",
+        use_container_width=True,
+        column_config={
+            "original_sentence": st.column_config.TextColumn(
+                "Original Sentence",
+                disabled=True,
+            ),
+            "date": st.column_config.DateColumn(
+                "Date",
+                format="YYYY-MM-DD",
+                required=True,
+                default=date.today(),
+            ),
+            "type": st.column_config.SelectboxColumn(
+                "Type",
+                options=["income", "expense"],
+                required=True,
+            ),
+            "category": st.column_config.TextColumn("Category", required=True),
+            "description": st.column_config.TextColumn("Description", required=True),
+            "price": st.column_config.NumberColumn(
+                "Price",
+                format="%.2f",
+                min_value=0.0,
+                step=0.01,
+                required=True,
+            ),
+            "suggested_category": None,
+        },
+    )
+
+    # Confirm save button with enhanced feedback
+    if st.button("Confirm & Save All Transactions", type="primary"):
+        with st.spinner("Saving transactions to database..."):
+            total = len(edited_df)
+
+            # Rows are already structured, so save them directly instead of re-running the LLM
+            rows = [
+                {
+                    "date": row["date"].strftime("%Y-%m-%d"),
+                    "type": row["type"],
+                    "category": row["category"],
+                    "description": row["description"],
+                    "price": float(row["price"]),
+                    "suggested_category": row["suggested_category"],
+                }
+                for _, row in edited_df.iterrows()
+            ]
+            client = get_api_client()
+            try:
+                client.save_transactions(rows)
+            except ApiError as e:
+                st.error(f"⚠️ 0/{total} saved. Failed:\n{e}")
+            else:
+                st.session_state.save_trace = client.last_trace
+                # Saved once; clear the review so a second click cannot store the rows again
+                for key in ("review_rows", "review_errors", "review_editor"):
+                    st.session_state.pop(key, None)
+                st.session_state.save_success = True  # Set flag for post-rerun display
+                st.rerun()  # Rerun to clear form and trigger success display
+
+st.divider()
+st.header("Import a Bank Statement")
+st.caption("CSV exports with Date / Description / Amount columns, or OFX files. Rows without a type or category are extracted automatically.")
+
+upload = st.file_uploader("Statement file", type=["csv", "ofx", "qfx"])
+DATE_ORDERS = {"Detect": None, "Day first (31/12/2025)": "%d/%m/%Y", "Month first (12/31/2025)": "%m/%d/%Y"}
+date_order = st.selectbox("Dates", list(DATE_ORDERS), help="Only needed when every day in the file is 12 or less")
+DECIMALS = {"Detect": None, "1,234.50": ".", "1.234,50": ","}
+decimal = st.selectbox("Amounts", list(DECIMALS), help="Only needed when no amount in the file shows which is the decimal separator")
+if upload is not None and st.button("Import File"):
+    fmt = "csv" if upload.name.lower().endswith(".csv") else "ofx"
+    try:
+        job = get_api_client().start_import(
+            upload.getvalue(),
+            fmt=fmt,
+            filename=upload.name,
+            date_format=DATE_ORDERS[date_order],
+            decimal_separator=DECIMALS[decimal],
+        )
+    except ApiError as e:
+        st.error(f"Import failed to start: {e}")
+        st.stop()
+
+    progress = st.progress(0.0, text=f"Importing {job['total_rows']} row(s)...")
+    while job["status"] in ("pending", "running"):
+        time.sleep(0.5)
+        try:
+            job = get_api_client().get_import(job["id"])
+        except ApiError as e:
+            st.error(f"Lost track of the import: {e}")
+            st.stop()
+        progress.progress(job["progress"], text=f"{job['rows_done']}/{job['total_rows']} row(s) processed")
+
+    if job["status"] == "done":
+        st.success(
+            f"Imported {job['inserted']} transaction(s)"
+            f" ({job['extracted']} extracted from descriptions, {job['failed']} skipped)."
+        )
+    else:
+        st.error(f"Import failed: {job.get('error') or 'unknown error'}")
+    if job["errors"]:
+        with st.expander("Skipped rows"):
+            st.text("\n".join(job["errors"]))
@@ -1,6 +1,10 @@
 import streamlit as st
 import pandas as pd
-from lib.api import get_transactions, ApiError
+from lib.api import ApiError
+from lib.state import get_api_client
+
+# Rows fetched per "Load more"; each page is cached on its own
+PAGE_SIZE = 200
 
 st.title("Expense Tracker")
 st.header("Transaction History")
@@ -17,21 +21,28 @@ with col4:
 
 fetch = st.button("Fetch History", type="primary")
 
-if fetch:
-    try:
-        type_ = None if filter_type == "All" else filter_type
-        date_from = filter_date_from.strftime("%Y-%m-%d") if filter_date_from else None
-        date_to = filter_date_to.strftime("%Y-%m-%d") if filter_date_to else None
+def load_page(cursor=None) -> None:
+    """Append the page at `cursor` to the shown rows and remember where the next one starts."""
+    page, next_cursor = get_api_client().get_transactions_page(
+        **st.session_state.history_filters, cursor=cursor, page_size=PAGE_SIZE
+    )
+    st.session_state.history_rows.extend(page)
+    st.session_state.history_cursor = next_cursor
 
-        data = get_transactions(
-            base_url=st.session_state.api_base_url,
-            timeout_sec=int(st.session_state.api_timeout_sec),
-            type_=type_,
+try:
+    if fetch:
+        st.session_state.history_filters = dict(
+            type_=None if filter_type == "All" else filter_type,
             category=filter_category.strip() or None,
-            date_from=date_from,
-            date_to=date_to,
+            date_from=filter_date_from.strftime("%Y-%m-%d") if filter_date_from else None,
+            date_to=filter_date_to.strftime("%Y-%m-%d") if filter_date_to else None,
         )
+        st.session_state.history_rows = []
+        load_page()
 
+    # Kept across reruns so "Load more" extends what is shown
+    if "history_rows" in st.session_state:
+        data = st.session_state.history_rows
         if not data:
             st.info("No transactions found.")
         else:
@@ -41,12 +52,22 @@ if fetch:
             df = df[cols]
 
             st.dataframe(df, use_container_width=True)
-            st.download_button(
-                "Download CSV",
-                data=df.to_csv(index=False).encode("utf-8"),
-                file_name="transactions.csv",
-                mime="text/csv",
-            )
-
-    except ApiError as e:
-        st.error(f"API error: {e}")
+
+            if st.session_state.history_cursor:
+                st.caption(f"Showing the newest {len(data)} transactions.")
+                if st.button("Load more"):
+                    load_page(st.session_state.history_cursor)
+                    st.rerun()
+            else:
+                st.caption(f"Showing all {len(data)} transactions.")
+
+            # Exports stream straight from the backend instead of through this process
+            client = get_api_client()
+            filters = st.session_state.history_filters
+            d1, d2, d3 = st.columns(3)
+            d1.link_button("Download CSV", client.export_url("csv", **filters))
+            d2.link_button("Download Parquet", client.export_url("parquet", **filters))
+            d3.link_button("Download Arrow", client.export_url("arrow", **filters))
+
+except ApiError as e:
+    st.error(f"API error: {e}")
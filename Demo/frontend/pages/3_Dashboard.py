@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import date, timedelta
-from lib.api import get_transactions, ApiError
+from lib.api import ApiError
+from lib.state import get_api_client
 import plotly.express as px
 
 st.title("Expense Tracker")
@@ -15,25 +16,20 @@ date_to = today.strftime("%Y-%m-%d")
 st.caption(f"Showing last {days} days: {date_from} to {date_to}")
 
 try:
-    data = get_transactions(
-        base_url=st.session_state.api_base_url,
-        timeout_sec=int(st.session_state.api_timeout_sec),
+    # Totals, category sums and net series are aggregated by the backend
+    summary = get_api_client().get_summary(
         date_from=date_from,
         date_to=date_to,
     )
 
-    if not data:
+    totals = summary["totals"]
+    if not totals["count"]:
         st.info("No transactions in the selected period.")
         st.stop()
 
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0)
-
-    # Calculate totals
-    income = df.loc[df["type"] == "income", "price"].sum()
-    expense = df.loc[df["type"] == "expense", "price"].sum()
-    net = income - expense
+    income = totals["income"]
+    expense = totals["expense"]
+    net = totals["net"]
 
     # Metrics
     c1, c2, c3 = st.columns(3)
@@ -57,32 +53,22 @@ try:
 
     # Expense by Category
     st.subheader("Expense by Category")
-    exp = df[df["type"] == "expense"].copy()
-    if exp.empty:
+    exp = [c for c in summary["by_category"] if c["type"] == "expense"]
+    if not exp:
         st.info("No expenses to group by category.")
     else:
-        by_cat = exp.groupby("category", dropna=False)["price"].sum().sort_values(ascending=False)
+        by_cat = pd.Series({c["category"]: c["total"] for c in exp}).sort_values(ascending=False)
         st.bar_chart(by_cat)
 
     # Daily Net
     st.subheader("Daily Net (Income - Expense)")
-    df["day"] = df["date"].dt.date
-    daily = (
-        df.pivot_table(index="day", columns="type", values="price", aggfunc="sum", fill_value=0.0)
-        .sort_index()
-    )
-    daily["net"] = daily.get("income", 0.0) - daily.get("expense", 0.0)
+    daily = pd.DataFrame(summary["daily"]).set_index("day")
     st.line_chart(daily["net"])
 
     # Monthly Net Trend
     st.subheader("Monthly Net Trend")
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    monthly = (
-        df.pivot_table(index="month", columns="type", values="price", aggfunc="sum", fill_value=0.0)
-        .sort_index()
-    )
-    monthly["net"] = monthly.get("income", 0.0) - monthly.get("expense", 0.0)
+    monthly = pd.DataFrame(summary["monthly"]).set_index("month")
     st.line_chart(monthly["net"])
 
 except ApiError as e:
-    st.error(f"API error: {e}")
\ No newline at end of file
+    st.error(f"API error: {e}")
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import date
-from lib.api import get_transactions, ApiError
+from lib.api import get_transactions, ApiError, DEFAULT_POOL_SIZE, DEFAULT_USER_ID
+from lib.cache import data_cache
 from lib.state import DEFAULT_BASE_URL, DEFAULT_TIMEOUT_SEC
 
 st.title("Expense Tracker")
@@ -11,6 +12,12 @@ api_base_url = st.text_input("API base URL", value=st.session_state.api_base_url
 api_timeout = st.number_input(
     "Timeout (seconds)", min_value=3, max_value=120, value=int(st.session_state.api_timeout_sec)
 )
+api_pool_size = st.number_input(
+    "Connection pool size", min_value=1, max_value=100, value=int(st.session_state.api_pool_size)
+)
+user_id = st.text_input(
+    "User ID", value=st.session_state.user_id, help="Sent as X-User-ID; each user only sees their own transactions."
+)
 
 st.subheader("Dashboard defaults")
 dashboard_days = st.number_input(
@@ -25,6 +32,8 @@ reset = col3.button("Reset defaults")
 if save:
     st.session_state.api_base_url = api_base_url.strip() or DEFAULT_BASE_URL
     st.session_state.api_timeout_sec = int(api_timeout)
+    st.session_state.api_pool_size = int(api_pool_size)
+    st.session_state.user_id = user_id.strip() or DEFAULT_USER_ID
     st.session_state.dashboard_days = int(dashboard_days)
     st.success("Saved.")
 
@@ -34,8 +43,11 @@ if test:
         _ = get_transactions(
             base_url=api_base_url.strip() or DEFAULT_BASE_URL,
             timeout_sec=int(api_timeout),
+            user_id=user_id.strip() or DEFAULT_USER_ID,
             date_from=today,
             date_to=today,
+            limit=1,
+            use_cache=False,
         )
         st.success("Connection OK.")
     except ApiError as e:
@@ -44,5 +56,19 @@ if test:
 if reset:
     st.session_state.api_base_url = DEFAULT_BASE_URL
     st.session_state.api_timeout_sec = DEFAULT_TIMEOUT_SEC
+    st.session_state.api_pool_size = DEFAULT_POOL_SIZE
+    st.session_state.user_id = DEFAULT_USER_ID
     st.session_state.dashboard_days = 30
     st.success("Reset to defaults.")
+
+st.subheader("Data cache")
+stats = data_cache.stats()
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Entries", stats["entries"])
+c2.metric("Hit rate", f"{stats['hit_rate']:.0%}")
+c3.metric("Hits / misses", f"{stats['hits']} / {stats['misses']}")
+c4.metric("Invalidations", stats["invalidations"])
+st.caption(f"Backend reads are shared across sessions for {stats['ttl_sec']:.0f}s and dropped on every save.")
+if st.button("Clear cache"):
+    data_cache.invalidate()
+    st.rerun()